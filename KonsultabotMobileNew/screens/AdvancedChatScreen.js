@@ -253,7 +253,7 @@ export default function AdvancedChatScreen({ navigation }) {
       });
       
       // Play voice response if available and enabled
-      if (voiceEnabled && data.voice_response && data.voice_response.audio_data) {
+      if (voiceEnabled && data.voice_response && data.voice_response.audio_url) {
         await playVoiceResponse(data.voice_response);
       } else if (voiceEnabled && data.message) {
         // Fallback to local TTS
@@ -445,14 +445,16 @@ export default function AdvancedChatScreen({ navigation }) {
 
   const playVoiceResponse = async (voiceData) => {
     try {
-      // Decode base64 audio data
-      const audioData = voiceData.audio_data;
-      const format = voiceData.format || 'mp3';
-      
-      // Create temporary file and play
-      // This would require additional implementation for playing base64 audio
-      // For now, fallback to local TTS
-      console.log('Voice response received, using local TTS fallback');
+      // Stream the server-side TTS audio; the message text is already shown
+      const { sound } = await Audio.Sound.createAsync(
+        { uri: voiceData.audio_url },
+        { shouldPlay: true }
+      );
+      sound.setOnPlaybackStatusUpdate((playbackStatus) => {
+        if (playbackStatus.didJustFinish) {
+          sound.unloadAsync();
+        }
+      });
       
     } catch (error) {
       console.error('Voice playback error:', error);
@@ -5,16 +5,19 @@ Tracks system performance, user interactions, and AI usage statistics
 
 import sqlite3
 import json
+import hashlib
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
-from dataclasses import dataclass
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from collections import Counter
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 
+# matplotlib and seaborn are imported only inside the chart worker process,
+# so importing this module (and starting the desktop app) stays fast.
+
 @dataclass
 class AnalyticsData:
     """Data structure for analytics metrics"""
@@ -24,12 +27,57 @@ class AnalyticsData:
     gemini_success_rate: float
     top_issues: List[tuple]
     user_satisfaction: float
-    response_times: List[float]
+    avg_response_time: float
+    responses_tracked: int
     daily_usage: Dict[str, int]
+    version: str = field(default='', compare=False)
+
+
+def render_charts(data: Dict, chart_paths: Dict[str, str]) -> Dict[str, str]:
+    """Plot report charts to PNG files; runs in the chart worker process"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    try:
+        import seaborn as sns
+        sns.set_theme(style='whitegrid')
+    except ImportError:
+        pass
+
+    written = {}
+    for name, path in chart_paths.items():
+        fig, ax = plt.subplots(figsize=(8, 4))
+        if name == 'daily_usage':
+            dates = sorted(data['daily_usage'])
+            ax.plot(dates, [data['daily_usage'][d] for d in dates], marker='o', color='#3498db')
+            ax.set_ylabel('Queries')
+            ax.tick_params(axis='x', rotation=45)
+        elif name == 'top_issues':
+            categories = [category.title() for category, _ in data['top_issues']]
+            ax.bar(categories, [count for _, count in data['top_issues']], color='#2c3e50')
+            ax.set_ylabel('Queries')
+        elif name == 'response_mode':
+            ax.pie([data['online_queries'], data['offline_queries']], labels=['Online', 'Offline'],
+                   autopct='%1.1f%%', colors=['#3498db', '#95a5a6'])
+            ax.axis('equal')
+        fig.tight_layout()
+        # Write then rename so the report never links a half-written image
+        temp_path = Path(path).with_suffix('.tmp.png')
+        fig.savefig(temp_path, dpi=100)
+        plt.close(fig)
+        temp_path.replace(path)
+        written[name] = path
+    return written
 
 class KonsultaBotAnalytics:
+    CHARTS = ('daily_usage', 'top_issues', 'response_mode')
+
+    _chart_executor = None
+    _chart_lock = threading.Lock()
+
     def __init__(self, db_path: str = "konsultabot.db"):
         self.db_path = db_path
+        self._cached_data = None  # (version, AnalyticsData)
         self._init_analytics_tables()
     
     def _init_analytics_tables(self):
@@ -75,6 +123,17 @@ class KonsultaBotAnalytics:
                     )
                 ''')
                 
+                # Every report filters on timestamp; the covering index lets the
+                # aggregate pass read only the index for the window
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_query_analytics_timestamp
+                    ON query_analytics (timestamp, query_category, response_mode, response_source,
+                                        response_time, satisfaction_rating)
+                ''')
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_user_feedback_query ON user_feedback (query_id)"
+                )
+                
                 conn.commit()
                 logging.info("Analytics tables initialized successfully")
         except Exception as e:
@@ -134,6 +193,14 @@ class KonsultaBotAnalytics:
         except Exception as e:
             logging.error(f"Failed to log user feedback: {e}")
     
+    def _data_version(self, conn, start_date: str) -> str:
+        """Key that changes whenever the report for this window would change"""
+        max_query_id = conn.execute("SELECT MAX(id) FROM query_analytics").fetchone()[0]
+        max_feedback_id = conn.execute("SELECT MAX(id) FROM user_feedback").fetchone()[0]
+        # The window slides, so it is part of the key at hour granularity
+        raw = f"{start_date[:13]}|{max_query_id}|{max_feedback_id}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+    
     def get_analytics_data(self, days: int = 30) -> AnalyticsData:
         """Get comprehensive analytics data for the specified period"""
         try:
@@ -141,81 +208,135 @@ class KonsultaBotAnalytics:
                 # Date filter
                 start_date = (datetime.now() - timedelta(days=days)).isoformat()
                 
-                # Total queries
-                total_queries = conn.execute(
-                    "SELECT COUNT(*) FROM query_analytics WHERE timestamp >= ?", 
-                    (start_date,)
-                ).fetchone()[0]
-                
-                # Online vs offline queries
-                online_queries = conn.execute(
-                    "SELECT COUNT(*) FROM query_analytics WHERE response_mode = 'online' AND timestamp >= ?",
-                    (start_date,)
-                ).fetchone()[0]
-                
-                offline_queries = total_queries - online_queries
-                
-                # Gemini success rate
-                gemini_attempts = conn.execute(
-                    "SELECT COUNT(*) FROM query_analytics WHERE response_source = 'gemini_ai' AND timestamp >= ?",
-                    (start_date,)
-                ).fetchone()[0]
+                version = self._data_version(conn, start_date)
+                if self._cached_data and self._cached_data[0] == version:
+                    return self._cached_data[1]
                 
-                gemini_success_rate = (gemini_attempts / max(online_queries, 1)) * 100
-                
-                # Top issues
-                top_issues = conn.execute('''
-                    SELECT query_category, COUNT(*) as count 
-                    FROM query_analytics 
-                    WHERE timestamp >= ? 
-                    GROUP BY query_category 
-                    ORDER BY count DESC 
-                    LIMIT 5
+                # One pass over the window, grouped by day and category; every
+                # metric is folded from these rows
+                rows = conn.execute('''
+                    SELECT DATE(timestamp), query_category, COUNT(*),
+                           SUM(response_mode = 'online'),
+                           SUM(response_source = 'gemini_ai'),
+                           SUM(satisfaction_rating), COUNT(satisfaction_rating),
+                           SUM(response_time), COUNT(response_time)
+                    FROM query_analytics
+                    WHERE timestamp >= ?
+                    GROUP BY DATE(timestamp), query_category
                 ''', (start_date,)).fetchall()
                 
-                # User satisfaction
-                avg_satisfaction = conn.execute(
-                    "SELECT AVG(satisfaction_rating) FROM query_analytics WHERE satisfaction_rating IS NOT NULL AND timestamp >= ?",
-                    (start_date,)
-                ).fetchone()[0] or 0
-                
-                # Response times
-                response_times = [
-                    row[0] for row in conn.execute(
-                        "SELECT response_time FROM query_analytics WHERE response_time IS NOT NULL AND timestamp >= ?",
-                        (start_date,)
-                    ).fetchall()
-                ]
-                
-                # Daily usage
+                total_queries = online_queries = gemini_attempts = 0
+                rating_sum = rating_count = 0
+                time_sum = 0.0
+                time_count = 0
+                categories = Counter()
                 daily_usage = {}
-                for row in conn.execute('''
-                    SELECT DATE(timestamp) as date, COUNT(*) as count 
-                    FROM query_analytics 
-                    WHERE timestamp >= ? 
-                    GROUP BY DATE(timestamp) 
-                    ORDER BY date
-                ''', (start_date,)).fetchall():
-                    daily_usage[row[0]] = row[1]
+                for date, category, count, online, gemini, ratings, rated, times, timed in rows:
+                    total_queries += count
+                    online_queries += online or 0
+                    gemini_attempts += gemini or 0
+                    rating_sum += ratings or 0
+                    rating_count += rated
+                    time_sum += times or 0
+                    time_count += timed
+                    categories[category] += count
+                    daily_usage[date] = daily_usage.get(date, 0) + count
                 
-                return AnalyticsData(
+                data = AnalyticsData(
                     total_queries=total_queries,
                     online_queries=online_queries,
-                    offline_queries=offline_queries,
-                    gemini_success_rate=gemini_success_rate,
-                    top_issues=top_issues,
-                    user_satisfaction=avg_satisfaction,
-                    response_times=response_times,
-                    daily_usage=daily_usage
+                    offline_queries=total_queries - online_queries,
+                    gemini_success_rate=(gemini_attempts / max(online_queries, 1)) * 100,
+                    top_issues=categories.most_common(5),
+                    user_satisfaction=rating_sum / rating_count if rating_count else 0,
+                    avg_response_time=time_sum / time_count if time_count else 0,
+                    responses_tracked=time_count,
+                    daily_usage=dict(sorted(daily_usage.items())),
+                    version=version
                 )
+                self._cached_data = (version, data)
+                return data
                 
         except Exception as e:
             logging.error(f"Failed to get analytics data: {e}")
-            return AnalyticsData(0, 0, 0, 0, [], 0, [], {})
+            return AnalyticsData(0, 0, 0, 0, [], 0, 0, 0, {})
+    
+    @classmethod
+    def _executor(cls) -> ProcessPoolExecutor:
+        with cls._chart_lock:
+            if cls._chart_executor is None:
+                cls._chart_executor = ProcessPoolExecutor(max_workers=1)
+            return cls._chart_executor
+    
+    def render_charts_async(self, data: AnalyticsData, chart_dir: Path) -> Future:
+        """Render missing charts for this data version in the background process.
+        
+        Charts are named by the data version, so a chart that already exists
+        for unchanged data is reused and never re-plotted; charts of earlier
+        versions are deleted once the new ones are written.
+        """
+        chart_dir.mkdir(parents=True, exist_ok=True)
+        paths = {name: str(chart_dir / f"{name}-{data.version}.png") for name in self.CHARTS}
+        missing = {name: path for name, path in paths.items() if not Path(path).exists()}
+        
+        if not missing or not data.version:
+            done = Future()
+            done.set_result(paths)
+            return done
+        
+        payload = {
+            'daily_usage': data.daily_usage,
+            'top_issues': data.top_issues,
+            'online_queries': data.online_queries,
+            'offline_queries': data.offline_queries,
+        }
+        try:
+            future = self._executor().submit(render_charts, payload, missing)
+        except Exception as e:
+            logging.error(f"Failed to start chart rendering: {e}")
+            future = Future()
+            future.set_exception(e)
+            return future
+        future.add_done_callback(lambda done: done.exception() or self._prune_charts(chart_dir, paths))
+        return future
+    
+    def _prune_charts(self, chart_dir: Path, current: Dict[str, str]):
+        """Delete charts of older data versions once the current ones are written.
+        
+        Only files no newer than the current charts are removed, so a render
+        that finished (or started) in the meantime keeps its images.
+        """
+        try:
+            cutoff = min(Path(path).stat().st_mtime for path in current.values())
+        except OSError:
+            return
+        keep = {Path(path).name for path in current.values()}
+        for name in self.CHARTS:
+            for path in chart_dir.glob(f"{name}-*.png"):
+                if path.name in keep:
+                    continue
+                try:
+                    if path.stat().st_mtime <= cutoff:
+                        path.unlink()
+                except OSError:
+                    pass  # Already gone, or in use by another report
     
-    def generate_report(self, days: int = 30, output_path: str = "analytics_report.html") -> str:
-        """Generate comprehensive analytics report"""
+    def generate_report(self, days: int = 30, output_path: str = "analytics_report.html",
+                        wait_for_charts: bool = False) -> str:
+        """Generate comprehensive analytics report
+        
+        The HTML is written immediately; chart images are rendered by a
+        background process and appear next to the report when ready. Pass
+        ``wait_for_charts`` to block until they are written.
+        """
         data = self.get_analytics_data(days)
+        chart_dir = Path(output_path).resolve().parent / "analytics_charts"
+        charts = self.render_charts_async(data, chart_dir)
+        if wait_for_charts:
+            try:
+                charts.result(timeout=60)
+            except Exception as e:
+                logging.error(f"Failed to render analytics charts: {e}")
         
         html_report = f"""
         <!DOCTYPE html>
@@ -255,7 +376,7 @@ class KonsultaBotAnalytics:
                     <div>User Satisfaction</div>
                 </div>
                 <div class="metric-card">
-                    <div class="metric-value">{len(data.response_times)}</div>
+                    <div class="metric-value">{data.responses_tracked}</div>
                     <div>Responses Tracked</div>
                 </div>
             </div>
@@ -284,9 +405,8 @@ class KonsultaBotAnalytics:
                 <h2>📈 Performance Insights</h2>
         """
         
-        if data.response_times:
-            avg_response_time = sum(data.response_times) / len(data.response_times)
-            html_report += f"<p><strong>Average Response Time:</strong> {avg_response_time:.2f} seconds</p>"
+        if data.responses_tracked:
+            html_report += f"<p><strong>Average Response Time:</strong> {data.avg_response_time:.2f} seconds</p>"
         
         html_report += f"""
                 <p><strong>System Reliability:</strong> {((data.online_queries + data.offline_queries) / max(data.total_queries, 1) * 100):.1f}%</p>
@@ -306,6 +426,16 @@ class KonsultaBotAnalytics:
                 </table>
             </div>
             
+            <div class="section">
+                <h2>📉 Charts</h2>
+        """
+        
+        for name in self.CHARTS:
+            html_report += f'<img src="analytics_charts/{name}-{data.version}.png" alt="{name.replace("_", " ").title()}" style="max-width: 100%;">'
+        
+        html_report += """
+            </div>
+            
             <div class="section">
                 <h2>🎯 Recommendations</h2>
                 <ul>
@@ -343,11 +473,16 @@ class KonsultaBotAnalytics:
         
         return output_path
 
+_tracker = None
+
 # Integration function for chatbot_core.py
 def track_query_interaction(query: str, response_data: Dict, response_time: float = None, user_id: str = None):
     """Helper function to track query interactions from chatbot_core"""
+    global _tracker
     try:
-        analytics = KonsultaBotAnalytics()
+        if _tracker is None:
+            _tracker = KonsultaBotAnalytics()
+        analytics = _tracker
         query_id = analytics.log_query(
             query=query,
             response_mode=response_data.get('mode', 'offline'),
@@ -366,5 +501,5 @@ if __name__ == "__main__":
     
     # Generate sample data for testing
     print("📊 Generating analytics report...")
-    report_path = analytics.generate_report(days=30)
+    report_path = analytics.generate_report(days=30, wait_for_charts=True)
     print(f"✅ Report generated: {report_path}")
@@ -267,7 +267,7 @@ def analytics_summary():
             'gemini_success_rate': round(analytics_data.gemini_success_rate, 2),
             'user_satisfaction': round(analytics_data.user_satisfaction, 2),
             'top_issues': analytics_data.top_issues[:5],
-            'avg_response_time': round(sum(analytics_data.response_times) / max(len(analytics_data.response_times), 1), 3) if analytics_data.response_times else 0,
+            'avg_response_time': round(analytics_data.avg_response_time, 3),
             'daily_usage': analytics_data.daily_usage,
             'timestamp': datetime.now().isoformat()
         }
@@ -289,15 +289,15 @@ def system_status():
         # Check network connectivity
         network_status = network_detector.check_internet_connection()
         
-        # Get pending offline queries
-        pending_queries = network_detector.get_pending_queries()
+        # Count pending offline queries
+        pending_count = network_detector.pending_count()
         
         status = {
             'success': True,
             'system_health': 'healthy',
             'network_connected': network_status,
             'network_status': 'online' if network_status else 'offline',
-            'pending_sync_queries': len(pending_queries),
+            'pending_sync_queries': pending_count,
             'uptime_seconds': int((datetime.now() - app_state['start_time']).total_seconds()),
             'api_stats': {
                 'total_requests': app_state['total_requests'],
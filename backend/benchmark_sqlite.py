@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+SQLite concurrency benchmark for KonsultaBot stores
+Compares the old access pattern (sqlite3.connect per operation, rollback
+journal, default pragmas) with sqlite_store (pooled WAL connections).
+
+Usage:
+    python benchmark_sqlite.py [--writers 8] [--readers 4] [--seconds 5]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlite_store import SQLiteStore
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        query TEXT,
+        response TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+INSERT = 'INSERT INTO conversations (user_id, query, response) VALUES (?, ?, ?)'
+SELECT = 'SELECT query, response FROM conversations WHERE user_id = ? ORDER BY id DESC LIMIT 20'
+
+
+def run(name, write, read, writers, readers, seconds):
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(operation, key):
+        done = errors = 0
+        user_id = threading.get_ident() % 100
+        while time.monotonic() < deadline:
+            try:
+                operation(user_id)
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts[key] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=worker, args=(write, 'writes')) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=(read, 'reads')) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{name:<10} writes/s {counts['writes'] / seconds:>9.0f}   "
+          f"reads/s {counts['reads'] / seconds:>9.0f}   locked errors {counts['errors']}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Baseline: what the Flask APIs and OfflineQueryHandler used to do
+        baseline_path = os.path.join(directory, 'baseline.db')
+        with sqlite3.connect(baseline_path) as conn:
+            conn.execute(SCHEMA)
+
+        def baseline_write(user_id):
+            conn = sqlite3.connect(baseline_path)
+            try:
+                conn.execute(INSERT, (user_id, 'How do I reset my password?', 'Visit the IT office.'))
+                conn.commit()
+            finally:
+                conn.close()
+
+        def baseline_read(user_id):
+            conn = sqlite3.connect(baseline_path)
+            try:
+                conn.execute(SELECT, (user_id,)).fetchall()
+            finally:
+                conn.close()
+
+        store = SQLiteStore(os.path.join(directory, 'pooled.db'))
+        store.execute(SCHEMA)
+
+        def pooled_write(user_id):
+            with store.transaction() as conn:
+                conn.execute(INSERT, (user_id, 'How do I reset my password?', 'Visit the IT office.'))
+
+        def pooled_read(user_id):
+            with store.connection() as conn:
+                conn.execute(SELECT, (user_id,)).fetchall()
+
+        print(f"{args.writers} writer and {args.readers} reader threads for {args.seconds:g}s each\n")
+        before = run('baseline', baseline_write, baseline_read, args.writers, args.readers, args.seconds)
+        after = run('pooled', pooled_write, pooled_read, args.writers, args.readers, args.seconds)
+        store.close()
+
+        if before['writes']:
+            print(f"\nWrite throughput: {after['writes'] / before['writes']:.1f}x")
+        if before['reads']:
+            print(f"Read throughput:  {after['reads'] / before['reads']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
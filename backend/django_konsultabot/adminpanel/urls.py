@@ -12,6 +12,7 @@ urlpatterns = [
     
     # Analytics API endpoints
     path('api/analytics/', views.analytics_api, name='analytics_api'),
+    path('api/live/', views.live_stream, name='live_stream'),
     
     # Detailed views
     path('queries/', views.query_logs, name='query_logs'),
@@ -21,5 +22,6 @@ urlpatterns = [
     # Actions
     path('feedback/<int:feedback_id>/resolve/', views.resolve_feedback, name='resolve_feedback'),
     path('export/', views.export_data, name='export_data'),
+    path('archive/', views.archived_data, name='archived_data'),
     path('generate-report/', views.generate_report, name='generate_report'),
 ]
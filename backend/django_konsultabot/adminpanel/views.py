@@ -2,20 +2,32 @@
 Admin Panel Views for KonsultaBot Analytics Dashboard
 """
 import json
+import time
 from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from django.db.models import Count, Avg, Q, Sum
+from django.db.models import Avg, Q
 from django.core.paginator import Paginator
 
 from analytics.models import (
-    QueryLog, SystemMetrics, UserSession, FeedbackReport, 
-    APIUsageLog, DailyStats
+    QueryLog, SystemMetrics, UserSession, FeedbackReport, DailyStats
 )
+from analytics.api_health import api_health
+from analytics.exports import AnalyticsExporter, EXPORT_FORMATS, EXPORT_TYPES, PYARROW_AVAILABLE
+from analytics.facets import query_log_facets
+from analytics.live import live_metrics
+from analytics.query_browser import browse, search_filter
+from analytics.retention import RETENTION_TARGETS, retention_manager
+from analytics.rollups import rollup_engine
+from analytics.sketches import query_sketch, sketches_by_source
+from analytics.snapshots import dashboard_snapshots
 from chatbot_core.models import ConversationSession, ChatMessage
+from django_konsultabot.caching import cache_metrics
 from django.contrib.auth.models import User
 
 
@@ -31,80 +43,12 @@ def dashboard_home(request):
     
     # Get date range from request (default: last 30 days)
     days = int(request.GET.get('days', 30))
-    since = timezone.now() - timedelta(days=days)
-    
-    # Basic statistics
-    total_queries = QueryLog.objects.filter(created_at__gte=since).count()
-    unique_users = QueryLog.objects.filter(created_at__gte=since).values('user').distinct().count()
-    active_sessions = ConversationSession.objects.filter(last_activity__gte=since).count()
-    
-    # Response source breakdown
-    source_stats = QueryLog.objects.filter(created_at__gte=since).values('response_source').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # Language usage
-    language_stats = QueryLog.objects.filter(created_at__gte=since).values('language').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # Intent analysis
-    intent_stats = QueryLog.objects.filter(
-        created_at__gte=since,
-        intent_detected__isnull=False
-    ).exclude(intent_detected='').values('intent_detected').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
-    
-    # Performance metrics
-    avg_response_time = QueryLog.objects.filter(created_at__gte=since).aggregate(
-        avg_time=Avg('processing_time')
-    )['avg_time'] or 0
-    
-    # Satisfaction metrics
-    satisfaction_stats = QueryLog.objects.filter(
-        created_at__gte=since,
-        satisfaction_score__isnull=False
-    ).aggregate(
-        avg_satisfaction=Avg('satisfaction_score'),
-        total_ratings=Count('satisfaction_score')
-    )
-    
-    # API usage and costs
-    api_stats = APIUsageLog.objects.filter(timestamp__gte=since).aggregate(
-        total_calls=Count('id'),
-        success_rate=Avg('success'),
-        avg_response_time=Avg('response_time'),
-        total_cost=Sum('estimated_cost')
-    )
     
-    # Recent feedback
-    recent_feedback = FeedbackReport.objects.filter(
-        created_at__gte=since
-    ).order_by('-created_at')[:5]
+    # Served from the periodically refreshed snapshot; no log queries here
+    snapshot = dashboard_snapshots.get(days)
     
-    # System health
-    gemini_availability = APIUsageLog.objects.filter(
-        service='gemini',
-        timestamp__gte=since
-    ).aggregate(
-        success_rate=Avg('success')
-    )['success_rate'] or 0
-    
-    context = {
-        'days': days,
-        'total_queries': total_queries,
-        'unique_users': unique_users,
-        'active_sessions': active_sessions,
-        'source_stats': list(source_stats),
-        'language_stats': list(language_stats),
-        'intent_stats': list(intent_stats),
-        'avg_response_time': round(avg_response_time, 2),
-        'satisfaction_stats': satisfaction_stats,
-        'api_stats': api_stats,
-        'recent_feedback': recent_feedback,
-        'gemini_availability': round(gemini_availability * 100, 1) if gemini_availability else 0,
-    }
+    context = dict(snapshot)
+    context['snapshot_at'] = snapshot['generated_at']
     
     return render(request, 'adminpanel/dashboard.html', context)
 
@@ -118,6 +62,9 @@ def analytics_api(request):
     days = int(request.GET.get('days', 30))
     since = timezone.now() - timedelta(days=days)
     
+    if chart_type != 'real_time_stats':
+        rollup_engine.run_if_stale()
+    
     if chart_type == 'usage_over_time':
         # Daily usage chart
         daily_stats = DailyStats.objects.filter(
@@ -144,9 +91,12 @@ def analytics_api(request):
     
     elif chart_type == 'source_breakdown':
         # Response source pie chart
-        source_stats = QueryLog.objects.filter(created_at__gte=since).values('response_source').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        source_stats = [
+            {'response_source': source, 'count': count}
+            for source, count in sorted(
+                rollup_engine.summarize(since)['source_counts'].items(), key=lambda item: -item[1]
+            )
+        ]
         
         # Map source names to display names
         source_names = {
@@ -172,9 +122,12 @@ def analytics_api(request):
     
     elif chart_type == 'language_usage':
         # Language usage chart
-        language_stats = QueryLog.objects.filter(created_at__gte=since).values('language').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        language_stats = [
+            {'language': language, 'count': count}
+            for language, count in sorted(
+                rollup_engine.summarize(since)['language_counts'].items(), key=lambda item: -item[1]
+            )
+        ]
         
         language_names = {
             'english': 'English',
@@ -194,32 +147,41 @@ def analytics_api(request):
         }
     
     elif chart_type == 'response_times':
-        # Response time distribution
-        time_ranges = [
-            ('0-1s', 0, 1),
-            ('1-2s', 1, 2),
-            ('2-5s', 2, 5),
-            ('5-10s', 5, 10),
-            ('10s+', 10, float('inf'))
-        ]
+        # Response time distribution with percentiles from merged latency sketches
+        histogram = rollup_engine.summarize(since)['latency_histogram']
+        sketch = query_sketch(
+            since,
+            source=request.GET.get('source') or None,
+            intent=request.GET.get('intent') or None
+        )
         
-        data = {'labels': [], 'datasets': [{'data': [], 'backgroundColor': '#4C9EF6'}]}
+        data = {
+            'labels': list(histogram.keys()),
+            'datasets': [{'data': list(histogram.values()), 'backgroundColor': '#4C9EF6'}],
+            'percentiles': sketch.percentiles(),
+            'sample_count': sketch.count,
+        }
+    
+    elif chart_type == 'latency_percentiles':
+        # p50 / p95 / p99 per response source
+        per_source = sketches_by_source(since)
+        sources = sorted(per_source, key=lambda source: -per_source[source].count)
         
-        for label, min_time, max_time in time_ranges:
-            if max_time == float('inf'):
-                count = QueryLog.objects.filter(
-                    created_at__gte=since,
-                    processing_time__gte=min_time
-                ).count()
-            else:
-                count = QueryLog.objects.filter(
-                    created_at__gte=since,
-                    processing_time__gte=min_time,
-                    processing_time__lt=max_time
-                ).count()
-            
-            data['labels'].append(label)
-            data['datasets'][0]['data'].append(count)
+        data = {
+            'labels': sources,
+            'datasets': [
+                {
+                    'label': label,
+                    'data': [per_source[source].quantile(q) for source in sources],
+                    'backgroundColor': color,
+                }
+                for label, q, color in [
+                    ('p50', 0.50, '#10B981'),
+                    ('p95', 0.95, '#F59E0B'),
+                    ('p99', 0.99, '#EF4444'),
+                ]
+            ]
+        }
     
     elif chart_type == 'satisfaction_trends':
         # Satisfaction over time
@@ -249,25 +211,10 @@ def analytics_api(request):
         }
     
     elif chart_type == 'real_time_stats':
-        # Real-time statistics
-        now = timezone.now()
-        last_hour = now - timedelta(hours=1)
-        last_24h = now - timedelta(hours=24)
-        
-        data = {
-            'queries_last_hour': QueryLog.objects.filter(created_at__gte=last_hour).count(),
-            'queries_last_24h': QueryLog.objects.filter(created_at__gte=last_24h).count(),
-            'active_sessions': ConversationSession.objects.filter(
-                last_activity__gte=last_hour
-            ).count(),
-            'gemini_success_rate': APIUsageLog.objects.filter(
-                service='gemini',
-                timestamp__gte=last_24h
-            ).aggregate(success_rate=Avg('success'))['success_rate'] or 0,
-            'avg_response_time_1h': QueryLog.objects.filter(
-                created_at__gte=last_hour
-            ).aggregate(avg=Avg('processing_time'))['avg'] or 0,
-        }
+        # Real-time statistics from the cached dashboard snapshot
+        snapshot = dashboard_snapshots.get(days)
+        data = dict(snapshot['real_time'])
+        data['generated_at'] = snapshot['generated_at'].isoformat()
     
     else:
         data = {'error': 'Unknown chart type'}
@@ -275,20 +222,58 @@ def analytics_api(request):
     return JsonResponse(data)
 
 
+@login_required
+@user_passes_test(is_admin_user)
+def live_stream(request):
+    """Server-sent events for the dashboard: deltas as they are logged plus
+    a compact snapshot whenever the background refresh recomputes one
+    
+    Each stream ends after LIVE_STREAM_MAX_SECONDS so it never holds a worker
+    indefinitely; the browser reconnects after the ``retry`` delay and starts
+    again from a fresh snapshot."""
+    
+    days = int(request.GET.get('days', 30))
+    heartbeat = 15  # seconds; also keeps the snapshot window tracked
+    max_seconds = getattr(settings, 'KONSULTABOT_SETTINGS', {}).get('LIVE_STREAM_MAX_SECONDS', 300)
+    
+    def events():
+        subscription = live_metrics.subscribe(days)
+        try:
+            snapshot = dashboard_snapshots.get(days)
+            yield 'retry: 5000\n\n'
+            yield live_metrics.encode('snapshot', dashboard_snapshots.compact(snapshot))
+            ends_at = time.monotonic() + max_seconds
+            while time.monotonic() < ends_at:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    dashboard_snapshots.get(days)
+                    yield ': keepalive\n\n'
+                else:
+                    yield message
+        finally:
+            live_metrics.unsubscribe(subscription)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @user_passes_test(is_admin_user)
 def query_logs(request):
-    """View detailed query logs"""
+    """View detailed query logs, newest first, with keyset pagination"""
     
     # Filters
     source_filter = request.GET.get('source', '')
     language_filter = request.GET.get('language', '')
     intent_filter = request.GET.get('intent', '')
+    search = request.GET.get('q', '').strip()
     date_from = request.GET.get('date_from', '')
     date_to = request.GET.get('date_to', '')
     
     # Base queryset
-    queryset = QueryLog.objects.all().order_by('-created_at')
+    queryset = QueryLog.objects.all()
     
     # Apply filters
     if source_filter:
@@ -300,34 +285,39 @@ def query_logs(request):
     if intent_filter:
         queryset = queryset.filter(intent_detected=intent_filter)
     
+    if search:
+        queryset = queryset.filter(search_filter(search))
+    
     if date_from:
         queryset = queryset.filter(created_at__gte=date_from)
     
     if date_to:
         queryset = queryset.filter(created_at__lte=date_to)
     
-    # Pagination
-    paginator = Paginator(queryset, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Get filter options
-    sources = QueryLog.objects.values_list('response_source', flat=True).distinct()
-    languages = QueryLog.objects.values_list('language', flat=True).distinct()
-    intents = QueryLog.objects.exclude(intent_detected='').values_list('intent_detected', flat=True).distinct()
+    # Pagination: cursors instead of page numbers, so deep pages stay cheap
+    try:
+        page_obj = browse(
+            queryset,
+            after=request.GET.get('after') or None,
+            before=request.GET.get('before') or None,
+        )
+    except ValueError:
+        page_obj = browse(queryset)
+    
+    current_filters = {
+        'source': source_filter,
+        'language': language_filter,
+        'intent': intent_filter,
+        'q': search,
+        'date_from': date_from,
+        'date_to': date_to,
+    }
     
     context = {
         'page_obj': page_obj,
-        'sources': sources,
-        'languages': languages,
-        'intents': intents,
-        'current_filters': {
-            'source': source_filter,
-            'language': language_filter,
-            'intent': intent_filter,
-            'date_from': date_from,
-            'date_to': date_to,
-        }
+        **query_log_facets.get(),
+        'current_filters': current_filters,
+        'filter_query': urlencode({key: value for key, value in current_filters.items() if value}),
     }
     
     return render(request, 'adminpanel/query_logs.html', context)
@@ -391,28 +381,9 @@ def system_health(request):
         timestamp__gte=timezone.now() - timedelta(hours=24)
     ).order_by('-timestamp')[:100]
     
-    # API health
-    api_health = {}
-    for service in ['gemini', 'google_speech', 'google_translate', 'google_tts']:
-        recent_calls = APIUsageLog.objects.filter(
-            service=service,
-            timestamp__gte=timezone.now() - timedelta(hours=24)
-        )
-        
-        if recent_calls.exists():
-            api_health[service] = {
-                'total_calls': recent_calls.count(),
-                'success_rate': recent_calls.filter(success=True).count() / recent_calls.count() * 100,
-                'avg_response_time': recent_calls.aggregate(avg=Avg('response_time'))['avg'] or 0,
-                'total_cost': recent_calls.aggregate(sum=Sum('estimated_cost'))['sum'] or 0,
-            }
-        else:
-            api_health[service] = {
-                'total_calls': 0,
-                'success_rate': 0,
-                'avg_response_time': 0,
-                'total_cost': 0,
-            }
+    # API health: one grouped query over the per-service health rollup
+    api_health.downsample_if_due()
+    service_health = api_health.window(timezone.now() - timedelta(hours=24))
     
     # Database statistics
     db_stats = {
@@ -424,8 +395,9 @@ def system_health(request):
     
     context = {
         'recent_metrics': recent_metrics,
-        'api_health': api_health,
+        'api_health': service_health,
         'db_stats': db_stats,
+        'cache_stats': cache_metrics(),
     }
     
     return render(request, 'adminpanel/system_health.html', context)
@@ -456,47 +428,97 @@ def resolve_feedback(request, feedback_id):
 @login_required
 @user_passes_test(is_admin_user)
 def export_data(request):
-    """Export analytics data in various formats"""
+    """Export analytics data in various formats
+    
+    Query parameters:
+        type: queries | api_usage
+        format: csv | jsonl | parquet | arrow
+        days: window size (default 30)
+        gzip: 1 to gzip the single-file download on the fly
+        partition: day to get one file per day inside a ZIP with a manifest
+        after_id / max_id: resume an interrupted export (max_id comes from
+            the X-Export-Max-Id header of the first response)
+    """
     
     export_type = request.GET.get('type', 'queries')
     format_type = request.GET.get('format', 'csv')
     days = int(request.GET.get('days', 30))
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+    partition = request.GET.get('partition', '')
+    
+    if export_type not in EXPORT_TYPES or format_type not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Export type not supported'}, status=400)
+    
+    content_type, extension, needs_pyarrow = EXPORT_FORMATS[format_type]
+    if needs_pyarrow and not PYARROW_AVAILABLE:
+        return JsonResponse({'error': f'{format_type} export requires pyarrow'}, status=400)
+    
+    try:
+        after_id = int(request.GET.get('after_id', 0))
+        max_id = int(request.GET['max_id']) if request.GET.get('max_id') else None
+    except ValueError:
+        return JsonResponse({'error': 'after_id and max_id must be integers'}, status=400)
     
     since = timezone.now() - timedelta(days=days)
+    exporter = AnalyticsExporter(export_type, since, after_id=after_id, max_id=max_id)
     
-    if export_type == 'queries':
-        queryset = QueryLog.objects.filter(created_at__gte=since)
-        
-        if format_type == 'csv':
-            import csv
-            from django.http import HttpResponse
-            
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="query_logs_{since.date()}_to_{timezone.now().date()}.csv"'
-            
-            writer = csv.writer(response)
-            writer.writerow([
-                'Date', 'User', 'Query', 'Response Source', 'Language', 
-                'Intent', 'Processing Time', 'Confidence', 'Satisfaction'
-            ])
-            
-            for query in queryset:
-                writer.writerow([
-                    query.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    query.user.username if query.user else 'Anonymous',
-                    query.query,
-                    query.response_source,
-                    query.language,
-                    query.intent_detected,
-                    query.processing_time,
-                    query.confidence_score,
-                    query.satisfaction_score,
-                ])
-            
-            return response
-    
-    # Add more export types as needed
-    return JsonResponse({'error': 'Export type not supported'})
+    filename = f'{export_type}_{since.date()}_to_{timezone.now().date()}'
+    if after_id:
+        filename += f'_after_{after_id}'
+    
+    if partition == 'day':
+        response = StreamingHttpResponse(
+            exporter.stream_partitioned(format_type, compress=compress),
+            content_type='application/zip'
+        )
+        filename += '.zip'
+    else:
+        response = StreamingHttpResponse(
+            exporter.stream(format_type, compress=compress),
+            content_type='application/gzip' if compress else content_type
+        )
+        filename += f'.{extension}' + ('.gz' if compress else '')
+    
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Export-Max-Id'] = str(exporter.max_id)
+    response['X-Export-After-Id'] = str(exporter.after_id)
+    return response
+
+
+@login_required
+@user_passes_test(is_admin_user)
+def archived_data(request):
+    """Stream archived log rows as NDJSON
+    
+    Query parameters:
+        table: query_log | api_usage_log | system_metrics | chat_message | conversation_session
+        start / end: ISO dates (end inclusive); omit to read every partition
+        manifest: 1 to list the archived partitions instead of rows
+    """
+    
+    table = request.GET.get('table', 'query_log')
+    if table not in RETENTION_TARGETS:
+        return JsonResponse({'error': 'Unknown archive table'}, status=400)
+    
+    if request.GET.get('manifest'):
+        return JsonResponse({'partitions': retention_manager.partitions(table)})
+    
+    try:
+        start = end = None
+        if request.GET.get('start'):
+            start = timezone.make_aware(datetime.strptime(request.GET['start'], '%Y-%m-%d'))
+        if request.GET.get('end'):
+            end = timezone.make_aware(datetime.strptime(request.GET['end'], '%Y-%m-%d')) + timedelta(days=1)
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be YYYY-MM-DD'}, status=400)
+    
+    rows = retention_manager.read(table, start, end)
+    response = StreamingHttpResponse(
+        (json.dumps(row) + '\n' for row in rows),
+        content_type='application/x-ndjson'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{table}_archive.jsonl"'
+    return response
 
 
 @login_required
@@ -507,16 +529,14 @@ def generate_report(request):
     days = int(request.GET.get('days', 30))
     since = timezone.now() - timedelta(days=days)
     
-    # Generate daily stats for the period
-    current_date = since.date()
+    # Only log rows past the rollup watermark are processed; daily stats for
+    # every day they touch are refreshed as part of the same run
     end_date = timezone.now().date()
-    
-    while current_date <= end_date:
-        DailyStats.generate_daily_stats(current_date)
-        current_date += timedelta(days=1)
+    processed = rollup_engine.run()
     
     return JsonResponse({
         'success': True,
         'message': f'Report generated for {days} days',
-        'period': f'{since.date()} to {end_date}'
+        'period': f'{since.date()} to {end_date}',
+        'rows_processed': processed,
     })
@@ -0,0 +1,145 @@
+"""
+Materialized API Health Rollups for KonsultaBot
+
+``APIUsageLog.log_api_call`` adds every call to a per-service, per-minute
+``APIHealthBucket``. Minute buckets older than a day are folded into hour
+buckets, and hour buckets older than ``API_HEALTH_HOUR_RETENTION_DAYS`` into
+day buckets, so every stretch of time is covered by exactly one resolution.
+A rolling-window read is then a single grouped query over a small indexed
+table.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from analytics.models import APIHealthBucket, APIUsageLog
+
+logger = logging.getLogger('konsultabot.analytics')
+
+
+class APIHealthRollup:
+    """Rolling-window reads and downsampling for ``APIHealthBucket``"""
+
+    DOWNSAMPLE_KEY = 'analytics:api_health:downsampled'
+
+    # (source resolution, target resolution, truncation)
+    DOWNSAMPLE_STEPS = [
+        ('minute', 'hour', TruncHour),
+        ('hour', 'day', TruncDay),
+    ]
+
+    def __init__(self):
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.minute_retention = timedelta(hours=konsultabot_settings.get('API_HEALTH_MINUTE_RETENTION_HOURS', 24))
+        self.hour_retention = timedelta(days=konsultabot_settings.get('API_HEALTH_HOUR_RETENTION_DAYS', 30))
+        self.downsample_interval = 300
+
+    @property
+    def services(self):
+        return [service for service, _ in APIUsageLog.API_SERVICE_CHOICES]
+
+    def window(self, since, until=None):
+        """Per-service totals for a window: ``{service: {calls, errors, ...}}``"""
+        buckets = APIHealthBucket.objects.filter(bucket_start__gte=since)
+        if until is not None:
+            buckets = buckets.filter(bucket_start__lt=until)
+
+        rows = buckets.values('service').annotate(
+            calls=Sum('calls'),
+            errors=Sum('errors'),
+            latency_sum=Sum('latency_sum'),
+            latency_max=Max('latency_max'),
+            cost=Sum('cost'),
+        ).order_by()
+
+        health = {service: self._health(None) for service in self.services}
+        for row in rows:
+            health[row['service']] = self._health(row)
+        return health
+
+    @staticmethod
+    def _health(row):
+        calls = row['calls'] if row else 0
+        if not calls:
+            return {
+                'total_calls': 0,
+                'errors': 0,
+                'success_rate': 0,
+                'avg_response_time': 0,
+                'max_response_time': 0,
+                'total_cost': 0,
+            }
+        return {
+            'total_calls': calls,
+            'errors': row['errors'],
+            'success_rate': (calls - row['errors']) / calls * 100,
+            'avg_response_time': row['latency_sum'] / calls,
+            'max_response_time': row['latency_max'],
+            'total_cost': row['cost'],
+        }
+
+    def series(self, service, since, resolution='minute'):
+        """Time series of one service's buckets at a given resolution"""
+        return list(
+            APIHealthBucket.objects.filter(
+                service=service, resolution=resolution, bucket_start__gte=since
+            ).order_by('bucket_start').values(
+                'bucket_start', 'calls', 'errors', 'latency_sum', 'latency_max', 'cost'
+            )
+        )
+
+    def downsample(self, now=None):
+        """Fold expired minute buckets into hours and expired hours into days"""
+        now = now or timezone.now()
+        cutoffs = {
+            'minute': timezone.localtime(now - self.minute_retention).replace(minute=0, second=0, microsecond=0),
+            'hour': timezone.localtime(now - self.hour_retention).replace(hour=0, minute=0, second=0, microsecond=0),
+        }
+
+        folded = 0
+        for source, target, trunc in self.DOWNSAMPLE_STEPS:
+            with transaction.atomic():
+                expired = APIHealthBucket.objects.filter(resolution=source, bucket_start__lt=cutoffs[source])
+                rows = list(
+                    expired.annotate(period=trunc('bucket_start'))
+                    .values('service', 'period')
+                    .annotate(
+                        calls=Sum('calls'),
+                        errors=Sum('errors'),
+                        latency_sum=Sum('latency_sum'),
+                        latency_max=Max('latency_max'),
+                        cost=Sum('cost'),
+                    )
+                    .order_by()
+                )
+                for row in rows:
+                    APIHealthBucket.add_to_bucket(
+                        row['service'], target, row['period'],
+                        calls=row['calls'], errors=row['errors'],
+                        latency_sum=row['latency_sum'], latency_max=row['latency_max'],
+                        cost=row['cost']
+                    )
+                deleted, _ = expired.delete()
+                folded += deleted
+
+        if folded:
+            logger.info(f"API health downsampling folded {folded} buckets")
+        return folded
+
+    def downsample_if_due(self):
+        """Downsample at most once per ``downsample_interval`` seconds"""
+        if cache.add(self.DOWNSAMPLE_KEY, True, self.downsample_interval):
+            try:
+                self.downsample()
+            except Exception as e:
+                logger.error(f"API health downsampling failed: {e}")
+
+
+# Global instance
+api_health = APIHealthRollup()
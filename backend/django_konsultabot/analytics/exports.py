@@ -0,0 +1,318 @@
+"""
+Streaming Analytics Export for KonsultaBot
+
+Rows are read with a server-side cursor (``.iterator()``) over a
+``values_list`` projection, with the user name joined in the same query, and
+encoded chunk by chunk, so memory stays bounded however large the export is.
+Supported encodings are CSV, JSONL, Parquet and Arrow IPC (the last two need
+pyarrow). Output can be gzip-compressed on the fly or split into one file per
+day inside a streamed ZIP. Rows are ordered by id, and an export is pinned
+to the highest id present when it started, so an interrupted download can
+resume with ``after_id`` set to the last id received.
+"""
+import csv
+import io
+import json
+import logging
+import zipfile
+import zlib
+from datetime import timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+from analytics.models import APIUsageLog, QueryLog
+
+logger = logging.getLogger('konsultabot.analytics')
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+
+# Export type -> (model, timestamp field, [(field, CSV header, arrow type)])
+EXPORT_TYPES = {
+    'queries': (QueryLog, 'created_at', [
+        ('id', 'ID', 'int64'),
+        ('created_at', 'Date', 'timestamp'),
+        ('user__username', 'User', 'string'),
+        ('query', 'Query', 'string'),
+        ('response_source', 'Response Source', 'string'),
+        ('language', 'Language', 'string'),
+        ('intent_detected', 'Intent', 'string'),
+        ('processing_time', 'Processing Time', 'float64'),
+        ('confidence_score', 'Confidence', 'float64'),
+        ('satisfaction_score', 'Satisfaction', 'int64'),
+    ]),
+    'api_usage': (APIUsageLog, 'timestamp', [
+        ('id', 'ID', 'int64'),
+        ('timestamp', 'Date', 'timestamp'),
+        ('service', 'Service', 'string'),
+        ('endpoint', 'Endpoint', 'string'),
+        ('success', 'Success', 'bool'),
+        ('http_status', 'HTTP Status', 'int64'),
+        ('response_time', 'Response Time', 'float64'),
+        ('request_size', 'Request Size', 'int64'),
+        ('response_size', 'Response Size', 'int64'),
+        ('estimated_cost', 'Estimated Cost', 'float64'),
+    ]),
+}
+
+# Format -> (content type, file extension, needs pyarrow)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', False),
+    'jsonl': ('application/x-ndjson', 'jsonl', False),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', True),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow', True),
+}
+
+
+class _DrainBuffer:
+    """Write-only file object whose contents are collected and handed out in pieces"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Parquet records column chunk offsets; ZIP falls back to streaming mode without seek()
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class AnalyticsExporter:
+    """Stream one export type between two datetimes in a chosen format"""
+
+    def __init__(self, export_type, since, until=None, after_id=0, max_id=None, chunk_size=2000):
+        if export_type not in EXPORT_TYPES:
+            raise ValueError(f"Unsupported export type: {export_type}")
+
+        self.export_type = export_type
+        self.model, self.time_field, self.columns = EXPORT_TYPES[export_type]
+        self.since = since
+        self.until = until or timezone.now()
+        self.after_id = after_id
+        self.chunk_size = chunk_size
+
+        # Pin the upper id bound so resumed downloads see the same rows
+        if max_id is None:
+            last = self.model.objects.order_by('-id').values_list('id', flat=True).first()
+            max_id = last or 0
+        self.max_id = max_id
+
+    @property
+    def fields(self):
+        return [field for field, _, _ in self.columns]
+
+    def rows(self, start=None, end=None):
+        """Yield value tuples in id order through a server-side cursor"""
+        queryset = self.model.objects.filter(
+            **{
+                f'{self.time_field}__gte': start or self.since,
+                f'{self.time_field}__lt': end or self.until,
+            },
+            id__gt=self.after_id,
+            id__lte=self.max_id,
+        ).order_by('id').values_list(*self.fields)
+        return queryset.iterator(chunk_size=self.chunk_size)
+
+    # ------------------------------------------------------------------
+    # Encoders: each turns row tuples into an iterator of byte chunks
+    # ------------------------------------------------------------------
+
+    def encode(self, export_format, rows):
+        return getattr(self, f'_encode_{export_format}')(rows)
+
+    def _encode_csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for _, header, _ in self.columns])
+
+        for chunk in _chunked(rows, self.chunk_size):
+            for row in chunk:
+                writer.writerow([self._csv_value(field, value) for (field, _, _), value in zip(self.columns, row)])
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    @staticmethod
+    def _csv_value(field, value):
+        if field == 'user__username':
+            return value or 'Anonymous'
+        if hasattr(value, 'strftime'):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return value
+
+    def _encode_jsonl(self, rows):
+        fields = self.fields
+        for chunk in _chunked(rows, self.chunk_size):
+            lines = [json.dumps(dict(zip(fields, row)), default=self._json_default) for row in chunk]
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+    @staticmethod
+    def _json_default(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return float(value)  # Decimal
+
+    def _arrow_schema(self):
+        types = {
+            'int64': pa.int64(),
+            'float64': pa.float64(),
+            'string': pa.string(),
+            'bool': pa.bool_(),
+            'timestamp': pa.timestamp('us', tz='UTC'),
+        }
+        return pa.schema([(field, types[kind]) for field, _, kind in self.columns])
+
+    def _record_batches(self, rows, schema):
+        float_columns = {index for index, (_, _, kind) in enumerate(self.columns) if kind == 'float64'}
+        for chunk in _chunked(rows, self.chunk_size):
+            columns = list(zip(*chunk))
+            arrays = [
+                [float(v) if v is not None else None for v in column] if index in float_columns else list(column)
+                for index, column in enumerate(columns)
+            ]
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=schema.field(index).type) for index, values in enumerate(arrays)],
+                schema=schema
+            )
+
+    def _encode_parquet(self, rows):
+        schema = self._arrow_schema()
+        sink = _DrainBuffer()
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        try:
+            # Each batch becomes a row group and is flushed to the client
+            for batch in self._record_batches(rows, schema):
+                writer.write_batch(batch)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def _encode_arrow(self, rows):
+        schema = self._arrow_schema()
+        sink = _DrainBuffer()
+        writer = pa.ipc.new_stream(sink, schema)
+        try:
+            for batch in self._record_batches(rows, schema):
+                writer.write_batch(batch)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    # ------------------------------------------------------------------
+    # Output assembly
+    # ------------------------------------------------------------------
+
+    def stream(self, export_format, compress=False):
+        """Single-file export as an iterator of byte chunks"""
+        chunks = (chunk for chunk in self.encode(export_format, self.rows()) if chunk)
+        return _gzip(chunks) if compress else chunks
+
+    def stream_partitioned(self, export_format, compress=True):
+        """One file per local day, streamed as a ZIP with a manifest"""
+        _, extension, _ = EXPORT_FORMATS[export_format]
+        sink = _DrainBuffer()
+        manifest = {
+            'export_type': self.export_type,
+            'format': export_format,
+            'since': self.since.isoformat(),
+            'until': self.until.isoformat(),
+            'after_id': self.after_id,
+            'max_id': self.max_id,
+            'partitions': [],
+        }
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+
+        with zipfile.ZipFile(sink, mode='w', compression=compression) as archive:
+            day = timezone.localtime(self.since).replace(hour=0, minute=0, second=0, microsecond=0)
+            while day < self.until:
+                next_day = day + timedelta(days=1)
+                rows = self.rows(max(day, self.since), min(next_day, self.until))
+                first = next(rows, None)
+                if first is not None:
+                    counted = _CountingRows(first, rows)
+                    name = f'{self.export_type}/date={day:%Y-%m-%d}/part-0.{extension}'
+                    with archive.open(name, mode='w', force_zip64=True) as entry:
+                        for chunk in self.encode(export_format, counted):
+                            entry.write(chunk)
+                            yield sink.drain()
+                    manifest['partitions'].append({
+                        'date': f'{day:%Y-%m-%d}',
+                        'file': name,
+                        'rows': counted.count,
+                        'first_id': first[0],
+                        'last_id': counted.last[0],
+                    })
+                    yield sink.drain()
+                day = next_day
+
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+        yield sink.drain()
+
+
+class _CountingRows:
+    """Re-attach a peeked first row and remember the count and last row seen"""
+
+    def __init__(self, first, rest):
+        self._first = first
+        self._rest = rest
+        self.count = 0
+        self.last = first
+
+    def __iter__(self):
+        for row in self._iter_all():
+            self.count += 1
+            self.last = row
+            yield row
+
+    def _iter_all(self):
+        yield self._first
+        yield from self._rest
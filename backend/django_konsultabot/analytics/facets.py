@@ -0,0 +1,72 @@
+"""
+Cached Filter Facets for the Query Log Browser
+
+The distinct sources, languages and intents offered as filters are computed
+once and cached. ``QueryLog.save`` adds any value it has not seen to the
+cached sets, so new values appear immediately without rescanning the table.
+The cache expires after ``FACET_TTL`` seconds, which drops values whose rows
+have since been archived.
+"""
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger('konsultabot.analytics')
+
+
+class QueryLogFacets:
+    """Distinct filter values for ``QueryLog``"""
+
+    CACHE_KEY = 'analytics:querylog_facets'
+    FACET_TTL = 3600
+
+    # Facet name -> QueryLog field
+    FIELDS = {
+        'sources': 'response_source',
+        'languages': 'language',
+        'intents': 'intent_detected',
+    }
+
+    def get(self):
+        """``{'sources': [...], 'languages': [...], 'intents': [...]}``"""
+        facets = cache.get(self.CACHE_KEY)
+        if facets is None:
+            facets = self.compute()
+            cache.set(self.CACHE_KEY, facets, self.FACET_TTL)
+        return {name: sorted(values) for name, values in facets.items()}
+
+    def compute(self):
+        from analytics.models import QueryLog
+
+        # Each field leads one of the browser indexes, so these are index scans
+        return {
+            name: set(
+                QueryLog.objects.exclude(**{field: ''}).order_by()
+                .values_list(field, flat=True).distinct()
+            )
+            for name, field in self.FIELDS.items()
+        }
+
+    def observe(self, log):
+        """Add a new log's values to the cached facets if they are missing"""
+        try:
+            facets = cache.get(self.CACHE_KEY)
+            if facets is None:
+                return
+            changed = False
+            for name, field in self.FIELDS.items():
+                value = getattr(log, field)
+                if value and value not in facets[name]:
+                    facets[name].add(value)
+                    changed = True
+            if changed:
+                cache.set(self.CACHE_KEY, facets, self.FACET_TTL)
+        except Exception as e:
+            logger.debug(f"Could not update query log facets: {e}")
+
+    def invalidate(self):
+        cache.delete(self.CACHE_KEY)
+
+
+# Global instance
+query_log_facets = QueryLogFacets()
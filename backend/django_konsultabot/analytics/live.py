@@ -0,0 +1,101 @@
+"""
+Live Dashboard Event Hub for KonsultaBot Analytics
+
+The logging path publishes small deltas (a new query with its source and
+latency, an API call, a feedback report) and the snapshot service publishes
+a compact snapshot whenever it refreshes a window. Each event is serialized
+once and fanned out to every open dashboard stream through a bounded
+in-memory queue, so N dashboards cost N queue puts instead of N polling
+query sets. A dashboard that falls behind loses deltas, not the server; the
+next snapshot brings it back in line.
+
+The hub is per process: with several worker processes each one fans out the
+events logged in that process, and snapshots keep every dashboard correct.
+"""
+import itertools
+import json
+import logging
+import queue
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger('konsultabot.analytics')
+
+
+class Subscription:
+    """One open dashboard stream"""
+
+    def __init__(self, days=None, maxsize=256):
+        self.days = days
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def offer(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout):
+        """Next encoded message, or None when ``timeout`` seconds pass quietly"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LiveMetricsHub:
+    """Publish analytics events to every subscribed dashboard"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, days=None):
+        subscription = Subscription(days)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+        if subscription.dropped:
+            logger.debug(f"Live dashboard stream dropped {subscription.dropped} events")
+
+    @staticmethod
+    def encode(event, data, event_id=None):
+        """Server-sent event frame"""
+        lines = []
+        if event_id is not None:
+            lines.append(f'id: {event_id}')
+        lines.append(f'event: {event}')
+        lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))}')
+        return '\n'.join(lines) + '\n\n'
+
+    def publish(self, event, data, days=None):
+        """Send an event to all subscribers (or only those watching ``days``)"""
+        if not self._subscriptions:
+            return
+        with self._lock:
+            targets = [s for s in self._subscriptions if days is None or s.days == days]
+        if not targets:
+            return
+
+        try:
+            message = self.encode(event, data, next(self._ids))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Could not encode live {event} event: {e}")
+            return
+        for subscription in targets:
+            subscription.offer(message)
+
+
+# Global instance
+live_metrics = LiveMetricsHub()
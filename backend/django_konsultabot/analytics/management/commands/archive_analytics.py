@@ -0,0 +1,44 @@
+"""
+Archive old log rows to compressed daily files and delete them
+
+Intended to run nightly from cron / Task Scheduler, after rollup_analytics.
+On SQLite it finishes with PRAGMA optimize and an incremental vacuum:
+
+    python manage.py archive_analytics
+    python manage.py archive_analytics --table query_log --dry-run
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from analytics.retention import RETENTION_TARGETS, retention_manager
+from analytics.rollups import rollup_engine
+from sqlite_store import optimize
+
+
+class Command(BaseCommand):
+    help = 'Move log rows past their retention age into the compressed archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table', choices=sorted(RETENTION_TARGETS), action='append',
+            help='Only archive this table (may be repeated)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report how many rows would be archived without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            # Make sure the rollups have seen every row before it leaves the database
+            rollup_engine.run()
+
+        for name in options['table'] or RETENTION_TARGETS:
+            count = retention_manager.archive(name, dry_run=options['dry_run'])
+            verb = 'Would archive' if options['dry_run'] else 'Archived'
+            self.stdout.write(f'{verb} {count} {name} rows')
+
+        if connection.vendor == 'sqlite' and not options['dry_run']:
+            # Refresh planner statistics and hand freed pages back after the deletes
+            reclaimed = optimize(connection)
+            self.stdout.write(f'Optimized database, reclaimed {reclaimed} pages')
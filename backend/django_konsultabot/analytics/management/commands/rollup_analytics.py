@@ -0,0 +1,38 @@
+"""
+Fold new QueryLog and APIUsageLog rows into the analytics rollups
+
+Intended to run from cron / Task Scheduler every minute or so:
+
+    python manage.py rollup_analytics
+    python manage.py rollup_analytics --refresh-days 7   # rebuild the last week
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analytics.api_health import api_health
+from analytics.rollups import rollup_engine
+
+
+class Command(BaseCommand):
+    help = 'Incrementally update hourly and daily analytics rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--refresh-days', type=int, default=0,
+            help='Also recompute every bucket for the last N days'
+        )
+
+    def handle(self, *args, **options):
+        processed = rollup_engine.run()
+        self.stdout.write(f'Processed {processed} new log rows')
+
+        folded = api_health.downsample()
+        self.stdout.write(f'Downsampled {folded} API health buckets')
+
+        refresh_days = options['refresh_days']
+        if refresh_days:
+            now = timezone.now()
+            hours = rollup_engine.refresh_range(now - timedelta(days=refresh_days), now)
+            self.stdout.write(f'Recomputed {hours} hourly buckets')
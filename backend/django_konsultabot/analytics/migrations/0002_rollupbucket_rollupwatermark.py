@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('total_queries', models.IntegerField(default=0)),
+                ('processing_time_total', models.FloatField(default=0.0)),
+                ('unique_users', models.IntegerField(default=0)),
+                ('user_ids', models.JSONField(blank=True, default=list)),
+                ('source_counts', models.JSONField(blank=True, default=dict)),
+                ('language_counts', models.JSONField(blank=True, default=dict)),
+                ('intent_counts', models.JSONField(blank=True, default=dict)),
+                ('latency_histogram', models.JSONField(blank=True, default=dict)),
+                ('satisfaction_total', models.IntegerField(default=0)),
+                ('satisfaction_count', models.IntegerField(default=0)),
+                ('positive_feedback', models.IntegerField(default=0)),
+                ('negative_feedback', models.IntegerField(default=0)),
+                ('api_calls', models.IntegerField(default=0)),
+                ('api_successes', models.IntegerField(default=0)),
+                ('api_response_time_total', models.FloatField(default=0.0)),
+                ('api_cost_total', models.FloatField(default=0.0)),
+                ('api_services', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['granularity', 'bucket_start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='rollupbucket',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start'), name='analytics_rollup_bucket_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_rollupbucket_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatencySketchBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('response_source', models.CharField(max_length=30)),
+                ('intent_detected', models.CharField(blank=True, max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('sketch', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='latencysketchbucket',
+            constraint=models.UniqueConstraint(fields=('bucket_start', 'response_source', 'intent_detected'), name='analytics_latency_sketch_uniq'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncHour
+
+
+def backfill_api_health(apps, schema_editor):
+    """Seed hour buckets from existing APIUsageLog rows"""
+    APIUsageLog = apps.get_model('analytics', 'APIUsageLog')
+    APIHealthBucket = apps.get_model('analytics', 'APIHealthBucket')
+
+    rows = (
+        APIUsageLog.objects.annotate(period=TruncHour('timestamp'))
+        .values('service', 'period')
+        .annotate(
+            calls=Count('id'),
+            errors=Count('id', filter=Q(success=False)),
+            latency_sum=Sum('response_time'),
+            latency_max=Max('response_time'),
+            cost=Sum('estimated_cost'),
+        )
+        .order_by()
+    )
+    APIHealthBucket.objects.bulk_create([
+        APIHealthBucket(
+            service=row['service'],
+            resolution='hour',
+            bucket_start=row['period'],
+            calls=row['calls'],
+            errors=row['errors'],
+            latency_sum=row['latency_sum'] or 0.0,
+            latency_max=row['latency_max'] or 0.0,
+            cost=float(row['cost'] or 0),
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_latencysketchbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIHealthBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(choices=[('gemini', 'Google Gemini'), ('google_speech', 'Google Cloud Speech'), ('google_translate', 'Google Cloud Translate'), ('google_tts', 'Google Cloud Text-to-Speech')], max_length=30)),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], default='minute', max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('calls', models.IntegerField(default=0)),
+                ('errors', models.IntegerField(default=0)),
+                ('latency_sum', models.FloatField(default=0.0)),
+                ('latency_max', models.FloatField(default=0.0)),
+                ('cost', models.FloatField(default=0.0)),
+            ],
+            options={
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['bucket_start', 'service'], name='analytics_apihealth_start_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='apihealthbucket',
+            constraint=models.UniqueConstraint(fields=('service', 'resolution', 'bucket_start'), name='analytics_apihealth_bucket_uniq'),
+        ),
+        migrations.RunPython(backfill_api_health, migrations.RunPython.noop),
+    ]
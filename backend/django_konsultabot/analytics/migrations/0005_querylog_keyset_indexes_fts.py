@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+FTS_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS analytics_querylog_fts
+    USING fts5(query, content='analytics_querylog', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS analytics_querylog_fts_insert AFTER INSERT ON analytics_querylog BEGIN
+        INSERT INTO analytics_querylog_fts(rowid, query) VALUES (new.id, new.query);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS analytics_querylog_fts_delete AFTER DELETE ON analytics_querylog BEGIN
+        INSERT INTO analytics_querylog_fts(analytics_querylog_fts, rowid, query) VALUES ('delete', old.id, old.query);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS analytics_querylog_fts_update AFTER UPDATE OF query ON analytics_querylog BEGIN
+        INSERT INTO analytics_querylog_fts(analytics_querylog_fts, rowid, query) VALUES ('delete', old.id, old.query);
+        INSERT INTO analytics_querylog_fts(rowid, query) VALUES (new.id, new.query);
+    END
+    """,
+    "INSERT INTO analytics_querylog_fts(analytics_querylog_fts) VALUES ('rebuild')",
+]
+
+FTS_REVERSE = [
+    "DROP TRIGGER IF EXISTS analytics_querylog_fts_update",
+    "DROP TRIGGER IF EXISTS analytics_querylog_fts_delete",
+    "DROP TRIGGER IF EXISTS analytics_querylog_fts_insert",
+    "DROP TABLE IF EXISTS analytics_querylog_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite-only; other backends fall back to icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_apihealthbucket'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='querylog',
+            name='analytics_q_created_9e28f5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='querylog',
+            name='analytics_q_respons_4398bf_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='querylog',
+            name='analytics_q_languag_494301_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='querylog',
+            name='analytics_q_intent__e074a7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='querylog',
+            index=models.Index(fields=['created_at', 'id'], name='analytics_querylog_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='querylog',
+            index=models.Index(fields=['response_source', 'created_at', 'id'], name='analytics_querylog_source_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='querylog',
+            index=models.Index(fields=['language', 'created_at', 'id'], name='analytics_querylog_lang_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='querylog',
+            index=models.Index(fields=['intent_detected', 'created_at', 'id'], name='analytics_querylog_intent_idx'),
+        ),
+        migrations.RunPython(_run(FTS_FORWARD), _run(FTS_REVERSE)),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations
+
+
+def move_pending_to_work_queue(apps, schema_editor):
+    """Enqueue unanswered offline queries on the shared work queue
+
+    The queue lives outside this migration's transaction, so a rerun after a
+    failure must not enqueue the same rows again: each job carries the legacy
+    row id and rows already on the queue (in any state) are skipped.
+    """
+    from work_queue import OFFLINE_QUERIES, get_queue
+
+    OfflineQuery = apps.get_model('analytics', 'OfflineQuery')
+    pending = OfflineQuery.objects.filter(is_processed=False).order_by('id')
+    queue = get_queue()
+    with queue.store.connection() as conn:
+        queued = {
+            row[0] for row in conn.execute(
+                "SELECT json_extract(payload, '$.legacy_id') FROM jobs "
+                "WHERE queue = ? AND json_extract(payload, '$.legacy_id') IS NOT NULL",
+                (OFFLINE_QUERIES,)
+            )
+        }
+    for row in pending.iterator():
+        if row.id in queued:
+            continue
+        queue.enqueue(OFFLINE_QUERIES, {
+            'query': row.query,
+            'language': row.language,
+            'metadata': row.metadata,
+            'legacy_id': row.id,
+        }, owner=row.user_id)
+    # Queued rows are now owned by the work queue; keep them out of the pending history
+    pending.update(is_processed=True, response='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_querylog_keyset_indexes_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_pending_to_work_queue, migrations.RunPython.noop),
+    ]
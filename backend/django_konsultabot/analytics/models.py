@@ -1,14 +1,18 @@
 """
 Analytics Models for KonsultaBot Advanced AI Platform
 """
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Avg, Count, Q
+from django.db.models import Avg, Count, Q, F, Value, FloatField
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
 from datetime import timedelta
 import json
 
+from analytics.facets import query_log_facets
+from analytics.live import live_metrics
+
 User = get_user_model()
 
 
@@ -77,16 +81,34 @@ class QueryLog(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['created_at']),
-            models.Index(fields=['response_source']),
-            models.Index(fields=['language']),
-            models.Index(fields=['intent_detected']),
+            # Keyset pagination walks (created_at, id); each browser filter
+            # gets its own prefix so filtered pages are index range scans
+            models.Index(fields=['created_at', 'id'], name='analytics_querylog_page_idx'),
+            models.Index(fields=['response_source', 'created_at', 'id'], name='analytics_querylog_source_idx'),
+            models.Index(fields=['language', 'created_at', 'id'], name='analytics_querylog_lang_idx'),
+            models.Index(fields=['intent_detected', 'created_at', 'id'], name='analytics_querylog_intent_idx'),
             models.Index(fields=['user', 'created_at']),
         ]
     
     def __str__(self):
         return f"Query: {self.query[:50]}... ({self.response_source})"
     
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new:
+            query_log_facets.observe(self)
+        if is_new and live_metrics.subscriber_count:
+            event = {
+                'id': self.id,
+                'created_at': self.created_at,
+                'response_source': self.response_source,
+                'language': self.language,
+                'processing_time': self.processing_time,
+                'user_id': self.user_id,
+            }
+            transaction.on_commit(lambda: live_metrics.publish('query', event))
+    
     @classmethod
     def get_usage_stats(cls, days=30):
         """Get usage statistics for the last N days"""
@@ -202,7 +224,10 @@ class UserSession(models.Model):
 
 
 class OfflineQuery(models.Model):
-    """Queue for offline queries to be processed when connection returns"""
+    """Offline queries recorded before the shared work queue (work_queue.py).
+
+    Kept as history; new offline queries are queued and replayed there.
+    """
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     query = models.TextField()
@@ -275,6 +300,19 @@ class FeedbackReport(models.Model):
     
     def __str__(self):
         return f"Feedback: {self.feedback_type} - {self.rating or self.is_positive}"
+    
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new and live_metrics.subscriber_count:
+            event = {
+                'id': self.id,
+                'created_at': self.created_at,
+                'feedback_type': self.feedback_type,
+                'rating': self.rating,
+                'is_positive': self.is_positive,
+            }
+            transaction.on_commit(lambda: live_metrics.publish('feedback', event))
 
 
 class APIUsageLog(models.Model):
@@ -319,8 +357,8 @@ class APIUsageLog(models.Model):
     def log_api_call(cls, service, success=True, response_time=0.0, 
                     request_size=0, response_size=0, error_message='', 
                     http_status=None, estimated_cost=None):
-        """Log an API call"""
-        return cls.objects.create(
+        """Log an API call and count it in the per-minute health rollup"""
+        log = cls.objects.create(
             service=service,
             success=success,
             response_time=response_time,
@@ -330,6 +368,19 @@ class APIUsageLog(models.Model):
             http_status=http_status,
             estimated_cost=estimated_cost
         )
+        APIHealthBucket.record_call(
+            service, success, response_time,
+            cost=float(estimated_cost or 0), timestamp=log.timestamp
+        )
+        if live_metrics.subscriber_count:
+            event = {
+                'service': service,
+                'success': success,
+                'response_time': response_time,
+                'timestamp': log.timestamp,
+            }
+            transaction.on_commit(lambda: live_metrics.publish('api_call', event))
+        return log
 
 
 class DailyStats(models.Model):
@@ -377,81 +428,229 @@ class DailyStats(models.Model):
     
     @classmethod
     def generate_daily_stats(cls, date=None):
-        """Generate daily statistics for a given date"""
+        """Generate daily statistics for a given date
+
+        Figures are copied from the daily rollup bucket, which the rollup
+        engine keeps up to date incrementally, so calling this repeatedly for
+        the same day is idempotent and does not rescan the query logs.
+        """
+        from analytics.rollups import rollup_engine
+
         if date is None:
-            date = timezone.now().date()
-        
-        # Get existing or create new
-        stats, created = cls.objects.get_or_create(date=date)
-        
-        # Calculate statistics for the day
-        day_start = timezone.datetime.combine(date, timezone.datetime.min.time())
-        day_end = day_start + timedelta(days=1)
-        
-        queries = QueryLog.objects.filter(
-            created_at__gte=day_start,
-            created_at__lt=day_end
-        )
-        
-        # Basic stats
-        stats.total_queries = queries.count()
-        stats.unique_users = queries.values('user').distinct().count()
-        stats.avg_response_time = queries.aggregate(
-            avg=Avg('processing_time')
-        )['avg'] or 0.0
-        
-        # Source breakdown
-        source_counts = queries.values('response_source').annotate(count=Count('id'))
-        for item in source_counts:
-            source = item['response_source']
-            count = item['count']
-            
-            if 'gemini' in source:
-                stats.gemini_queries += count
-            elif 'knowledge_base' in source:
-                stats.kb_queries += count
-            elif 'offline' in source:
-                stats.offline_queries += count
-            elif 'error' in source:
-                stats.error_queries += count
-        
-        # Language breakdown
-        lang_counts = queries.values('language').annotate(count=Count('id'))
-        for item in lang_counts:
-            lang = item['language']
-            count = item['count']
-            
-            if lang == 'english':
-                stats.english_queries = count
-            elif lang == 'tagalog':
-                stats.tagalog_queries = count
-            elif lang == 'bisaya':
-                stats.bisaya_queries = count
-            elif lang == 'waray':
-                stats.waray_queries = count
-            elif lang == 'spanish':
-                stats.spanish_queries = count
-        
-        # Satisfaction metrics
-        satisfaction_avg = queries.filter(
-            satisfaction_score__isnull=False
-        ).aggregate(avg=Avg('satisfaction_score'))['avg']
-        
-        if satisfaction_avg:
-            stats.avg_satisfaction = satisfaction_avg
-        
-        stats.positive_feedback = queries.filter(is_helpful=True).count()
-        stats.negative_feedback = queries.filter(is_helpful=False).count()
-        
-        # API success rate
-        api_calls = APIUsageLog.objects.filter(
-            timestamp__gte=day_start,
-            timestamp__lt=day_end
+            date = timezone.localdate()
+
+        rollup_engine.run()
+        stats = cls.objects.filter(date=date).first()
+        if stats is None:
+            stats, _ = cls.objects.get_or_create(date=date)
+        return stats
+
+    @classmethod
+    def sync_from_rollup(cls, bucket):
+        """Overwrite the row for a day from its daily ``RollupBucket``"""
+        sources = bucket.source_counts or {}
+        languages = bucket.language_counts or {}
+
+        # Same precedence as the original per-source classification
+        source_groups = {'gemini': 0, 'knowledge_base': 0, 'offline': 0, 'error': 0}
+        for source, count in sources.items():
+            for keyword in source_groups:
+                if keyword in source:
+                    source_groups[keyword] += count
+                    break
+
+        defaults = {
+            'total_queries': bucket.total_queries,
+            'unique_users': bucket.unique_users,
+            'avg_response_time': bucket.avg_processing_time,
+            'gemini_queries': source_groups['gemini'],
+            'kb_queries': source_groups['knowledge_base'],
+            'offline_queries': source_groups['offline'],
+            'error_queries': source_groups['error'],
+            'english_queries': languages.get('english', 0),
+            'tagalog_queries': languages.get('tagalog', 0),
+            'bisaya_queries': languages.get('bisaya', 0),
+            'waray_queries': languages.get('waray', 0),
+            'spanish_queries': languages.get('spanish', 0),
+            'avg_satisfaction': bucket.avg_satisfaction,
+            'positive_feedback': bucket.positive_feedback,
+            'negative_feedback': bucket.negative_feedback,
+            'api_success_rate': bucket.api_success_rate if bucket.api_calls else 100.0,
+        }
+        stats, _ = cls.objects.update_or_create(
+            date=timezone.localtime(bucket.bucket_start).date(),
+            defaults=defaults
         )
-        
-        if api_calls.exists():
-            success_rate = api_calls.filter(success=True).count() / api_calls.count() * 100
-            stats.api_success_rate = success_rate
-        
-        stats.save()
         return stats
+
+
+class RollupBucket(models.Model):
+    """Pre-aggregated QueryLog and APIUsageLog counters for one hour or one day
+
+    Buckets hold sums and counts rather than averages so they can be merged
+    across any window. They are written by ``analytics.rollups.RollupEngine``.
+    """
+
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+
+    # Query statistics
+    total_queries = models.IntegerField(default=0)
+    processing_time_total = models.FloatField(default=0.0)  # in seconds
+    unique_users = models.IntegerField(default=0)  # daily buckets only
+    user_ids = models.JSONField(default=list, blank=True)  # daily buckets only
+
+    # Breakdowns: {value: count}
+    source_counts = models.JSONField(default=dict, blank=True)
+    language_counts = models.JSONField(default=dict, blank=True)
+    intent_counts = models.JSONField(default=dict, blank=True)
+    latency_histogram = models.JSONField(default=dict, blank=True)
+
+    # Satisfaction metrics
+    satisfaction_total = models.IntegerField(default=0)
+    satisfaction_count = models.IntegerField(default=0)
+    positive_feedback = models.IntegerField(default=0)
+    negative_feedback = models.IntegerField(default=0)
+
+    # External API usage: totals plus {service: {calls, successes, response_time_total, cost}}
+    api_calls = models.IntegerField(default=0)
+    api_successes = models.IntegerField(default=0)
+    api_response_time_total = models.FloatField(default=0.0)
+    api_cost_total = models.FloatField(default=0.0)
+    api_services = models.JSONField(default=dict, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['granularity', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'bucket_start'], name='analytics_rollup_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} rollup {self.bucket_start:%Y-%m-%d %H:%M}"
+
+    @property
+    def avg_processing_time(self):
+        return self.processing_time_total / self.total_queries if self.total_queries else 0.0
+
+    @property
+    def avg_satisfaction(self):
+        return self.satisfaction_total / self.satisfaction_count if self.satisfaction_count else None
+
+    @property
+    def api_success_rate(self):
+        return self.api_successes / self.api_calls * 100 if self.api_calls else 0.0
+
+
+class RollupWatermark(models.Model):
+    """Highest source row id already folded into the rollups"""
+
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+class LatencySketchBucket(models.Model):
+    """Serialized ``LatencySketch`` of processing times for one hour, source and intent"""
+
+    bucket_start = models.DateTimeField()
+    response_source = models.CharField(max_length=30)
+    intent_detected = models.CharField(max_length=50, blank=True)
+    count = models.IntegerField(default=0)
+    sketch = models.JSONField(default=dict)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket_start', 'response_source', 'intent_detected'],
+                name='analytics_latency_sketch_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Latency sketch {self.bucket_start:%Y-%m-%d %H:%M} {self.response_source} ({self.count})"
+
+
+class APIHealthBucket(models.Model):
+    """Per-service API call counters for one minute, hour or day
+
+    Minute buckets are written as calls are logged; ``analytics.api_health``
+    folds old minutes into hours and old hours into days.
+    """
+
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    service = models.CharField(max_length=30, choices=APIUsageLog.API_SERVICE_CHOICES)
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES, default='minute')
+    bucket_start = models.DateTimeField()
+
+    calls = models.IntegerField(default=0)
+    errors = models.IntegerField(default=0)
+    latency_sum = models.FloatField(default=0.0)  # seconds
+    latency_max = models.FloatField(default=0.0)  # seconds
+    cost = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ['-bucket_start']
+        indexes = [
+            models.Index(fields=['bucket_start', 'service'], name='analytics_apihealth_start_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['service', 'resolution', 'bucket_start'],
+                name='analytics_apihealth_bucket_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.service} {self.resolution} {self.bucket_start:%Y-%m-%d %H:%M} ({self.calls} calls)"
+
+    @classmethod
+    def add_to_bucket(cls, service, resolution, bucket_start, calls, errors,
+                      latency_sum, latency_max, cost):
+        """Atomically add counts to a bucket, creating it if needed"""
+        lookup = {'service': service, 'resolution': resolution, 'bucket_start': bucket_start}
+        increments = {
+            'calls': F('calls') + calls,
+            'errors': F('errors') + errors,
+            'latency_sum': F('latency_sum') + latency_sum,
+            'latency_max': Greatest('latency_max', Value(latency_max, output_field=FloatField())),
+            'cost': F('cost') + cost,
+        }
+        if cls.objects.filter(**lookup).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    calls=calls, errors=errors, latency_sum=latency_sum,
+                    latency_max=latency_max, cost=cost, **lookup
+                )
+        except IntegrityError:
+            # Another writer created the bucket first
+            cls.objects.filter(**lookup).update(**increments)
+
+    @classmethod
+    def record_call(cls, service, success, response_time, cost=0.0, timestamp=None):
+        """Count one API call in its minute bucket"""
+        timestamp = timestamp or timezone.now()
+        cls.add_to_bucket(
+            service, 'minute', timestamp.replace(second=0, microsecond=0),
+            calls=1, errors=0 if success else 1,
+            latency_sum=response_time or 0.0, latency_max=response_time or 0.0, cost=cost
+        )
@@ -0,0 +1,113 @@
+"""
+Keyset-Paginated Query Log Browser
+
+Pages are addressed by an opaque cursor holding the ``(created_at, id)`` of
+the row at the page boundary instead of an offset, so any page costs one
+index range scan of ``page_size + 1`` rows regardless of its depth, and no
+``COUNT(*)`` is needed. Text search uses the ``analytics_querylog_fts`` FTS5
+index on SQLite and falls back to ``icontains`` elsewhere.
+"""
+import base64
+import json
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.dateparse import parse_datetime
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def encode_cursor(log):
+    raw = json.dumps([log.created_at.isoformat(), log.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """``(created_at, id)`` from a cursor; raises ValueError when malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, log_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        moment = parse_datetime(created_at)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if moment is None:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return moment, int(log_id)
+
+
+def fts_expression(text):
+    """FTS5 query matching every word of ``text`` as a prefix"""
+    return ' '.join(f'"{token}"*' for token in _TOKEN.findall(text))
+
+
+def search_filter(text):
+    """Q object restricting QueryLog to rows whose query matches ``text``"""
+    if connection.vendor == 'sqlite':
+        expression = fts_expression(text)
+        if not expression:
+            return Q()
+        return Q(id__in=RawSQL(
+            'SELECT rowid FROM analytics_querylog_fts WHERE analytics_querylog_fts MATCH %s',
+            [expression]
+        ))
+    return Q(query__icontains=text)
+
+
+class QueryLogPage:
+    """One page of logs, newest first, with cursors to its neighbours"""
+
+    def __init__(self, logs, next_cursor=None, previous_cursor=None):
+        self.object_list = logs
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def browse(queryset, after=None, before=None, page_size=50):
+    """Page through ``queryset`` newest first.
+
+    ``after`` continues past the last row of the current page, ``before``
+    goes back from its first row; with neither, the newest page is returned.
+    """
+    queryset = queryset.select_related('user')
+
+    if before:
+        created_at, log_id = decode_cursor(before)
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=log_id))
+            .order_by('created_at', 'id')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        logs = rows[:page_size][::-1]
+        return QueryLogPage(
+            logs,
+            next_cursor=encode_cursor(logs[-1]) if logs else None,
+            previous_cursor=encode_cursor(logs[0]) if has_more and logs else None,
+        )
+
+    if after:
+        created_at, log_id = decode_cursor(after)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=log_id))
+
+    rows = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+    logs = rows[:page_size]
+    return QueryLogPage(
+        logs,
+        next_cursor=encode_cursor(logs[-1]) if len(rows) > page_size else None,
+        previous_cursor=encode_cursor(logs[0]) if after and logs else None,
+    )
@@ -0,0 +1,278 @@
+"""
+Retention and Compressed Archival for KonsultaBot Logs
+
+Rows older than the configured age are written to one compressed JSONL file
+per table and day (zstd when the ``zstandard`` package is installed, gzip
+otherwise). Each file is recorded in ``manifest.json``, and only then are the
+rows deleted, in small id batches so SQLite never holds a long write lock.
+QueryLog and APIUsageLog rows are archived only after the rollup engine has
+processed them, QueryLog rows referenced by feedback are kept, and
+conversation sessions go only once closed and emptied of messages, so
+dashboards, feedback and chat history are unaffected. ``read`` streams archived
+rows back for admin queries.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from analytics.facets import query_log_facets
+from analytics.models import RollupWatermark
+
+logger = logging.getLogger('konsultabot.analytics')
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+
+# Archive name -> (model label, timestamp field, rollup watermark or None)
+RETENTION_TARGETS = {
+    'query_log': ('analytics.QueryLog', 'created_at', 'query_log'),
+    'api_usage_log': ('analytics.APIUsageLog', 'timestamp', 'api_usage_log'),
+    'system_metrics': ('analytics.SystemMetrics', 'timestamp', None),
+    'chat_message': ('chatbot_core.ChatMessage', 'timestamp', None),
+    # After chat_message, so a session's messages are gone before the session is
+    'conversation_session': ('chatbot_core.ConversationSession', 'last_activity', None),
+}
+
+DEFAULT_RETENTION_DAYS = {
+    'query_log': 90,
+    'api_usage_log': 30,
+    'system_metrics': 14,
+    'chat_message': 180,
+    'conversation_session': 180,
+}
+
+
+def _open_writer(path, use_zstd):
+    if use_zstd:
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, 'wb'), closefd=True)
+    return gzip.open(path, 'wb', compresslevel=6)
+
+
+def _open_reader(path):
+    if path.suffix == '.zst':
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return gzip.open(path, 'rb')
+
+
+class RetentionManager:
+    """Archive, prune and read back old log rows"""
+
+    def __init__(self):
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.archive_dir = Path(konsultabot_settings.get('ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+        self.retention_days = {**DEFAULT_RETENTION_DAYS, **konsultabot_settings.get('RETENTION_DAYS', {})}
+        self.batch_size = konsultabot_settings.get('RETENTION_DELETE_BATCH', 500)
+
+        # Pause between delete batches so other writers can take the lock
+        self.batch_pause = 0.05
+        self._manifest_lock = threading.Lock()
+
+    @property
+    def extension(self):
+        return '.jsonl.zst' if ZSTD_AVAILABLE else '.jsonl.gz'
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+
+    @property
+    def manifest_path(self):
+        return self.archive_dir / 'manifest.json'
+
+    def load_manifest(self):
+        try:
+            return json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {'partitions': []}
+
+    def _add_to_manifest(self, entry):
+        with self._manifest_lock:
+            manifest = self.load_manifest()
+            manifest['partitions'].append(entry)
+            manifest['updated_at'] = timezone.now().isoformat()
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.archive_dir, suffix='.part')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(temp_path, self.manifest_path)
+
+    # ------------------------------------------------------------------
+    # Archiving
+    # ------------------------------------------------------------------
+
+    def _queryset(self, name, before):
+        label, time_field, watermark_name = RETENTION_TARGETS[name]
+        model = apps.get_model(label)
+        queryset = model.objects.filter(**{f'{time_field}__lt': before})
+
+        if watermark_name:
+            # Never archive rows the rollups have not seen yet
+            watermark = RollupWatermark.objects.filter(name=watermark_name).first()
+            queryset = queryset.filter(id__lte=watermark.last_id if watermark else 0)
+        if name == 'query_log':
+            queryset = queryset.filter(feedbackreport__isnull=True)
+        if name == 'conversation_session':
+            # Only sessions the expiry sweep closed and whose messages are all archived
+            queryset = queryset.filter(is_active=False, messages__isnull=True)
+        return model, time_field, queryset
+
+    def cutoff(self, name, days=None):
+        """Start of the first local day that is kept in the database"""
+        days = self.retention_days[name] if days is None else days
+        return timezone.localtime(timezone.now() - timedelta(days=days)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+
+    def rollup_horizon(self):
+        """Earliest moment whose rollups can still be rebuilt from raw rows"""
+        return max(
+            self.cutoff(name) for name, (_, _, watermark) in RETENTION_TARGETS.items() if watermark
+        )
+
+    def archive(self, name, days=None, dry_run=False):
+        """Archive and delete rows of one table older than ``days``; returns rows archived"""
+        cutoff = self.cutoff(name, days)
+        model, time_field, queryset = self._queryset(name, cutoff)
+
+        oldest = queryset.order_by(time_field).values_list(time_field, flat=True).first()
+        if oldest is None:
+            return 0
+
+        total = 0
+        day = timezone.localtime(oldest).replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < cutoff:
+            next_day = day + timedelta(days=1)
+            day_rows = queryset.filter(**{f'{time_field}__gte': day, f'{time_field}__lt': next_day})
+            if dry_run:
+                total += day_rows.count()
+            else:
+                total += self._archive_day(name, model, time_field, day, day_rows)
+            day = next_day
+
+        if name == 'query_log' and total and not dry_run:
+            query_log_facets.invalidate()
+
+        logger.info(f"Retention {'would archive' if dry_run else 'archived'} {total} {name} rows older than {cutoff:%Y-%m-%d}")
+        return total
+
+    def _archive_day(self, name, model, time_field, day, day_rows):
+        fields = [field.attname for field in model._meta.concrete_fields]
+        partition_dir = self.archive_dir / name / f'date={day:%Y-%m-%d}'
+        partition_dir.mkdir(parents=True, exist_ok=True)
+
+        fd, temp_name = tempfile.mkstemp(dir=partition_dir, suffix=self.extension + '.part')
+        os.close(fd)
+        temp_path = Path(temp_name)
+
+        ids = []
+        digest = hashlib.sha256()
+        try:
+            with _open_writer(temp_path, ZSTD_AVAILABLE) as writer:
+                for row in day_rows.order_by('id').values(*fields).iterator(chunk_size=self.batch_size):
+                    line = (json.dumps(row, cls=DjangoJSONEncoder) + '\n').encode('utf-8')
+                    writer.write(line)
+                    digest.update(line)
+                    ids.append(row['id'])
+        except Exception:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        if not ids:
+            temp_path.unlink(missing_ok=True)
+            return 0
+
+        final_path = partition_dir / f'part-{ids[0]}-{ids[-1]}{self.extension}'
+        os.replace(temp_path, final_path)
+        self._add_to_manifest({
+            'table': name,
+            'date': f'{day:%Y-%m-%d}',
+            'file': final_path.relative_to(self.archive_dir).as_posix(),
+            'rows': len(ids),
+            'first_id': ids[0],
+            'last_id': ids[-1],
+            'sha256': digest.hexdigest(),
+            'archived_at': timezone.now().isoformat(),
+        })
+
+        # The archive is durable; now delete in short batches
+        for start in range(0, len(ids), self.batch_size):
+            model.objects.filter(id__in=ids[start:start + self.batch_size]).delete()
+            time.sleep(self.batch_pause)
+        return len(ids)
+
+    def archive_all(self, dry_run=False):
+        return {name: self.archive(name, dry_run=dry_run) for name in RETENTION_TARGETS}
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def partitions(self, name, start=None, end=None):
+        """Manifest entries for a table overlapping ``[start, end)`` (dates)"""
+        entries = []
+        for entry in self.load_manifest()['partitions']:
+            if entry['table'] != name:
+                continue
+            date = datetime.strptime(entry['date'], '%Y-%m-%d').date()
+            if start and date < start:
+                continue
+            if end and date >= end:
+                continue
+            entries.append(entry)
+        return sorted(entries, key=lambda entry: (entry['date'], entry['first_id']))
+
+    def read(self, name, start=None, end=None, predicate=None):
+        """Yield archived rows as dicts for a date range, optionally filtered"""
+        _, time_field, _ = RETENTION_TARGETS[name]
+        for entry in self.partitions(name, start and start.date(), end and (end.date() + timedelta(days=1))):
+            path = self.archive_dir / entry['file']
+            if path.suffix == '.zst' and not ZSTD_AVAILABLE:
+                logger.warning(f"Skipping {path}: zstandard is not installed")
+                continue
+            with _open_reader(path) as raw:
+                buffer = b''
+                for chunk in iter(lambda: raw.read(65536), b''):
+                    buffer += chunk
+                    *lines, buffer = buffer.split(b'\n')
+                    for line in lines:
+                        row = self._filter_row(json.loads(line), time_field, start, end, predicate)
+                        if row is not None:
+                            yield row
+                if buffer.strip():
+                    row = self._filter_row(json.loads(buffer), time_field, start, end, predicate)
+                    if row is not None:
+                        yield row
+
+    @staticmethod
+    def _filter_row(row, time_field, start, end, predicate):
+        moment = parse_datetime(row[time_field]) if row.get(time_field) else None
+        if moment is not None:
+            if start and moment < start:
+                return None
+            if end and moment >= end:
+                return None
+        if predicate and not predicate(row):
+            return None
+        return row
+
+
+# Global instance
+retention_manager = RetentionManager()
@@ -0,0 +1,402 @@
+"""
+Incremental Rollup Engine for KonsultaBot Analytics
+
+QueryLog and APIUsageLog rows are folded into hourly and daily
+``RollupBucket`` rows. Each run only looks at rows whose id is past the stored
+watermark, finds the hours they fall in and recomputes those hours from the
+source tables; daily buckets are then rebuilt from their hourly buckets.
+Every bucket is overwritten rather than incremented, so reruns and
+overlapping runs never double-count. Latency sketches (``analytics.sketches``)
+are rebuilt for the same hours. Dashboard views read the buckets only.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from analytics.models import (
+    APIUsageLog, DailyStats, LatencySketchBucket, QueryLog, RollupBucket, RollupWatermark
+)
+from analytics.sketches import build_hour_sketches
+
+logger = logging.getLogger('konsultabot.analytics')
+
+
+# Response time histogram ranges in seconds: (label, lower bound, upper bound)
+LATENCY_RANGES = [
+    ('0-1s', 0, 1),
+    ('1-2s', 1, 2),
+    ('2-5s', 2, 5),
+    ('5-10s', 5, 10),
+    ('10s+', 10, None),
+]
+
+HOUR = timedelta(hours=1)
+
+
+def floor_hour(moment):
+    """Start of the local hour containing ``moment``"""
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(date):
+    """Aware local midnight for a date"""
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def _hour_spans(hours):
+    """Collapse sorted hour starts into contiguous ``(start, end)`` spans"""
+    spans = []
+    for hour in sorted(hours):
+        if spans and spans[-1][1] == hour:
+            spans[-1][1] = hour + HOUR
+        else:
+            spans.append([hour, hour + HOUR])
+    return spans
+
+
+def _span_filter(field, hours):
+    return reduce(or_, (
+        Q(**{f'{field}__gte': start, f'{field}__lt': end})
+        for start, end in _hour_spans(hours)
+    ))
+
+
+def _latency_annotations():
+    annotations = {}
+    for label, lower, upper in LATENCY_RANGES:
+        condition = Q(processing_time__gte=lower)
+        if upper is not None:
+            condition &= Q(processing_time__lt=upper)
+        annotations[f'latency_{label}'] = Count('id', filter=condition)
+    return annotations
+
+
+def _empty_bucket_values():
+    return {
+        'total_queries': 0,
+        'processing_time_total': 0.0,
+        'source_counts': Counter(),
+        'language_counts': Counter(),
+        'intent_counts': Counter(),
+        'latency_histogram': Counter(),
+        'satisfaction_total': 0,
+        'satisfaction_count': 0,
+        'positive_feedback': 0,
+        'negative_feedback': 0,
+        'api_calls': 0,
+        'api_successes': 0,
+        'api_response_time_total': 0.0,
+        'api_cost_total': 0.0,
+        'api_services': defaultdict(Counter),
+    }
+
+
+def merge_buckets(buckets):
+    """Sum a sequence of ``RollupBucket`` rows into one values dict"""
+    totals = _empty_bucket_values()
+    for bucket in buckets:
+        for field in ('total_queries', 'processing_time_total', 'satisfaction_total',
+                      'satisfaction_count', 'positive_feedback', 'negative_feedback',
+                      'api_calls', 'api_successes', 'api_response_time_total', 'api_cost_total'):
+            totals[field] += getattr(bucket, field)
+        for field in ('source_counts', 'language_counts', 'intent_counts', 'latency_histogram'):
+            totals[field].update(getattr(bucket, field) or {})
+        for service, values in (bucket.api_services or {}).items():
+            totals['api_services'][service].update(values)
+    return totals
+
+
+def _plain(values):
+    """Convert Counters to plain dicts for JSON fields"""
+    return {
+        key: ({k: dict(v) for k, v in value.items()} if key == 'api_services'
+              else dict(value) if isinstance(value, Counter) else value)
+        for key, value in values.items()
+    }
+
+
+class RollupEngine:
+    """Maintain hourly and daily rollup buckets past a per-table watermark"""
+
+    LOCK_KEY = 'analytics:rollup:lock'
+    FRESH_KEY = 'analytics:rollup:fresh'
+
+    # Watermark name -> (model, timestamp field)
+    SOURCES = {
+        'query_log': (QueryLog, 'created_at'),
+        'api_usage_log': (APIUsageLog, 'timestamp'),
+    }
+
+    def __init__(self):
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.batch_size = konsultabot_settings.get('ANALYTICS_ROLLUP_BATCH_SIZE', 5000)
+        self.min_interval = konsultabot_settings.get('ANALYTICS_ROLLUP_INTERVAL', 60)
+        self.lock_timeout = 300
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def run(self, max_batches=None):
+        """Fold every new source row into the rollups; returns rows processed"""
+        if not cache.add(self.LOCK_KEY, True, self.lock_timeout):
+            logger.debug("Analytics rollup already running")
+            return 0
+
+        processed = 0
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                count = self._run_batch()
+                if not count:
+                    break
+                processed += count
+                batches += 1
+        finally:
+            cache.delete(self.LOCK_KEY)
+
+        if processed:
+            logger.info(f"Analytics rollup processed {processed} new rows")
+        return processed
+
+    def run_if_stale(self):
+        """Run at most once per ``min_interval`` seconds; cheap to call on every read"""
+        if cache.add(self.FRESH_KEY, True, self.min_interval):
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Analytics rollup failed: {e}")
+
+    def _run_batch(self):
+        with transaction.atomic():
+            watermarks = {
+                name: RollupWatermark.objects.select_for_update().get_or_create(name=name)[0]
+                for name in self.SOURCES
+            }
+
+            hours = set()
+            processed = 0
+            for name, (model, time_field) in self.SOURCES.items():
+                rows = list(
+                    model.objects.filter(id__gt=watermarks[name].last_id)
+                    .order_by('id')
+                    .values_list('id', time_field)[:self.batch_size]
+                )
+                if not rows:
+                    continue
+                hours.update(floor_hour(moment) for _, moment in rows)
+                watermarks[name].last_id = rows[-1][0]
+                processed += len(rows)
+
+            if not hours:
+                return 0
+
+            self.recompute_hours(hours)
+            for watermark in watermarks.values():
+                watermark.save()
+        return processed
+
+    def refresh_range(self, start, end):
+        """Recompute every bucket between two datetimes, e.g. after a backfill"""
+        from analytics.retention import retention_manager
+
+        # Archived hours have no raw rows left; rebuilding them would zero the buckets
+        start = max(start, retention_manager.rollup_horizon())
+        hour = floor_hour(start)
+        hours = set()
+        while hour < end:
+            hours.add(hour)
+            hour += HOUR
+        if hours:
+            with transaction.atomic():
+                self.recompute_hours(hours)
+        return len(hours)
+
+    # ------------------------------------------------------------------
+    # Recomputation
+    # ------------------------------------------------------------------
+
+    def recompute_hours(self, hours):
+        """Rebuild the given hourly buckets and the daily buckets containing them"""
+        values = {hour: _empty_bucket_values() for hour in hours}
+
+        query_rows = (
+            QueryLog.objects.filter(_span_filter('created_at', hours))
+            .annotate(hour=TruncHour('created_at'))
+            .values('hour', 'response_source', 'language', 'intent_detected')
+            .annotate(
+                count=Count('id'),
+                processing_time=Sum('processing_time'),
+                satisfaction_total=Sum('satisfaction_score'),
+                satisfaction_count=Count('satisfaction_score'),
+                positive=Count('id', filter=Q(is_helpful=True)),
+                negative=Count('id', filter=Q(is_helpful=False)),
+                **_latency_annotations()
+            )
+            .order_by()
+        )
+        for row in query_rows:
+            bucket = values[floor_hour(row['hour'])]
+            count = row['count']
+            bucket['total_queries'] += count
+            bucket['processing_time_total'] += row['processing_time'] or 0.0
+            bucket['source_counts'][row['response_source']] += count
+            bucket['language_counts'][row['language']] += count
+            if row['intent_detected']:
+                bucket['intent_counts'][row['intent_detected']] += count
+            bucket['satisfaction_total'] += row['satisfaction_total'] or 0
+            bucket['satisfaction_count'] += row['satisfaction_count']
+            bucket['positive_feedback'] += row['positive']
+            bucket['negative_feedback'] += row['negative']
+            for label, _, _ in LATENCY_RANGES:
+                if row[f'latency_{label}']:
+                    bucket['latency_histogram'][label] += row[f'latency_{label}']
+
+        api_rows = (
+            APIUsageLog.objects.filter(_span_filter('timestamp', hours))
+            .annotate(hour=TruncHour('timestamp'))
+            .values('hour', 'service')
+            .annotate(
+                calls=Count('id'),
+                successes=Count('id', filter=Q(success=True)),
+                response_time=Sum('response_time'),
+                cost=Sum('estimated_cost'),
+            )
+            .order_by()
+        )
+        for row in api_rows:
+            bucket = values[floor_hour(row['hour'])]
+            response_time = row['response_time'] or 0.0
+            cost = float(row['cost'] or 0)
+            bucket['api_calls'] += row['calls']
+            bucket['api_successes'] += row['successes']
+            bucket['api_response_time_total'] += response_time
+            bucket['api_cost_total'] += cost
+            bucket['api_services'][row['service']].update({
+                'calls': row['calls'],
+                'successes': row['successes'],
+                'response_time_total': response_time,
+                'cost': cost,
+            })
+
+        for hour, bucket_values in values.items():
+            if bucket_values['total_queries'] or bucket_values['api_calls']:
+                RollupBucket.objects.update_or_create(
+                    granularity='hour', bucket_start=hour, defaults=_plain(bucket_values)
+                )
+            else:
+                RollupBucket.objects.filter(granularity='hour', bucket_start=hour).delete()
+
+        self.recompute_latency_sketches(hours)
+        self.recompute_days({timezone.localtime(hour).date() for hour in hours})
+
+    def recompute_latency_sketches(self, hours):
+        """Rebuild the per-source, per-intent latency sketches for the given hours"""
+        rows = (
+            QueryLog.objects.filter(_span_filter('created_at', hours))
+            .values_list('created_at', 'response_source', 'intent_detected', 'processing_time')
+            .iterator(chunk_size=self.batch_size)
+        )
+        sketches = build_hour_sketches(
+            (floor_hour(created_at), source, intent, processing_time)
+            for created_at, source, intent, processing_time in rows
+        )
+
+        LatencySketchBucket.objects.filter(_span_filter('bucket_start', hours)).delete()
+        LatencySketchBucket.objects.bulk_create([
+            LatencySketchBucket(
+                bucket_start=hour,
+                response_source=source,
+                intent_detected=intent,
+                count=sketch.count,
+                sketch=sketch.to_dict(),
+            )
+            for (hour, source, intent), sketch in sketches.items()
+        ])
+
+    def recompute_days(self, dates):
+        """Rebuild daily buckets from hourly buckets and refresh ``DailyStats``"""
+        dates = sorted(dates)
+        start, end = day_start(dates[0]), day_start(dates[-1]) + timedelta(days=1)
+
+        hourly = defaultdict(list)
+        for bucket in RollupBucket.objects.filter(
+            granularity='hour', bucket_start__gte=start, bucket_start__lt=end
+        ):
+            hourly[timezone.localtime(bucket.bucket_start).date()].append(bucket)
+
+        # Distinct users cannot be summed across hours, so count them per day
+        users = defaultdict(set)
+        for date, user_id in (
+            QueryLog.objects.filter(created_at__gte=start, created_at__lt=end, user__isnull=False)
+            .annotate(date=TruncDate('created_at'))
+            .values_list('date', 'user')
+            .distinct()
+        ):
+            users[date].add(user_id)
+
+        for date in dates:
+            if date not in hourly:
+                RollupBucket.objects.filter(granularity='day', bucket_start=day_start(date)).delete()
+                continue
+            day_values = _plain(merge_buckets(hourly[date]))
+            day_values['user_ids'] = sorted(users.get(date, ()))
+            day_values['unique_users'] = len(day_values['user_ids'])
+            bucket, _ = RollupBucket.objects.update_or_create(
+                granularity='day', bucket_start=day_start(date), defaults=day_values
+            )
+            DailyStats.sync_from_rollup(bucket)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def summarize(self, since, until=None):
+        """Aggregate rollups for a window; reads bucket rows only"""
+        hours = RollupBucket.objects.filter(granularity='hour', bucket_start__gte=floor_hour(since))
+        days = RollupBucket.objects.filter(
+            granularity='day', bucket_start__gte=day_start(timezone.localtime(since).date())
+        )
+        if until is not None:
+            hours = hours.filter(bucket_start__lt=until)
+            days = days.filter(bucket_start__lt=until)
+
+        totals = merge_buckets(hours)
+        user_ids = set()
+        for ids in days.values_list('user_ids', flat=True):
+            user_ids.update(ids)
+
+        total_queries = totals['total_queries']
+        api_calls = totals['api_calls']
+        return {
+            'total_queries': total_queries,
+            'unique_users': len(user_ids),
+            'avg_processing_time': totals['processing_time_total'] / total_queries if total_queries else 0.0,
+            'source_counts': dict(totals['source_counts']),
+            'language_counts': dict(totals['language_counts']),
+            'intent_counts': dict(totals['intent_counts']),
+            'latency_histogram': {label: totals['latency_histogram'].get(label, 0) for label, _, _ in LATENCY_RANGES},
+            'avg_satisfaction': (totals['satisfaction_total'] / totals['satisfaction_count']
+                                 if totals['satisfaction_count'] else None),
+            'total_ratings': totals['satisfaction_count'],
+            'positive_feedback': totals['positive_feedback'],
+            'negative_feedback': totals['negative_feedback'],
+            'api_calls': api_calls,
+            'api_success_rate': totals['api_successes'] / api_calls if api_calls else None,
+            'api_avg_response_time': totals['api_response_time_total'] / api_calls if api_calls else None,
+            'api_total_cost': totals['api_cost_total'],
+            'api_services': {service: dict(values) for service, values in totals['api_services'].items()},
+        }
+
+
+# Global instance
+rollup_engine = RollupEngine()
@@ -0,0 +1,191 @@
+"""
+Mergeable Latency Sketches for KonsultaBot Analytics
+
+``LatencySketch`` is a log-bucketed histogram (the DDSketch scheme): every
+value is counted in a bucket whose width is a fixed fraction of its
+magnitude, so any quantile is accurate to within ``relative_accuracy`` and
+two sketches merge by adding bucket counts. One sketch is kept per hour,
+response source and intent (``LatencySketchBucket``), so percentiles and
+histograms for any window or slice come from merging a few hundred small
+JSON documents instead of scanning ``QueryLog``.
+"""
+import math
+from collections import defaultdict
+
+from analytics.models import LatencySketchBucket
+
+
+class LatencySketch:
+    """Relative-error quantile sketch over positive durations in seconds"""
+
+    # Durations at or below this are counted in a single zero bucket
+    MIN_VALUE = 1e-4
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        self.bins = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index):
+        # Midpoint (in relative terms) of bucket ``index``
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if value is None or count <= 0:
+            return
+        value = float(value)
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+        else:
+            self.bins[self._index(value)] += count
+
+        self.count += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Add another sketch's counts into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        if not other.count:
+            return self
+        for index, count in other.bins.items():
+            self.bins[index] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q):
+        """Estimated value at quantile ``q`` (0..1), or None for an empty sketch"""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return self.min
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def percentiles(self, points=(50, 90, 95, 99)):
+        return {f'p{p}': self.quantile(p / 100) for p in points}
+
+    def histogram(self, edges):
+        """Approximate counts between consecutive ``edges``; the last range is open-ended"""
+        counts = [0] * len(edges)
+        boundaries = list(edges[1:])
+
+        def slot(value):
+            for position, upper in enumerate(boundaries):
+                if value < upper:
+                    return position
+            return len(edges) - 1
+
+        if self.zero_count:
+            counts[slot(0.0)] += self.zero_count
+        for index, count in self.bins.items():
+            counts[slot(self._value(index))] += count
+        return counts
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def to_dict(self):
+        """Compact JSON form: dense counts from the lowest populated bucket"""
+        data = {
+            'a': self.relative_accuracy,
+            'n': self.count,
+            's': round(self.sum, 6),
+            'min': self.min,
+            'max': self.max,
+            'z': self.zero_count,
+        }
+        if self.bins:
+            low, high = min(self.bins), max(self.bins)
+            data['o'] = low
+            data['c'] = [self.bins.get(index, 0) for index in range(low, high + 1)]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('a', 0.01))
+        sketch.count = data.get('n', 0)
+        sketch.sum = data.get('s', 0.0)
+        sketch.min = data.get('min')
+        sketch.max = data.get('max')
+        sketch.zero_count = data.get('z', 0)
+        offset = data.get('o', 0)
+        for position, count in enumerate(data.get('c', [])):
+            if count:
+                sketch.bins[offset + position] = count
+        return sketch
+
+
+def build_hour_sketches(rows):
+    """Group ``(hour, source, intent, processing_time)`` rows into sketches"""
+    sketches = defaultdict(LatencySketch)
+    for hour, source, intent, processing_time in rows:
+        sketches[(hour, source, intent or '')].add(processing_time)
+    return sketches
+
+
+def query_sketch(since, until=None, source=None, intent=None):
+    """Merge stored hourly sketches for a window and optional slice"""
+    buckets = LatencySketchBucket.objects.filter(bucket_start__gte=since)
+    if until is not None:
+        buckets = buckets.filter(bucket_start__lt=until)
+    if source:
+        buckets = buckets.filter(response_source=source)
+    if intent:
+        buckets = buckets.filter(intent_detected=intent)
+
+    merged = LatencySketch()
+    for data in buckets.values_list('sketch', flat=True).iterator():
+        merged.merge(LatencySketch.from_dict(data))
+    return merged
+
+
+def sketches_by_source(since, until=None):
+    """One merged sketch per response source for a window"""
+    buckets = LatencySketchBucket.objects.filter(bucket_start__gte=since)
+    if until is not None:
+        buckets = buckets.filter(bucket_start__lt=until)
+
+    merged = defaultdict(LatencySketch)
+    for source, data in buckets.values_list('response_source', 'sketch').iterator():
+        merged[source].merge(LatencySketch.from_dict(data))
+    return dict(merged)
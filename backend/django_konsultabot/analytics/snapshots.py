@@ -0,0 +1,243 @@
+"""
+Dashboard Snapshot Service for KonsultaBot Analytics
+
+Everything the admin dashboard shows is computed together: long-window
+figures come from the rollup buckets, and the real-time figures come from one
+conditional aggregate per table over the last day. A background thread
+recomputes the snapshot for each window an admin has recently opened every
+``ANALYTICS_SNAPSHOT_INTERVAL`` seconds and pushes a compact copy to live
+dashboard streams; the same thread runs the rollup, API health downsampling
+and session sweep beforehand. Page loads and real-time polls only read the
+cached snapshot: a missing or expired one is scheduled for the thread and
+the last known (or an empty) snapshot is returned marked ``stale``.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from analytics.api_health import api_health
+from analytics.live import live_metrics
+from analytics.models import FeedbackReport, QueryLog
+from analytics.rollups import rollup_engine
+from chatbot_core.models import ConversationSession
+from chatbot_core.session_sweeper import session_sweeper
+
+logger = logging.getLogger('konsultabot.analytics')
+
+
+def _ranked(counts, key, limit=None):
+    rows = [{key: value, 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: -item[1])]
+    return rows[:limit] if limit else rows
+
+
+class DashboardSnapshotService:
+    """Compute, cache and periodically refresh dashboard snapshots"""
+
+    CACHE_KEY = 'analytics:dashboard_snapshot:{days}'
+
+    # Stop refreshing a window nobody has looked at for this long
+    IDLE_AFTER = 600
+    MAX_WINDOWS = 8
+
+    # Keep the last snapshot around to serve (marked stale) while a new one is computed
+    KEEP_FOR = 24 * 3600
+
+    def __init__(self):
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.refresh_interval = konsultabot_settings.get('ANALYTICS_SNAPSHOT_INTERVAL', 30)
+        self.max_age = timedelta(seconds=self.refresh_interval * 4)
+
+        self._windows = {}  # days -> last time requested
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+
+    def get(self, days=30):
+        """Return the cached snapshot for a window; never computes on the caller's thread"""
+        self._track(days)
+        snapshot = cache.get(self.CACHE_KEY.format(days=days))
+        if snapshot is not None and timezone.now() - snapshot['generated_at'] < self.max_age:
+            return snapshot
+
+        # Let the background thread compute it now rather than at its next tick
+        self._wake.set()
+        snapshot = dict(snapshot) if snapshot is not None else self.empty(days)
+        snapshot['stale'] = True
+        return snapshot
+
+    def refresh(self, days):
+        snapshot = self.compute(days)
+        cache.set(self.CACHE_KEY.format(days=days), snapshot, self.KEEP_FOR)
+        live_metrics.publish('snapshot', self.compact(snapshot), days=days)
+        return snapshot
+
+    @staticmethod
+    def maintain():
+        """Background upkeep the snapshot figures depend on; each task is rate-limited"""
+        rollup_engine.run_if_stale()
+        api_health.downsample_if_due()
+        session_sweeper.sweep_if_due()
+
+    @staticmethod
+    def compact(snapshot):
+        """The subset of a snapshot pushed to live dashboards"""
+        return {
+            'generated_at': snapshot['generated_at'],
+            'total_queries': snapshot['total_queries'],
+            'unique_users': snapshot['unique_users'],
+            'avg_response_time': snapshot['avg_response_time'],
+            **snapshot['real_time'],
+        }
+
+    def compute(self, days):
+        """Build a snapshot with a fixed number of queries, independent of log size"""
+        now = timezone.now()
+        since = now - timedelta(days=days)
+        last_hour = now - timedelta(hours=1)
+        last_24h = now - timedelta(hours=24)
+
+        summary = rollup_engine.summarize(since)
+
+        recent_queries = QueryLog.objects.filter(created_at__gte=last_24h).aggregate(
+            queries_last_24h=Count('id'),
+            queries_last_hour=Count('id', filter=Q(created_at__gte=last_hour)),
+            avg_response_time_1h=Avg('processing_time', filter=Q(created_at__gte=last_hour)),
+        )
+
+        gemini_health = api_health.window(last_24h)['gemini']
+
+        sessions_in_window = ConversationSession.objects.filter(last_activity__gte=since).count()
+        # Served from the partial index on live sessions
+        sessions_live = ConversationSession.objects.filter(is_active=True).count()
+
+        recent_feedback = [
+            {
+                'user': {'username': row.pop('user__username')},
+                **row,
+            }
+            for row in FeedbackReport.objects.filter(created_at__gte=since).order_by('-created_at').values(
+                'id', 'feedback_type', 'rating', 'is_positive', 'comment',
+                'is_resolved', 'created_at', 'user__username'
+            )[:5]
+        ]
+
+        window_gemini = summary['api_services'].get('gemini', {})
+        window_gemini_rate = (
+            window_gemini.get('successes', 0) / window_gemini['calls'] if window_gemini.get('calls') else 0
+        )
+
+        return {
+            'generated_at': now,
+            'days': days,
+            'stale': False,
+            'total_queries': summary['total_queries'],
+            'unique_users': summary['unique_users'],
+            'active_sessions': sessions_in_window,
+            'source_stats': _ranked(summary['source_counts'], 'response_source'),
+            'language_stats': _ranked(summary['language_counts'], 'language'),
+            'intent_stats': _ranked(summary['intent_counts'], 'intent_detected', limit=10),
+            'avg_response_time': round(summary['avg_processing_time'], 2),
+            'satisfaction_stats': {
+                'avg_satisfaction': summary['avg_satisfaction'],
+                'total_ratings': summary['total_ratings'],
+            },
+            'api_stats': {
+                'total_calls': summary['api_calls'],
+                'success_rate': summary['api_success_rate'],
+                'avg_response_time': summary['api_avg_response_time'],
+                'total_cost': summary['api_total_cost'],
+            },
+            'recent_feedback': recent_feedback,
+            'gemini_availability': round(window_gemini_rate * 100, 1),
+            'real_time': {
+                'queries_last_hour': recent_queries['queries_last_hour'],
+                'queries_last_24h': recent_queries['queries_last_24h'],
+                'active_sessions': sessions_live,
+                'gemini_success_rate': gemini_health['success_rate'] / 100,
+                'avg_response_time_1h': recent_queries['avg_response_time_1h'] or 0,
+            },
+        }
+
+    @staticmethod
+    def empty(days):
+        """Placeholder served until the first snapshot for a window is computed"""
+        return {
+            'generated_at': timezone.now(),
+            'days': days,
+            'stale': True,
+            'total_queries': 0,
+            'unique_users': 0,
+            'active_sessions': 0,
+            'source_stats': [],
+            'language_stats': [],
+            'intent_stats': [],
+            'avg_response_time': 0,
+            'satisfaction_stats': {'avg_satisfaction': None, 'total_ratings': 0},
+            'api_stats': {'total_calls': 0, 'success_rate': None, 'avg_response_time': None, 'total_cost': 0},
+            'recent_feedback': [],
+            'gemini_availability': 0,
+            'real_time': {
+                'queries_last_hour': 0,
+                'queries_last_24h': 0,
+                'active_sessions': 0,
+                'gemini_success_rate': 0,
+                'avg_response_time_1h': 0,
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------------
+
+    def _track(self, days):
+        with self._lock:
+            self._windows[days] = time.monotonic()
+            if len(self._windows) > self.MAX_WINDOWS:
+                oldest = min(self._windows, key=self._windows.get)
+                del self._windows[oldest]
+
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._refresh_loop, name='konsultabot-dashboard-snapshot', daemon=True
+                )
+                self._worker.start()
+
+    def _active_windows(self):
+        """Prune idle windows; clears the worker slot when none remain"""
+        cutoff = time.monotonic() - self.IDLE_AFTER
+        with self._lock:
+            for days in [d for d, seen in self._windows.items() if seen < cutoff]:
+                del self._windows[days]
+            if not self._windows:
+                self._worker = None
+            return list(self._windows)
+
+    def _refresh_loop(self):
+        while True:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            windows = self._active_windows()
+            if not windows:
+                # Nobody is watching; the next request starts a new worker
+                return
+
+            close_old_connections()
+            self.maintain()
+            for days in windows:
+                try:
+                    self.refresh(days)
+                except Exception as e:
+                    logger.error(f"Dashboard snapshot refresh failed for {days} days: {e}")
+            close_old_connections()
+
+
+# Global instance
+dashboard_snapshots = DashboardSnapshotService()
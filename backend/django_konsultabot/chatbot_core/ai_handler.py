@@ -3,7 +3,7 @@ Advanced AI Handler - Multilingual Hybrid Gemini + Knowledge Base Logic
 """
 import logging
 import time
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List
 from django.utils import timezone
 
 from .utils.network_detector import network_detector
@@ -25,7 +25,9 @@ class MultilingualAIHandler:
         self.supported_languages = ['english', 'tagalog', 'bisaya', 'waray', 'spanish']
         
     def handle_ai_query(self, query: str, user=None, language: str = 'auto',
-                       session=None, context: Optional[List[Dict]] = None) -> Dict[str, Any]:
+                       session=None, context: Optional[List[Dict]] = None,
+                       on_partial: Optional[Callable[[str], None]] = None,
+                       on_reset: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
         """
         Process multilingual AI query with hybrid approach
         
@@ -35,6 +37,10 @@ class MultilingualAIHandler:
             language: Query language ('auto' for detection)
             session: Conversation session
             context: Previous conversation context
+            on_partial: Optional callback receiving Gemini text as it is
+                generated (only used when no translation is needed)
+            on_reset: Optional callback telling the caller to discard the
+                partial text already passed to ``on_partial``
             
         Returns:
             Dict with response and comprehensive metadata
@@ -106,10 +112,18 @@ class MultilingualAIHandler:
                 else:
                     logger.info('[INFO] Decision: gemini')
                     # Try Gemini for more dynamic/complex queries
-                    gemini_result = gemini_processor.generate_response(
-                        english_query,
-                        context=str(context) if context else None
-                    )
+                    if on_partial and not lang_result['translation_used']:
+                        gemini_result = gemini_processor.generate_response_stream(
+                            english_query,
+                            context=str(context) if context else None,
+                            on_chunk=on_partial,
+                            on_reset=on_reset
+                        )
+                    else:
+                        gemini_result = gemini_processor.generate_response(
+                            english_query,
+                            context=str(context) if context else None
+                        )
                     
                     if gemini_result['success']:
                         response_data.update({
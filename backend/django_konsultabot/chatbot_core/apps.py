@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class ChatbotCoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'chatbot_core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from sqlite_store import configure_django_connection
+
+        # WAL, synchronous=NORMAL, mmap and busy timeout for the ORM database
+        connection_created.connect(configure_django_connection, dispatch_uid='konsultabot_sqlite_pragmas')
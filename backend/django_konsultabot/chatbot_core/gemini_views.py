@@ -2,11 +2,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
-from rest_framework.throttling import UserRateThrottle
-
-class ChatRateThrottle(UserRateThrottle):
-    scope = 'chat'
-    rate = '100/hour'
+from .throttling import ChatRateThrottle
 import google.generativeai as genai
 from django.conf import settings
 import json
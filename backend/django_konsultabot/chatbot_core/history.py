@@ -0,0 +1,120 @@
+"""
+Incremental Chat History Sync
+
+History is paged by message id through opaque cursors rather than re-sent
+whole: a client keeps the ``since`` cursor of the last page it received and
+asks only for newer messages when it reopens a session, or walks back with
+``before``. Rows are read with ``values()`` (no model instances or
+serializer), and responses carry an ETag and Last-Modified derived from the
+session row alone, so an unchanged session answers 304 without touching
+ChatMessage at all.
+"""
+import base64
+import hashlib
+
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import ConversationSession, ChatMessage
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(message_id):
+    return base64.urlsafe_b64encode(f'm{message_id}'.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Message id from a cursor; raises ValueError when malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii')
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not raw.startswith('m') or not raw[1:].isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(raw[1:])
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def sync_page(queryset, fields, since=None, before=None, size=DEFAULT_PAGE_SIZE):
+    """One page of ``queryset`` as dicts, oldest first.
+
+    ``since`` returns messages newer than the cursor, ``before`` older ones;
+    with neither, the newest page is returned. ``cursors['since']`` is the
+    sync point to send back next time (unchanged when nothing is new, and
+    absent when paging back, since the client already has newer messages).
+    """
+    if since:
+        rows = list(queryset.filter(id__gt=decode_cursor(since)).order_by('id').values(*fields)[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        return {
+            'messages': rows,
+            'has_more': has_more,
+            'cursors': {
+                'since': encode_cursor(rows[-1]['id']) if rows else since,
+                'before': None,
+            },
+        }
+
+    if before:
+        queryset = queryset.filter(id__lt=decode_cursor(before))
+    rows = list(queryset.order_by('-id').values(*fields)[:size + 1])
+    has_more = len(rows) > size
+    rows = rows[:size][::-1]
+    return {
+        'messages': rows,
+        'has_more': has_more,
+        'cursors': {
+            'since': encode_cursor(rows[-1]['id']) if rows and not before else None,
+            'before': encode_cursor(rows[0]['id']) if has_more else None,
+        },
+    }
+
+
+def _etag(*parts):
+    return '"{}"'.format(hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest())
+
+
+def session_validators(session_id, user=None, query=''):
+    """``(etag, last_modified)`` for a session's history, from one small row read"""
+    sessions = ConversationSession.objects.filter(session_id=session_id)
+    if user is not None:
+        sessions = sessions.filter(user=user)
+    row = sessions.values('id', 'message_count', 'updated_at').first()
+    if row is None:
+        return None, None
+    return _etag(row['id'], row['message_count'], row['updated_at'].isoformat(), query), row['updated_at']
+
+
+def latest_validators(query=''):
+    """Validators for the cross-session feed: only changes when a message is added"""
+    latest_id = ChatMessage.objects.aggregate(latest=Max('id'))['latest'] or 0
+    return _etag('all', latest_id, query), None
+
+
+def not_modified(request, etag, last_modified):
+    """304 response when the client's copy is current, else None"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return apply_validators(response, etag, last_modified) if response is not None else None
+
+
+def apply_validators(response, etag, last_modified):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Private and revalidated on every open, so the 304 path is what saves bandwidth
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,25 @@
+"""
+Close conversation sessions idle past SESSION_TIMEOUT_MINUTES
+
+The admin dashboard also sweeps every SESSION_SWEEP_INTERVAL seconds while it
+is open; run this from cron / Task Scheduler to keep sessions current without it:
+
+    python manage.py expire_sessions
+"""
+from django.core.management.base import BaseCommand
+
+from chatbot_core.session_sweeper import session_sweeper
+
+
+class Command(BaseCommand):
+    help = 'Mark idle conversation sessions inactive and close their context'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Stop after this many batches'
+        )
+
+    def handle(self, *args, **options):
+        closed = session_sweeper.sweep(max_batches=options['max_batches'])
+        self.stdout.write(f'Expired {closed} idle sessions')
@@ -0,0 +1,19 @@
+"""
+Delete expired files from the TTS audio cache
+
+Registering a voice reply also prunes every TTS_CACHE_PRUNE_INTERVAL seconds;
+run this from cron / Task Scheduler to keep media/tts_cache bounded without it:
+
+    python manage.py prune_tts_cache
+"""
+from django.core.management.base import BaseCommand
+
+from chatbot_core.utils.tts_cache import tts_cache
+
+
+class Command(BaseCommand):
+    help = 'Delete cached TTS audio past TTS_CACHE_MAX_AGE and orphaned pending text'
+
+    def handle(self, *args, **options):
+        removed = tts_cache.prune()
+        self.stdout.write(f'Removed {removed} files from the TTS cache')
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Frozen copies of chatbot_core.models.estimate_tokens/trim_context as of this
+# migration, so later changes to the models module cannot alter the backfill
+
+def estimate_tokens(text):
+    return len(text or '') // 4 + 1
+
+
+def trim_context(entries):
+    options = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+    max_turns = options.get('MAX_CONVERSATION_HISTORY', 10)
+    token_budget = options.get('CONTEXT_TOKEN_BUDGET', 2000)
+
+    entries = entries[-max_turns:]
+    tokens = sum(estimate_tokens(entry['message']) for entry in entries)
+    while len(entries) > 1 and tokens > token_budget:
+        tokens -= estimate_tokens(entries[0]['message'])
+        entries = entries[1:]
+    return entries, tokens
+
+
+def backfill_context(apps, schema_editor):
+    ConversationSession = apps.get_model('chatbot_core', 'ConversationSession')
+    ChatMessage = apps.get_model('chatbot_core', 'ChatMessage')
+
+    sessions = ConversationSession.objects.annotate(total=Count('messages')).filter(total__gt=0)
+    for session in sessions.iterator():
+        # Newest first, enough to fill any window the trim can keep
+        latest = ChatMessage.objects.filter(session_id=session.pk).order_by('-timestamp', '-id')[:50]
+        window, tokens = trim_context([
+            {
+                'sender': msg.sender,
+                'message': msg.message,
+                'timestamp': msg.timestamp.isoformat()
+            }
+            for msg in reversed(list(latest))
+        ])
+        ConversationSession.objects.filter(pk=session.pk).update(
+            message_count=session.total,
+            recent_context=window,
+            context_tokens=tokens
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot_core', '0003_alter_response_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationsession',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationsession',
+            name='recent_context',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='conversationsession',
+            name='context_tokens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_context, migrations.RunPython.noop),
+    ]
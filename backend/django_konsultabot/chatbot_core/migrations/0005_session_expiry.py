@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot_core', '0004_session_rolling_context'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessioncontext',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='conversationsession',
+            index=models.Index(fields=['last_activity'], name='chatbot_session_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationsession',
+            index=models.Index(
+                condition=models.Q(('is_active', True)),
+                fields=['last_activity'],
+                name='chatbot_session_active_idx',
+            ),
+        ),
+    ]
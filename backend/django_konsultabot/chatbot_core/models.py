@@ -1,13 +1,36 @@
 """
 Chatbot Core Models - Session-based conversation management
 """
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import uuid
 
 
+def estimate_tokens(text):
+    """Rough token count for prompt budgeting (about 4 characters per token)"""
+    return len(text or '') // 4 + 1
+
+
+def trim_context(entries):
+    """Drop the oldest turns until the window fits its turn and token budgets.
+
+    The newest turn is always kept. Returns ``(entries, token_estimate)``.
+    """
+    options = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+    max_turns = options.get('MAX_CONVERSATION_HISTORY', 10)
+    token_budget = options.get('CONTEXT_TOKEN_BUDGET', 2000)
+
+    entries = entries[-max_turns:]
+    tokens = sum(estimate_tokens(entry['message']) for entry in entries)
+    while len(entries) > 1 and tokens > token_budget:
+        tokens -= estimate_tokens(entries[0]['message'])
+        entries = entries[1:]
+    return entries, tokens
+
+
 class ConversationSession(models.Model):
     """Manages conversation sessions with memory context"""
     
@@ -20,6 +43,11 @@ class ConversationSession(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_activity = models.DateTimeField(auto_now=True)
     
+    # Denormalized on every appended message (see ChatMessage.save)
+    message_count = models.PositiveIntegerField(default=0)
+    recent_context = models.JSONField(default=list, blank=True)
+    context_tokens = models.PositiveIntegerField(default=0)
+    
     # Session metadata
     device_info = models.JSONField(default=dict, blank=True)
     user_agent = models.TextField(blank=True)
@@ -30,6 +58,10 @@ class ConversationSession(models.Model):
         indexes = [
             models.Index(fields=['user', '-last_activity']),
             models.Index(fields=['session_id']),
+            models.Index(fields=['last_activity'], name='chatbot_session_activity_idx'),
+            # Live sessions only: the expiry sweep and "active now" counts
+            models.Index(fields=['last_activity'], name='chatbot_session_active_idx',
+                         condition=models.Q(is_active=True)),
         ]
     
     def __str__(self):
@@ -42,22 +74,45 @@ class ConversationSession(models.Model):
         timeout_minutes = getattr(settings, 'KONSULTABOT_SETTINGS', {}).get('SESSION_TIMEOUT_MINUTES', 30)
         return timezone.now() - self.last_activity > timedelta(minutes=timeout_minutes)
     
-    @property
-    def message_count(self):
-        """Get total messages in this session"""
-        return self.messages.count()
-    
     def get_recent_context(self, limit=10):
-        """Get recent conversation context for AI processing"""
-        messages = self.messages.order_by('-timestamp')[:limit]
-        context = []
-        for msg in reversed(messages):
-            context.append({
-                'sender': msg.sender,
-                'message': msg.message,
-                'timestamp': msg.timestamp.isoformat()
-            })
-        return context
+        """Get recent conversation context for AI processing (no query needed)"""
+        return self.recent_context[-limit:] if limit else []
+    
+    def append_to_context(self, message):
+        """Fold a newly saved message into the rolling window and counter.
+        
+        The session row is locked and re-read so concurrent appends from other
+        workers are not lost; call inside the transaction that saved the message
+        (on SQLite, that insert already holds the write lock).
+        """
+        current = ConversationSession.objects.select_for_update().only(
+            'recent_context', 'message_count', 'is_active'
+        ).get(pk=self.pk)
+        window, tokens = trim_context(current.recent_context + [{
+            'sender': message.sender,
+            'message': message.message,
+            'timestamp': message.timestamp.isoformat()
+        }])
+        now = timezone.now()
+        ConversationSession.objects.filter(pk=self.pk).update(
+            recent_context=window,
+            context_tokens=tokens,
+            message_count=F('message_count') + 1,
+            is_active=True,
+            last_activity=now,
+            updated_at=now  # history ETag / Last-Modified
+        )
+        if not current.is_active:
+            # Resuming a session the expiry sweep already closed; reopen its
+            # analytics row too so the next sweep records the real end
+            from analytics.models import UserSession
+            SessionContext.objects.filter(session_id=self.pk).update(closed_at=None)
+            UserSession.objects.filter(session_id=self.session_id).update(end_time=None, duration=None)
+        self.recent_context = window
+        self.context_tokens = tokens
+        self.message_count = current.message_count + 1
+        self.is_active = True
+        self.last_activity = self.updated_at = now
     
     def update_activity(self):
         """Update last activity timestamp"""
@@ -115,6 +170,16 @@ class ChatMessage(models.Model):
     def __str__(self):
         return f"{self.sender}: {self.message[:50]}..."
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                self.session.append_to_context(self)
+            else:
+                # Edits (feedback, ratings) must invalidate cached history too
+                ConversationSession.objects.filter(pk=self.session_id).update(updated_at=timezone.now())
+    
     @property
     def is_user_message(self):
         return self.sender == 'user'
@@ -146,6 +211,7 @@ class SessionContext(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    closed_at = models.DateTimeField(null=True, blank=True)  # set when the session expires
     
     def __str__(self):
         return f"Context for {self.session.session_id[:8]}"
@@ -0,0 +1,111 @@
+"""
+Conversation Session Expiry Sweeper
+
+Sessions idle for longer than ``SESSION_TIMEOUT_MINUTES`` are closed in bulk
+instead of being checked one object at a time through ``is_expired``. Each
+batch picks the stalest live sessions from the partial index on
+``last_activity WHERE is_active``, flips them with one UPDATE, and in the
+same transaction closes their SessionContext and the matching analytics
+UserSession (end time, duration and message count). Sending a message to an
+expired session reactivates it and reopens both, so a later sweep records
+the real end. Closed sessions are archived later by the
+retention job once their messages have been archived.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, OuterRef, Subquery
+from django.utils import timezone
+
+from analytics.models import UserSession
+from chatbot_core.models import ConversationSession, SessionContext
+
+logger = logging.getLogger('konsultabot.sessions')
+
+
+class SessionSweeper:
+    """Expire idle conversation sessions in indexed batches"""
+
+    LOCK_KEY = 'chatbot:session_sweep:lock'
+    FRESH_KEY = 'chatbot:session_sweep:fresh'
+
+    def __init__(self):
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.timeout_minutes = konsultabot_settings.get('SESSION_TIMEOUT_MINUTES', 30)
+        self.batch_size = konsultabot_settings.get('SESSION_SWEEP_BATCH', 500)
+        self.min_interval = konsultabot_settings.get('SESSION_SWEEP_INTERVAL', 300)
+        self.lock_timeout = 300
+
+        # Pause between batches so chat writes can take the lock
+        self.batch_pause = 0.05
+
+    def cutoff(self):
+        return timezone.now() - timedelta(minutes=self.timeout_minutes)
+
+    def sweep(self, max_batches=None):
+        """Close every session idle past the timeout; returns sessions closed"""
+        if not cache.add(self.LOCK_KEY, True, self.lock_timeout):
+            logger.debug("Session sweep already running")
+            return 0
+
+        cutoff = self.cutoff()
+        closed = 0
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                count = self._sweep_batch(cutoff)
+                if not count:
+                    break
+                closed += count
+                batches += 1
+                time.sleep(self.batch_pause)
+        finally:
+            cache.delete(self.LOCK_KEY)
+
+        if closed:
+            logger.info(f"Expired {closed} sessions idle since before {cutoff:%Y-%m-%d %H:%M}")
+        return closed
+
+    def sweep_if_due(self):
+        """Sweep at most once per ``min_interval`` seconds; cheap to call on every read"""
+        if cache.add(self.FRESH_KEY, True, self.min_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+    def _sweep_batch(self, cutoff):
+        now = timezone.now()
+        stale = ConversationSession.objects.filter(is_active=True, last_activity__lt=cutoff)
+        with transaction.atomic():
+            ids = list(stale.order_by('last_activity').values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                return 0
+
+            # Re-check the predicate: a session that got a message since the select stays open
+            expired = ConversationSession.objects.filter(id__in=ids, is_active=True, last_activity__lt=cutoff)
+            count = expired.update(is_active=False)
+            if not count:
+                return len(ids)
+
+            closed = ConversationSession.objects.filter(id__in=ids, is_active=False)
+            SessionContext.objects.filter(session__in=closed, closed_at__isnull=True).update(closed_at=now)
+
+            source = ConversationSession.objects.filter(session_id=OuterRef('session_id'))
+            ended_at = Subquery(source.values('last_activity')[:1], output_field=DateTimeField())
+            UserSession.objects.filter(
+                session_id__in=closed.values('session_id'), end_time__isnull=True
+            ).update(
+                end_time=ended_at,
+                duration=ExpressionWrapper(ended_at - F('start_time'), output_field=DurationField()),
+                message_count=Subquery(source.values('message_count')[:1]),
+            )
+        return len(ids)
+
+
+# Global instance
+session_sweeper = SessionSweeper()
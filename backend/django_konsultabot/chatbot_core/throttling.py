@@ -0,0 +1,85 @@
+"""
+Role-aware Rate Throttles for KonsultaBot
+
+DRF's ``UserRateThrottle`` keeps a list of request timestamps per user and
+rewrites it on every call. These throttles use GCRA instead: one timestamp
+per user and scope, updated atomically in the shared ``default`` cache (see
+``django_konsultabot.caching.gcra``), so limits hold across workers. Budgets
+come from ``THROTTLE_RATES`` in ``KONSULTABOT_SETTINGS``, per scope and per
+role, read from the request user's token claims; a scope missing there is
+a configuration error, as with DRF's own throttles. Anonymous clients are
+keyed by IP and use the ``anon`` budget. A full budget may be spent in one
+burst, after which requests are spaced evenly; throttled responses carry
+``Retry-After``.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+from django_konsultabot.caching import gcra
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'100/hour'`` -> ``(100, 3600)``; None for an unlimited rate"""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class RoleRateThrottle(BaseThrottle):
+    """GCRA throttle with a budget per role for one ``scope``"""
+
+    scope = None
+    cache_alias = 'default'
+
+    def __init__(self):
+        self._wait = None
+
+    def get_rate(self, role):
+        """Rate for ``role`` in this scope; roles not listed get the student rate"""
+        rates = getattr(settings, 'KONSULTABOT_SETTINGS', {}).get('THROTTLE_RATES', {})
+        try:
+            rates = rates[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No throttle rates set for '{self.scope}' scope in THROTTLE_RATES")
+        return rates.get(role, rates.get('student'))
+
+    def get_cache_key(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return user.role, f'throttle:{self.scope}:{user.pk}'
+        return 'anon', f'throttle:{self.scope}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        role, key = self.get_cache_key(request)
+        rate = parse_rate(self.get_rate(role))
+        if rate is None:
+            return True
+
+        num_requests, duration = rate
+        interval = duration / num_requests
+        self._wait = gcra(caches[self.cache_alias], key, interval, interval * (num_requests - 1))
+        return self._wait <= 0
+
+    def wait(self):
+        # Whole seconds, as sent in Retry-After
+        return math.ceil(self._wait) if self._wait else None
+
+
+class ChatRateThrottle(RoleRateThrottle):
+    scope = 'chat'
+
+
+class VoiceRateThrottle(RoleRateThrottle):
+    scope = 'voice'
+
+
+class ApiRateThrottle(RoleRateThrottle):
+    """Default throttle for every API view"""
+    scope = 'api'
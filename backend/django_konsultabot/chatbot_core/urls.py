@@ -15,6 +15,8 @@ urlpatterns = [
     # Voice processing endpoints
     path('speech-to-text/', views.speech_to_text_endpoint, name='speech_to_text'),
     path('text-to-speech/', views.text_to_speech_endpoint, name='text_to_speech'),
+    path('audio/<str:token>/', views.tts_audio_endpoint, name='tts_audio'),
+    path('voice-turn/', views.voice_turn_endpoint, name='voice_turn'),
     
     # Translation endpoint
     path('translate/', views.translate_endpoint, name='translate'),
@@ -26,6 +28,9 @@ urlpatterns = [
     path('sessions/<str:session_id>/history/', views.session_history, name='session_history'),
     path('history/', views.chat_history, name='chat_history'),
     
+    # Offline queue replay
+    path('offline/', views.offline_status, name='offline_status'),
+    
     # Gemini endpoints
     path('gemini/', include([
         path('', views_gemini.gemini_chat, name='gemini_chat'),
@@ -0,0 +1,245 @@
+"""
+Vectorized audio preprocessing for speech recognition
+
+Replaces the pydub chain (set_channels -> set_frame_rate -> set_sample_width
+-> normalize -> high_pass_filter) with a single NumPy/SciPy pass over one
+float32 buffer. WAV input is decoded with the standard ``wave`` module so no
+ffmpeg subprocess is spawned; other containers are decoded once and then
+handed to the same pipeline.
+"""
+import io
+import logging
+import math
+import wave
+from typing import Optional, Tuple
+
+logger = logging.getLogger('konsultabot.speech')
+
+try:
+    import numpy as np
+    from scipy.signal import lfilter, resample_poly
+    NUMPY_AUDIO_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+    NUMPY_AUDIO_AVAILABLE = False
+
+
+TARGET_SAMPLE_RATE = 16000
+INT16_MAX = 32767.0
+
+# Decoded PCM sample width (bytes) -> NumPy dtype and full-scale value
+_PCM_FORMATS = {
+    1: ('u1', 128.0),
+    2: ('<i2', 32768.0),
+    4: ('<i4', 2147483648.0),
+}
+
+
+class AudioPreprocessor:
+    """
+    Downmix, resample, normalize, high-pass and trim audio in place.
+
+    All stages operate on a single float32 working buffer; each stage writes
+    back into the buffer it was given (``out=``) instead of allocating a new
+    segment, and trimming returns a view rather than a copy.
+    """
+
+    def __init__(self, target_rate: int = TARGET_SAMPLE_RATE,
+                 highpass_hz: float = 300.0, headroom_db: float = 0.1,
+                 trim_silence: bool = True, frame_ms: int = 20,
+                 silence_threshold_db: float = -40.0, padding_ms: int = 150):
+        self.target_rate = target_rate
+        self.highpass_hz = highpass_hz
+        self.headroom_db = headroom_db
+        self.trim_silence = trim_silence
+        self.frame_ms = frame_ms
+        self.silence_threshold_db = silence_threshold_db
+        self.padding_ms = padding_ms
+
+        # Filter coefficients are cached per sample rate
+        self._biquad_cache = {}
+
+    # ------------------------------------------------------------------
+    # Decoding / encoding
+    # ------------------------------------------------------------------
+
+    def decode(self, audio_data: bytes, audio_format: str = 'wav') -> Tuple['np.ndarray', int]:
+        """Decode audio bytes to a float32 (frames, channels) array and sample rate"""
+        if audio_format.lower() == 'wav':
+            try:
+                return self._decode_wav(audio_data)
+            except (wave.Error, EOFError, ValueError) as e:
+                # Non-PCM WAV (e.g. float or 24-bit): let pydub handle it
+                logger.debug(f"Native WAV decode failed: {e}")
+
+        return self._decode_with_pydub(audio_data, audio_format)
+
+    def _decode_wav(self, audio_data: bytes) -> Tuple['np.ndarray', int]:
+        with wave.open(io.BytesIO(audio_data), 'rb') as wav:
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            frame_rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+
+        if sample_width not in _PCM_FORMATS:
+            raise ValueError(f"Unsupported sample width: {sample_width}")
+
+        dtype, full_scale = _PCM_FORMATS[sample_width]
+        samples = self._to_float(np.frombuffer(frames, dtype=dtype), sample_width, full_scale)
+        return samples.reshape(-1, channels), frame_rate
+
+    def _decode_with_pydub(self, audio_data: bytes, audio_format: str) -> Tuple['np.ndarray', int]:
+        from pydub import AudioSegment
+
+        fmt = audio_format.lower()
+        if fmt in ['m4a', 'aac']:
+            fmt = 'm4a'
+        elif fmt not in ['wav', 'mp3', 'ogg', 'flac', 'webm']:
+            # Let ffmpeg auto-detect the container
+            fmt = None
+        audio = AudioSegment.from_file(io.BytesIO(audio_data), format=fmt)
+
+        sample_width = audio.sample_width
+        if sample_width not in _PCM_FORMATS:
+            audio = audio.set_sample_width(2)
+            sample_width = 2
+
+        dtype, full_scale = _PCM_FORMATS[sample_width]
+        samples = self._to_float(np.frombuffer(audio.raw_data, dtype=dtype), sample_width, full_scale)
+        return samples.reshape(-1, audio.channels), audio.frame_rate
+
+    @staticmethod
+    def _to_float(raw: 'np.ndarray', sample_width: int, full_scale: float) -> 'np.ndarray':
+        """Convert PCM integers to float32 in [-1, 1) with a single allocation"""
+        samples = raw.astype(np.float32)
+        if sample_width == 1:
+            # 8-bit WAV is unsigned
+            samples -= 128.0
+        samples *= 1.0 / full_scale
+        return samples
+
+    @staticmethod
+    def encode_wav(samples: 'np.ndarray', sample_rate: int) -> bytes:
+        """Encode a mono float32 buffer as 16-bit PCM WAV"""
+        np.clip(samples, -1.0, 1.0, out=samples)
+        samples *= INT16_MAX
+        pcm = np.rint(samples, out=samples).astype('<i2')
+
+        output_buffer = io.BytesIO()
+        with wave.open(output_buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm.tobytes())
+        return output_buffer.getvalue()
+
+    # ------------------------------------------------------------------
+    # Processing stages
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def downmix(samples: 'np.ndarray') -> 'np.ndarray':
+        """Average all channels into a contiguous mono buffer"""
+        if samples.ndim == 1:
+            return samples
+        if samples.shape[1] == 1:
+            return samples[:, 0]
+
+        mono = samples[:, 0].copy()
+        for channel in range(1, samples.shape[1]):
+            mono += samples[:, channel]
+        mono *= 1.0 / samples.shape[1]
+        return mono
+
+    @staticmethod
+    def resample(samples: 'np.ndarray', source_rate: int, target_rate: int) -> 'np.ndarray':
+        """Polyphase resampling between integer sample rates"""
+        if source_rate == target_rate or samples.size == 0:
+            return samples
+
+        divisor = math.gcd(int(source_rate), int(target_rate))
+        up = int(target_rate) // divisor
+        down = int(source_rate) // divisor
+        return resample_poly(samples, up, down).astype(np.float32, copy=False)
+
+    def normalize(self, samples: 'np.ndarray') -> 'np.ndarray':
+        """Peak-normalize in place, leaving ``headroom_db`` below full scale"""
+        peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+        if peak > 0.0:
+            target_peak = 10 ** (-self.headroom_db / 20.0)
+            samples *= target_peak / peak
+        return samples
+
+    def _highpass_coefficients(self, sample_rate: int):
+        """RBJ cookbook biquad high-pass coefficients (Q = 1/sqrt(2))"""
+        key = (sample_rate, self.highpass_hz)
+        if key not in self._biquad_cache:
+            w0 = 2.0 * math.pi * self.highpass_hz / sample_rate
+            cos_w0 = math.cos(w0)
+            alpha = math.sin(w0) / (2.0 * (1.0 / math.sqrt(2.0)))
+
+            a0 = 1.0 + alpha
+            b = np.array([(1.0 + cos_w0) / 2.0, -(1.0 + cos_w0), (1.0 + cos_w0) / 2.0]) / a0
+            a = np.array([1.0, -2.0 * cos_w0 / a0, (1.0 - alpha) / a0])
+            self._biquad_cache[key] = (b, a)
+        return self._biquad_cache[key]
+
+    def highpass(self, samples: 'np.ndarray', sample_rate: int) -> 'np.ndarray':
+        """Apply a second-order high-pass filter, writing back into ``samples``"""
+        if not self.highpass_hz or samples.size == 0:
+            return samples
+        b, a = self._highpass_coefficients(sample_rate)
+        samples[:] = lfilter(b, a, samples)
+        return samples
+
+    def trim(self, samples: 'np.ndarray', sample_rate: int) -> 'np.ndarray':
+        """
+        Drop leading and trailing silence using short-time frame energy.
+
+        Returns a view into ``samples``; nothing is copied.
+        """
+        frame_len = max(1, int(sample_rate * self.frame_ms / 1000))
+        n_frames = samples.size // frame_len
+        if n_frames == 0:
+            return samples
+
+        frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+        energy = np.einsum('ij,ij->i', frames, frames) / frame_len
+
+        threshold = 10 ** (self.silence_threshold_db / 10.0)
+        voiced = np.flatnonzero(energy > threshold)
+        if voiced.size == 0:
+            return samples[:0]
+
+        padding = int(sample_rate * self.padding_ms / 1000)
+        start = max(0, voiced[0] * frame_len - padding)
+        end = min(samples.size, (voiced[-1] + 1) * frame_len + padding)
+        return samples[start:end]
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+
+    def process_array(self, samples: 'np.ndarray', sample_rate: int) -> 'np.ndarray':
+        """Run every stage on a decoded (frames, channels) or mono array"""
+        mono = self.downmix(samples)
+        mono = self.resample(mono, sample_rate, self.target_rate)
+        mono = self.highpass(mono, self.target_rate)
+        if self.trim_silence:
+            # Before normalizing: the threshold is absolute, and normalizing
+            # would lift room noise above it
+            mono = self.trim(mono, self.target_rate)
+        return self.normalize(mono)
+
+    def process(self, audio_data: bytes, audio_format: str = 'wav') -> Optional[bytes]:
+        """
+        Decode, process and re-encode audio for recognition
+
+        Returns:
+            16 kHz mono 16-bit WAV bytes, or None if the clip is pure silence
+        """
+        samples, sample_rate = self.decode(audio_data, audio_format)
+        processed = self.process_array(samples, sample_rate)
+        if processed.size == 0:
+            return None
+        return self.encode_wav(processed, self.target_rate)
@@ -4,7 +4,7 @@ Enhanced Gemini API Integration for KonsultaBot
 import os
 import time
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Callable, Optional, List, Dict, Any
 from django.conf import settings
 import google.generativeai as genai
 
@@ -125,64 +125,8 @@ class GeminiModelManager:
                     'confidence': 0.0
                 }
 
-            # Build the prompt template with language support
-            prompt_template = """
-            You are KonsultaBot, a helpful IT support assistant for EVSU Dulag Campus.
-            Your role is to provide clear, accurate technical assistance in {language}.
-
-            Important Guidelines:
-            - Focus on EVSU Dulag Campus context for location/service questions
-            - Keep responses concise but informative
-            - Use simple technical terms when possible
-            - If asked in local language, respond in the same language
-            - Always maintain a helpful and professional tone
-
-            Previous Context: {context}
-            User Query: {query}
-
-            Provide a helpful response in this format:
-            1. Direct answer/solution
-            2. Any necessary steps or instructions
-            3. Additional context or tips if relevant
-
-            Remember to respond in {language}.
-            """
-
-            # Build the complete prompt
-            full_prompt = prompt_template.format(
-                context=context if context else "No previous context",
-                query=prompt,
-                language=language
-            )
-
-            # Apply generation parameters with improved defaults and safety
-            generation_config = {
-                'temperature': float(self.config.get('TEMPERATURE', 0.7)),
-                'top_p': float(self.config.get('TOP_P', 0.95)),
-                'top_k': int(self.config.get('TOP_K', 40)),
-                'max_output_tokens': int(self.config.get('MAX_TOKENS', 2048)),
-                'candidate_count': 1,
-            }
-
-            # Add safety settings
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                }
-            ]
+            full_prompt = self._build_prompt(prompt, context, language)
+            generation_config, safety_settings = self._generation_settings()
 
             # Generate response with timeout and retry logic
             max_retries = 3
@@ -232,6 +176,125 @@ class GeminiModelManager:
                 'confidence': 0.0
             }
 
+    def _build_prompt(self, prompt: str, context: Optional[str] = None, language: str = 'english') -> str:
+        """Build the KonsultaBot prompt with language support."""
+        # Build the prompt template with language support
+        prompt_template = """
+        You are KonsultaBot, a helpful IT support assistant for EVSU Dulag Campus.
+        Your role is to provide clear, accurate technical assistance in {language}.
+
+        Important Guidelines:
+        - Focus on EVSU Dulag Campus context for location/service questions
+        - Keep responses concise but informative
+        - Use simple technical terms when possible
+        - If asked in local language, respond in the same language
+        - Always maintain a helpful and professional tone
+
+        Previous Context: {context}
+        User Query: {query}
+
+        Provide a helpful response in this format:
+        1. Direct answer/solution
+        2. Any necessary steps or instructions
+        3. Additional context or tips if relevant
+
+        Remember to respond in {language}.
+        """
+
+        # Build the complete prompt
+        return prompt_template.format(
+            context=context if context else "No previous context",
+            query=prompt,
+            language=language
+        )
+
+    def _generation_settings(self):
+        """Generation parameters and safety settings shared by all generate calls."""
+        # Apply generation parameters with improved defaults and safety
+        generation_config = {
+            'temperature': float(self.config.get('TEMPERATURE', 0.7)),
+            'top_p': float(self.config.get('TOP_P', 0.95)),
+            'top_k': int(self.config.get('TOP_K', 40)),
+            'max_output_tokens': int(self.config.get('MAX_TOKENS', 2048)),
+            'candidate_count': 1,
+        }
+
+        # Add safety settings
+        safety_settings = [
+            {
+                "category": "HARM_CATEGORY_HARASSMENT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            },
+            {
+                "category": "HARM_CATEGORY_HATE_SPEECH",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            },
+            {
+                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            },
+            {
+                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            }
+        ]
+
+        return generation_config, safety_settings
+
+    def generate_response_stream(self, prompt: str, context: Optional[str] = None,
+                                 language: str = 'english',
+                                 on_chunk: Optional[Callable[[str], None]] = None,
+                                 on_reset: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """
+        Generate a response with streaming, passing text to ``on_chunk`` as it arrives.
+        
+        Returns the same dict shape as ``generate_response`` once the stream ends.
+        If the stream fails (including a safety-blocked chunk), the partial
+        text is never returned: ``on_reset`` is called if anything was
+        streamed, and the non-streaming path answers instead.
+        """
+        if not self.model:
+            return self.generate_response(prompt, context, language)
+
+        full_prompt = self._build_prompt(prompt, context, language)
+        generation_config, safety_settings = self._generation_settings()
+
+        parts = []
+        try:
+            response = self.model.generate_content(
+                full_prompt,
+                generation_config=generation_config,
+                safety_settings=safety_settings,
+                stream=True
+            )
+            for chunk in response:
+                # .text raises ValueError when the chunk was blocked
+                text = chunk.text
+                if not text:
+                    continue
+                parts.append(text)
+                if on_chunk:
+                    on_chunk(text)
+        except Exception as e:
+            logger.warning(f"Streaming generation failed after {len(parts)} chunks: {str(e)}")
+            if parts and on_reset:
+                on_reset()
+            parts = []
+
+        if not parts:
+            result = self.generate_response(prompt, context, language)
+            if on_chunk and result.get('success') and result.get('message'):
+                on_chunk(result['message'])
+            return result
+
+        return {
+            'success': True,
+            'message': ''.join(parts),
+            'language': language,
+            'model': self.model_name,
+            'confidence': 0.95,
+        }
+
     def get_fallback_response(self, language: str = 'english') -> str:
         """Get a fallback response in the appropriate language."""
         fallback_responses = {
@@ -4,19 +4,23 @@ Enhanced Network Detection with Offline Queue Management
 import requests
 import logging
 import time
+from datetime import datetime, timezone as dt_timezone
 from typing import Optional, Dict, Any
-from django.core.cache import cache
+from django_konsultabot.caching import cache_namespace
+from work_queue import OFFLINE_QUERIES, get_queue
 from django.conf import settings
-from django.utils import timezone
 
 logger = logging.getLogger('konsultabot.network')
 
+network_cache = cache_namespace('network')
+
 
 class NetworkDetector:
     """Advanced network detection with caching and fallback strategies"""
     
     def __init__(self):
         self.cache_timeout = 60  # Cache network status for 1 minute
+        self.last_status = None  # result of the previous live test in this process
         self.test_urls = [
             'https://www.google.com',
             'https://8.8.8.8',  # Google DNS
@@ -34,7 +38,7 @@ class NetworkDetector:
             bool: True if connected, False otherwise
         """
         # Check cache first
-        cached_status = cache.get('network_status')
+        cached_status = network_cache.get('network_status')
         if cached_status is not None:
             return cached_status
         
@@ -42,9 +46,14 @@ class NetworkDetector:
         connected = self._test_connectivity(timeout)
         
         # Cache the result
-        cache.set('network_status', connected, self.cache_timeout)
+        network_cache.set('network_status', connected, self.cache_timeout)
         
         logger.info(f"Network status: {'Connected' if connected else 'Offline'}")
+        if connected and self.last_status is False:
+            # Back online: drain the offline queue in the background
+            from .replay_worker import offline_replay
+            offline_replay.start()
+        self.last_status = connected
         return connected
     
     def _test_connectivity(self, timeout: float) -> bool:
@@ -70,7 +79,7 @@ class NetworkDetector:
             Dict with connection metrics
         """
         # Check cache first
-        cached_quality = cache.get('connection_quality')
+        cached_quality = network_cache.get('connection_quality')
         if cached_quality is not None:
             return cached_quality
             
@@ -81,7 +90,7 @@ class NetworkDetector:
                 'latency': None,
                 'recommended_mode': 'offline'
             }
-            cache.set('connection_quality', quality_data, 60)  # Cache for 1 minute
+            network_cache.set('connection_quality', quality_data, 60)  # Cache for 1 minute
             return quality_data
         
         # Test latency
@@ -128,16 +137,20 @@ class NetworkDetector:
     
     def force_refresh(self) -> bool:
         """Force refresh network status (bypass cache)"""
-        cache.delete('network_status')
+        network_cache.delete('network_status')
         return self.is_connected()
 
 
 class OfflineQueueManager:
-    """Manages offline query queue with Django models"""
+    """Django-side access to the shared offline query queue (work_queue.py)"""
     
     def __init__(self):
         self.max_queue_size = 100
     
+    @property
+    def queue(self):
+        return get_queue()
+    
     def add_to_queue(self, user, query: str, language: str = 'english', 
                     metadata: Optional[Dict] = None) -> bool:
         """
@@ -153,27 +166,17 @@ class OfflineQueueManager:
             bool: True if added successfully
         """
         try:
-            from analytics.models import OfflineQuery
+            owner = user.pk if user is not None and user.is_authenticated else None
+            self.queue.enqueue(OFFLINE_QUERIES, {
+                'query': query,
+                'language': language,
+                'metadata': metadata or {},
+            }, owner=owner)
             
-            # Check queue size limit
-            queue_count = OfflineQuery.objects.filter(user=user, is_processed=False).count()
-            if queue_count >= self.max_queue_size:
-                # Remove oldest unprocessed query
-                oldest = OfflineQuery.objects.filter(
-                    user=user, is_processed=False
-                ).order_by('created_at').first()
-                if oldest:
-                    oldest.delete()
+            # Enforce the per-user size limit, dropping the oldest
+            self.queue.trim(OFFLINE_QUERIES, owner, self.max_queue_size)
             
-            # Add new query to queue
-            OfflineQuery.objects.create(
-                user=user,
-                query=query,
-                language=language,
-                metadata=metadata or {},
-            )
-            
-            logger.info(f"Added query to offline queue for user {user.username}")
+            logger.info(f"Added query to offline queue for user {getattr(user, 'username', 'anonymous')}")
             return True
             
         except Exception as e:
@@ -183,22 +186,15 @@ class OfflineQueueManager:
     def get_pending_queries(self, user) -> list:
         """Get all pending queries for a user"""
         try:
-            from analytics.models import OfflineQuery
-            
-            queries = OfflineQuery.objects.filter(
-                user=user,
-                is_processed=False
-            ).order_by('created_at')
-            
             return [
                 {
-                    'id': q.id,
-                    'query': q.query,
-                    'language': q.language,
-                    'metadata': q.metadata,
-                    'created_at': q.created_at.isoformat()
+                    'id': job['id'],
+                    'query': job['payload']['query'],
+                    'language': job['payload'].get('language', 'english'),
+                    'metadata': job['payload'].get('metadata', {}),
+                    'created_at': datetime.fromtimestamp(job['created_at'], tz=dt_timezone.utc).isoformat()
                 }
-                for q in queries
+                for job in self.queue.pending(OFFLINE_QUERIES, owner=user.pk)
             ]
             
         except Exception as e:
@@ -206,16 +202,10 @@ class OfflineQueueManager:
             return []
     
     def mark_processed(self, query_id: int, response: str = None) -> bool:
-        """Mark a queued query as processed"""
+        """Mark a queued query as processed outside the replay worker"""
         try:
-            from analytics.models import OfflineQuery
-            
-            query = OfflineQuery.objects.get(id=query_id)
-            query.is_processed = True
-            query.response = response
-            query.processed_at = timezone.now()
-            query.save()
-            
+            if not self.queue.complete(query_id, {'response': response or ''}):
+                return False
             logger.info(f"Marked query {query_id} as processed")
             return True
             
@@ -223,33 +213,13 @@ class OfflineQueueManager:
             logger.error(f"Failed to mark query as processed: {e}")
             return False
     
-    def sync_pending_queries(self, user):
-        """Process all pending queries when connection returns"""
-        from chatbot_core.utils.ai_processor import AIProcessor
-        
-        pending = self.get_pending_queries(user)
-        processor = AIProcessor()
-        
-        synced_count = 0
-        for query_data in pending:
-            try:
-                # Process the query with AI
-                response = processor.process_query(
-                    user=user,
-                    query=query_data['query'],
-                    language=query_data['language'],
-                    force_online=True
-                )
-                
-                # Mark as processed
-                self.mark_processed(query_data['id'], response.get('message', ''))
-                synced_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to sync query {query_data['id']}: {e}")
+    def sync_pending_queries(self, user=None):
+        """Start replaying queued queries in the background; returns the user's backlog"""
+        from chatbot_core.utils.replay_worker import offline_replay
         
-        logger.info(f"Synced {synced_count} offline queries for user {user.username}")
-        return synced_count
+        offline_replay.start()
+        counts = self.queue.counts(OFFLINE_QUERIES, owner=user.pk if user is not None else None)
+        return counts['ready'] + counts['leased']
 
 
 # Global instances
@@ -1,5 +1,10 @@
 """
 Offline Query Handler for KonsultaBot
+
+Stores queries received while the server runs in offline mode on the shared
+work queue (work_queue.py), where the replay worker answers them once the
+connection returns. Unsynced rows left in the old offline_queries.db are
+moved onto the queue the first time the handler starts.
 """
 import json
 import logging
@@ -8,100 +13,83 @@ from pathlib import Path
 from typing import Dict, Any, List, Optional
 from django.conf import settings
 
+from work_queue import OFFLINE_QUERIES, get_queue
+
 logger = logging.getLogger('konsultabot.offline')
 
 class OfflineQueryHandler:
     """Handles offline query storage and synchronization"""
-    
+
     def __init__(self):
-        self.db_path = Path(settings.BASE_DIR) / 'offline_queries.db'
-        self._init_db()
-    
-    def _init_db(self):
-        """Initialize SQLite database for offline storage"""
+        self.queue = get_queue()
+        self._import_legacy(Path(settings.BASE_DIR) / 'offline_queries.db')
+
+    def _import_legacy(self, path):
+        """Move unsynced queries from the pre-queue database, then retire the file"""
+        if not path.exists():
+            return
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                CREATE TABLE IF NOT EXISTS offline_queries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    query TEXT,
-                    timestamp TEXT,
-                    synced BOOLEAN DEFAULT 0,
-                    response TEXT,
-                    metadata TEXT
-                )
-                ''')
-                conn.commit()
-        except Exception as e:
-            logger.error(f"Failed to initialize offline database: {e}")
-    
-    def store_query(self, user_id: int, query: str, metadata: Dict = None) -> bool:
+            conn = sqlite3.connect(path)
+            try:
+                rows = conn.execute(
+                    'SELECT user_id, query, metadata FROM offline_queries WHERE synced = 0 ORDER BY id'
+                ).fetchall()
+            finally:
+                conn.close()
+            for user_id, query, metadata in rows:
+                self.store_query(user_id, query, json.loads(metadata or '{}'))
+            path.rename(path.with_suffix('.db.imported'))
+            logger.info(f"Moved {len(rows)} queries from {path.name} to the work queue")
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.error(f"Failed to import {path.name}: {e}")
+
+    def store_query(self, user_id: Optional[int], query: str, metadata: Dict = None) -> bool:
         """Store a query for offline processing"""
+        metadata = metadata or {}
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    'INSERT INTO offline_queries (user_id, query, timestamp, metadata) VALUES (?, ?, datetime("now"), ?)',
-                    (user_id, query, json.dumps(metadata or {}))
-                )
-                conn.commit()
-                return True
+            self.queue.enqueue(OFFLINE_QUERIES, {
+                'query': query,
+                'language': metadata.get('language') or 'english',
+                'metadata': metadata,
+            }, owner=user_id)
+            return True
         except Exception as e:
             logger.error(f"Failed to store offline query: {e}")
             return False
-    
+
     def get_pending_queries(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Get queries that need to be synced"""
+        """Get queries that still wait for an answer"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                if user_id is not None:
-                    cursor.execute(
-                        'SELECT * FROM offline_queries WHERE user_id = ? AND synced = 0 ORDER BY timestamp',
-                        (user_id,)
-                    )
-                else:
-                    cursor.execute('SELECT * FROM offline_queries WHERE synced = 0 ORDER BY timestamp')
-                
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+            return [
+                {
+                    'id': job['id'],
+                    'user_id': job['owner'] or None,
+                    'query': job['payload']['query'],
+                    'metadata': job['payload'].get('metadata', {}),
+                    'state': job['state'],
+                }
+                for job in self.queue.pending(OFFLINE_QUERIES, owner=user_id)
+            ]
         except Exception as e:
             logger.error(f"Failed to get pending queries: {e}")
             return []
-    
+
     def mark_synced(self, query_id: int, response: str) -> bool:
-        """Mark a query as synced with its response"""
+        """Mark a query as answered with its response"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    'UPDATE offline_queries SET synced = 1, response = ? WHERE id = ?',
-                    (response, query_id)
-                )
-                conn.commit()
-                return True
+            return self.queue.complete(query_id, {'response': response})
         except Exception as e:
             logger.error(f"Failed to mark query as synced: {e}")
             return False
-    
+
     def clear_old_queries(self, days: int = 30) -> bool:
-        """Clear queries older than specified days"""
+        """Clear answered queries older than specified days"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    'DELETE FROM offline_queries WHERE datetime(timestamp) < datetime("now", ?)',
-                    (f'-{days} days',)
-                )
-                conn.commit()
-                return True
+            self.queue.purge(OFFLINE_QUERIES, older_than_days=days)
+            return True
         except Exception as e:
             logger.error(f"Failed to clear old queries: {e}")
             return False
 
 # Global instance
-offline_handler = OfflineQueryHandler()
\ No newline at end of file
+offline_handler = OfflineQueryHandler()
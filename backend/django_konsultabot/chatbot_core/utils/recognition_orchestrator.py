@@ -0,0 +1,200 @@
+"""
+Recognition Orchestrator - Race local speech engines under a deadline
+
+Instead of trying Google SR, Sphinx and Wit strictly one after another, all
+available engines are started together and the first confident transcript
+wins. Lower-confidence results (e.g. offline Sphinx) are held as a fallback
+until the deadline in case a better engine answers. Per-engine latency and
+win rates are tracked so the launch order adapts over time.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger('konsultabot.speech')
+
+# One bounded pool for every request, so engines left running by losing
+# races cannot pile up threads
+_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix='konsultabot-stt')
+
+
+class EngineStats:
+    """Running latency and outcome counters for one recognition engine"""
+
+    # Weight of the newest sample in the latency moving average
+    LATENCY_ALPHA = 0.2
+
+    def __init__(self, name: str):
+        self.name = name
+        self.attempts = 0
+        self.successes = 0
+        self.wins = 0
+        self.failures = 0
+        self.avg_latency: Optional[float] = None
+
+    def record(self, latency: float, success: bool):
+        self.attempts += 1
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency += self.LATENCY_ALPHA * (latency - self.avg_latency)
+
+    @property
+    def win_rate(self) -> float:
+        # Laplace smoothing so untried engines are not starved
+        return (self.wins + 1) / (self.attempts + 2)
+
+    def score(self) -> float:
+        """Higher is better: likely to win and quick about it"""
+        return self.win_rate / (1.0 + (self.avg_latency or 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'engine': self.name,
+            'attempts': self.attempts,
+            'successes': self.successes,
+            'wins': self.wins,
+            'failures': self.failures,
+            'win_rate': round(self.win_rate, 3),
+            'avg_latency': round(self.avg_latency, 3) if self.avg_latency is not None else None,
+        }
+
+
+class RecognitionOrchestrator:
+    """
+    Run recognition engines concurrently and return the best timely result
+
+    Engines are registered as ``(name, func, confidence)`` where ``func(audio,
+    language)`` returns a transcript or None, and ``confidence`` is the fixed
+    estimate reported for that engine. Engines run on the module's bounded
+    pool; engine functions are expected to enforce their own
+    hard timeout so a worker is never held for long. Each engine's deadline
+    starts when it actually begins running, so time spent queued behind
+    other requests does not count against it, and ``max_queue_wait`` bounds
+    that queueing. Once a confident result arrives the remaining engines are
+    cancelled if they have not started yet, and ignored otherwise.
+    """
+
+    def __init__(self, deadline: float = 8.0, min_confidence: float = 0.6,
+                 max_queue_wait: Optional[float] = None):
+        self.deadline = deadline
+        self.min_confidence = min_confidence
+        self.max_queue_wait = max_queue_wait if max_queue_wait is not None else deadline
+        self._stats: Dict[str, EngineStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats_for(self, name: str) -> EngineStats:
+        with self._lock:
+            if name not in self._stats:
+                self._stats[name] = EngineStats(name)
+            return self._stats[name]
+
+    def order_engines(self, engines: List[Tuple[str, Callable, float]]) -> List[Tuple[str, Callable, float]]:
+        """Sort engines by their observed score, best first"""
+        return sorted(engines, key=lambda engine: self._stats_for(engine[0]).score(), reverse=True)
+
+    def _timed_call(self, name: str, func: Callable, audio, language: str, started_at: Dict[str, float]):
+        started = started_at[name] = time.monotonic()
+        try:
+            text = func(audio, language)
+        except Exception as e:
+            logger.debug(f"Local {name} recognition failed: {e}")
+            text = None
+        latency = time.monotonic() - started
+        text = text.strip() if text else ''
+        stats = self._stats_for(name)
+        with self._lock:
+            stats.record(latency, bool(text))
+        return text, latency
+
+    def recognize(self, audio, language: str,
+                  engines: List[Tuple[str, Callable, float]],
+                  deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Race ``engines`` on ``audio`` and return the first confident transcript
+
+        Returns a result dict shaped like ``SpeechProcessor`` local results,
+        with ``local_method`` naming the winning engine.
+        """
+        empty = {'text': '', 'confidence': 0.0, 'alternatives': []}
+        if not engines:
+            return empty
+
+        deadline = deadline if deadline is not None else self.deadline
+        submitted = time.monotonic()
+        started_at: Dict[str, float] = {}
+        futures = {}
+        for name, func, confidence in self.order_engines(engines):
+            future = _executor.submit(self._timed_call, name, func, audio, language, started_at)
+            futures[future] = (name, confidence)
+
+        best: Optional[Dict[str, Any]] = None
+        alternatives = []
+        pending = set(futures)
+
+        while pending:
+            # Each engine gets ``deadline`` from its own start; a queued one waits at most max_queue_wait
+            now = time.monotonic()
+            cutoffs = {
+                future: started_at[futures[future][0]] + deadline
+                if futures[future][0] in started_at else submitted + self.max_queue_wait
+                for future in pending
+            }
+            expired = {future for future, cutoff in cutoffs.items() if cutoff <= now}
+            if expired:
+                names = ', '.join(sorted(futures[future][0] for future in expired))
+                logger.info(f"Speech recognition gave up on {names}")
+                pending -= expired
+                for future in expired:
+                    future.cancel()
+                if not pending:
+                    break
+                continue
+
+            remaining = min(cutoffs.values()) - now
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, confidence = futures[future]
+                text, latency = future.result()
+                if not text:
+                    continue
+
+                candidate = {
+                    'text': text,
+                    'confidence': confidence,
+                    'local_method': name,
+                    'latency': latency,
+                }
+                alternatives.append({'text': text, 'confidence': confidence})
+                if best is None or candidate['confidence'] > best['confidence']:
+                    best = candidate
+
+            if best and best['confidence'] >= self.min_confidence:
+                break
+
+        for future in pending:
+            future.cancel()
+
+        if not best:
+            return empty
+
+        self._record_win(best['local_method'])
+        best['alternatives'] = [alt for alt in alternatives if alt['text'] != best['text']]
+        return best
+
+    def _record_win(self, name: str):
+        stats = self._stats_for(name)
+        with self._lock:
+            stats.wins += 1
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Per-engine statistics, best-scoring engine first"""
+        with self._lock:
+            stats = list(self._stats.values())
+        return [s.to_dict() for s in sorted(stats, key=lambda s: s.score(), reverse=True)]
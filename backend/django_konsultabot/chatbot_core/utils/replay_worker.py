@@ -0,0 +1,217 @@
+"""
+Offline Query Replay Worker
+
+When connectivity returns, queued offline queries are replayed in the
+background instead of inside the request that noticed. The worker leases a
+batch from the shared work queue (round-robin across users, so several
+processes can drain it without double-processing and a crashed worker's
+leases expire), answers the batch on a small thread pool while a rate
+budget in the shared cache keeps Gemini calls within ``OFFLINE_REPLAY_RPM``
+across all processes, and acks or nacks the whole batch in one transaction
+each. Batches are sized to what the budget can serve within a lease, and a
+job that cannot get a call before its lease runs out is released untried
+rather than answered after another worker has re-leased it. Each answer lands in the user's conversation history and stays on the
+queue, where ``offline/?after=<cursor>`` polling picks it up from any
+process; progress is kept in the cache for any process to report.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from analytics.live import live_metrics
+from django_konsultabot.caching import gcra
+from work_queue import OFFLINE_QUERIES, get_queue
+from .network_detector import network_detector
+
+logger = logging.getLogger('konsultabot.offline')
+
+
+class RateBudget:
+    """``rate`` calls per ``per`` seconds, spent through the shared ``default`` cache
+
+    The budget is a GCRA key (see ``django_konsultabot.caching.gcra``), so every
+    replay thread in every process draws from the same allowance.
+    """
+
+    def __init__(self, key, rate, per=60.0, cache_alias='default'):
+        self.key = key
+        self.cache_alias = cache_alias
+        rate = max(1, rate)
+        self.interval = per / rate
+        self.tolerance = self.interval * (rate - 1)
+
+    def acquire(self, timeout=None):
+        """Take one call from the budget, waiting for a refill; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = gcra(caches[self.cache_alias], self.key, self.interval, self.tolerance)
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class OfflineReplayWorker:
+    """Drain the offline query queue in leased batches with bounded concurrency"""
+
+    PROGRESS_KEY = 'chatbot:offline_replay:progress'
+
+    # Lease time kept back for the Gemini call itself once the budget allows it
+    CALL_ALLOWANCE = 60
+
+    def __init__(self):
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.concurrency = konsultabot_settings.get('OFFLINE_REPLAY_CONCURRENCY', 4)
+        self.batch_size = konsultabot_settings.get('OFFLINE_REPLAY_BATCH', 20)
+        self.lease_seconds = konsultabot_settings.get('OFFLINE_REPLAY_LEASE', 300)
+        rpm = konsultabot_settings.get('OFFLINE_REPLAY_RPM', 15)
+        self.budget = RateBudget('gemini:replay', rpm)
+        # At most half of what the shared budget allows in one lease, leaving room for other workers
+        budget_per_lease = rpm * max(self.lease_seconds - self.CALL_ALLOWANCE, 0) / 60
+        self.batch_size = max(1, min(self.batch_size, int(budget_per_lease / 2)))
+
+        self._worker = None
+        self._lock = threading.Lock()
+        self._processor = None
+
+    # ------------------------------------------------------------------
+    # Control
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start draining in the background; False if already running here"""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return False
+            self._worker = threading.Thread(target=self._run, name='konsultabot-offline-replay', daemon=True)
+            self._worker.start()
+        return True
+
+    @property
+    def is_running(self):
+        return self._worker is not None and self._worker.is_alive()
+
+    def progress(self):
+        """Latest progress of whichever process last replayed, plus the live backlog"""
+        progress = cache.get(self.PROGRESS_KEY) or {'state': 'idle'}
+        progress['queue'] = get_queue().counts(OFFLINE_QUERIES)
+        return progress
+
+    def _report(self, progress):
+        cache.set(self.PROGRESS_KEY, progress, None)
+        live_metrics.publish('offline_replay', progress)
+
+    # ------------------------------------------------------------------
+    # Replaying
+    # ------------------------------------------------------------------
+
+    @property
+    def processor(self):
+        if self._processor is None:
+            from .ai_processor import AIProcessor
+            self._processor = AIProcessor()
+        return self._processor
+
+    def _replay(self, job, user, budget_deadline):
+        """Answer one queued query online; returns ``(job, response, error)``
+
+        ``response`` and ``error`` are both None when the rate budget had no
+        call to spare before ``budget_deadline`` (a ``time.monotonic()`` value).
+        """
+        try:
+            if not self.budget.acquire(timeout=max(0.0, budget_deadline - time.monotonic())):
+                return job, None, None
+            response = self.processor.process_query(
+                user=user,
+                query=job.payload['query'],
+                language=job.payload.get('language', 'english'),
+                force_online=True
+            )
+            if response.get('mode') != 'online':
+                return job, None, f"Online processing unavailable ({response.get('mode')})"
+            return job, response, None
+        except Exception as e:
+            return job, None, str(e)
+        finally:
+            # Pool threads each hold their own connection; do not leak them
+            connection.close()
+
+    def _run(self):
+        close_old_connections()
+        queue = get_queue()
+        progress = {
+            'state': 'running',
+            'started_at': timezone.now().isoformat(),
+            'processed': 0,
+            'failed': 0,
+            'batches': 0,
+        }
+        self._report(progress)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='konsultabot-replay') as pool:
+                while True:
+                    if not network_detector.is_connected():
+                        progress['state'] = 'waiting_for_network'
+                        break
+                    batch = queue.lease(OFFLINE_QUERIES, self.batch_size, visibility_timeout=self.lease_seconds)
+                    if not batch:
+                        progress['state'] = 'idle'
+                        break
+                    budget_deadline = time.monotonic() + self.lease_seconds - self.CALL_ALLOWANCE
+                    users = get_user_model().objects.in_bulk({int(job.owner) for job in batch if job.owner})
+                    results = pool.map(
+                        lambda job: self._replay(job, users.get(int(job.owner or 0)), budget_deadline), batch
+                    )
+                    done, failed = self._finish(queue, list(results))
+                    progress['processed'] += done
+                    progress['failed'] += failed
+                    progress['batches'] += 1
+                    progress['updated_at'] = timezone.now().isoformat()
+                    self._report(progress)
+        except Exception as e:
+            logger.error(f"Offline replay stopped: {e}")
+            progress['state'] = 'error'
+        finally:
+            progress['finished_at'] = timezone.now().isoformat()
+            self._report(progress)
+            close_old_connections()
+        logger.info(f"Offline replay {progress['state']}: {progress['processed']} answered, {progress['failed']} failed")
+
+    def _finish(self, queue, results):
+        """Ack the answered jobs, nack the failed ones and release the untried ones"""
+        answered, failed, untried = [], [], []
+        for job, response, error in results:
+            if error:
+                job.error = error
+                failed.append(job)
+            elif response is None:
+                untried.append(job)
+            else:
+                job.result = {'response': response.get('message', ''), 'session_id': response.get('session_id')}
+                answered.append(job)
+
+        acked = queue.ack(answered)
+        if acked < len(answered):
+            logger.warning(f"{len(answered) - acked} offline answers arrived after their lease expired")
+        queue.nack(failed)
+        if untried:
+            queue.release(untried)
+            logger.info(f"Rate budget exhausted; released {len(untried)} offline queries for a later batch")
+        if failed:
+            logger.warning(f"{len(failed)} offline queries failed to replay and were returned to the queue")
+        return acked, len(failed)
+
+
+# Global instance
+offline_replay = OfflineReplayWorker()
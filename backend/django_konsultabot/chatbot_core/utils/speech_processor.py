@@ -11,6 +11,9 @@ import speech_recognition as sr
 from pydub import AudioSegment
 import json
 
+from .audio_preprocessing import AudioPreprocessor, NUMPY_AUDIO_AVAILABLE
+from .recognition_orchestrator import RecognitionOrchestrator
+
 logger = logging.getLogger('konsultabot.speech')
 
 
@@ -32,6 +35,22 @@ class SpeechProcessor:
             'spanish': 'es-ES'
         }
         
+        # Vectorized preprocessing (falls back to pydub when NumPy/SciPy are missing)
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.audio_preprocessor = AudioPreprocessor(
+            trim_silence=konsultabot_settings.get('AUDIO_TRIM_SILENCE', True)
+        ) if NUMPY_AUDIO_AVAILABLE else None
+        
+        # Local engines are raced concurrently under a deadline; the online
+        # engines also time out their requests so a worker is never held long
+        stt_deadline = konsultabot_settings.get('STT_DEADLINE_SECONDS', 8.0)
+        self.recognition_orchestrator = RecognitionOrchestrator(
+            deadline=stt_deadline,
+            min_confidence=0.6
+        )
+        self.recognizer.operation_timeout = stt_deadline
+        self.engine_confidence = {'google': 0.7, 'wit': 0.65, 'sphinx': 0.5}
+        
         # Initialize with offline mode first
         self.use_cloud = False
         self.cloud_client = None
@@ -55,9 +74,11 @@ class SpeechProcessor:
         """Initialize speech recognition with offline fallback"""
         try:
             # Initialize basic speech recognition
+            operation_timeout = self.recognizer.operation_timeout
             self.recognizer = sr.Recognizer()
             self.recognizer.energy_threshold = 4000
             self.recognizer.dynamic_energy_threshold = True
+            self.recognizer.operation_timeout = operation_timeout
             
             # Try Google Cloud Speech if available
             if self.use_cloud:
@@ -99,6 +120,9 @@ class SpeechProcessor:
         try:
             # Convert audio format if needed
             processed_audio = self._preprocess_audio(audio_data, audio_format)
+            if processed_audio is None:
+                result['error'] = 'No speech detected or recognition failed'
+                return result
             
             # Try cloud recognition first
             if self.use_cloud:
@@ -124,8 +148,23 @@ class SpeechProcessor:
         
         return result
     
-    def _preprocess_audio(self, audio_data: bytes, audio_format: str) -> bytes:
-        """Preprocess audio for optimal recognition"""
+    def _preprocess_audio(self, audio_data: bytes, audio_format: str) -> Optional[bytes]:
+        """
+        Preprocess audio for optimal recognition
+        
+        Returns 16 kHz mono 16-bit WAV bytes, or None when the clip contains
+        only silence (nothing worth sending to a recognizer).
+        """
+        if self.audio_preprocessor is not None:
+            try:
+                return self.audio_preprocessor.process(audio_data, audio_format)
+            except Exception as e:
+                logger.warning(f"Vectorized audio preprocessing failed: {e}, trying pydub")
+        
+        return self._preprocess_audio_pydub(audio_data, audio_format)
+    
+    def _preprocess_audio_pydub(self, audio_data: bytes, audio_format: str) -> bytes:
+        """Legacy pydub preprocessing chain"""
         try:
             # Load audio with pydub
             if audio_format.lower() == 'wav':
@@ -204,7 +243,7 @@ class SpeechProcessor:
         return {'text': '', 'confidence': 0.0, 'alternatives': []}
     
     def _local_speech_to_text(self, audio_data: bytes, language: str) -> Dict[str, Any]:
-        """Use local speech recognition as fallback"""
+        """Use local speech recognition as fallback, racing all available engines"""
         try:
             # Create temporary file for audio
             with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
@@ -214,30 +253,11 @@ class SpeechProcessor:
             try:
                 # Load audio file
                 with sr.AudioFile(temp_file_path) as source:
-                    # Adjust for ambient noise
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
                     audio = self.recognizer.record(source)
                 
-                # Try multiple recognition engines
-                recognition_methods = [
-                    ('google', self._try_google_sr),
-                    ('sphinx', self._try_sphinx_sr),
-                    ('wit', self._try_wit_sr)
-                ]
-                
-                for method_name, method_func in recognition_methods:
-                    try:
-                        text = method_func(audio, language)
-                        if text:
-                            return {
-                                'text': text.strip(),
-                                'confidence': 0.7,  # Estimated confidence for local
-                                'alternatives': [],
-                                'local_method': method_name
-                            }
-                    except Exception as e:
-                        logger.debug(f"Local {method_name} recognition failed: {e}")
-                        continue
+                return self.recognition_orchestrator.recognize(
+                    audio, language, self._available_engines(language)
+                )
                 
             finally:
                 # Clean up temporary file
@@ -251,6 +271,19 @@ class SpeechProcessor:
         
         return {'text': '', 'confidence': 0.0, 'alternatives': []}
     
+    def _available_engines(self, language: str) -> List[tuple]:
+        """Recognition engines that can handle this language, with their confidence"""
+        engines = [('google', self._try_google_sr, self.engine_confidence['google'])]
+        if language == 'english':
+            engines.append(('sphinx', self._try_sphinx_sr, self.engine_confidence['sphinx']))
+            if os.getenv('WIT_AI_KEY'):
+                engines.append(('wit', self._try_wit_sr, self.engine_confidence['wit']))
+        return engines
+    
+    def get_recognition_stats(self) -> List[Dict[str, Any]]:
+        """Per-engine latency and win-rate statistics for local recognition"""
+        return self.recognition_orchestrator.get_stats()
+    
     def _try_google_sr(self, audio, language: str) -> Optional[str]:
         """Try Google Speech Recognition (free tier)"""
         language_code = self.supported_languages.get(language, 'en-US')
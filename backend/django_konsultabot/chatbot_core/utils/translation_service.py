@@ -5,11 +5,13 @@ import os
 import logging
 from typing import Dict, Any, Optional, List
 from django.conf import settings
-from django.core.cache import cache
+from django_konsultabot.caching import cache_namespace
 import json
 
 logger = logging.getLogger('konsultabot.translation')
 
+translation_cache = cache_namespace('translation')
+
 
 class TranslationService:
     """
@@ -228,8 +230,8 @@ class TranslationService:
             return result
         
         # Check cache first
-        cache_key = f"translation:{hash(text)}:{source_code}:{target_code}"
-        cached_result = cache.get(cache_key)
+        cache_key = (text, source_code, target_code)
+        cached_result = translation_cache.get(cache_key)
         if cached_result:
             result.update(cached_result)
             result['method'] = 'cached'
@@ -243,7 +245,7 @@ class TranslationService:
                     result.update(cloud_result)
                     result['method'] = 'google_cloud'
                     # Cache successful translation
-                    cache.set(cache_key, cloud_result, timeout=3600)  # 1 hour
+                    translation_cache.set(cache_key, cloud_result)
                     return result
             
             # Try local translation
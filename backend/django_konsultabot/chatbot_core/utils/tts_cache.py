@@ -0,0 +1,264 @@
+"""
+Text-to-Speech Audio Cache with Signed, Short-Lived Delivery URLs
+
+Voice responses are no longer base64-encoded into the chat JSON. The chat
+endpoint registers the answer text here and returns a signed URL; the audio
+is synthesized on first fetch, compressed (Opus/OGG, falling back to
+low-bitrate MP3), stored on disk keyed by content hash and then served with
+HTTP range support by ``views.tts_audio_endpoint``. Registering text also
+prunes the cache at most once per ``TTS_CACHE_PRUNE_INTERVAL``; run
+``python manage.py prune_tts_cache`` from cron to prune without traffic.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+logger = logging.getLogger('konsultabot.speech')
+
+
+# Output codecs in order of preference: (file extension, content type, pydub export kwargs)
+COMPRESSED_CODECS = {
+    'opus': ('ogg', 'audio/ogg', {'format': 'ogg', 'codec': 'libopus', 'bitrate': '24k'}),
+    'mp3': ('mp3', 'audio/mpeg', {'format': 'mp3', 'bitrate': '48k'}),
+}
+
+CONTENT_TYPES = {
+    'ogg': 'audio/ogg',
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+}
+
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized speech"""
+
+    signer_salt = 'konsultabot.tts_audio'
+    PRUNE_KEY = 'tts:prune:fresh'
+
+    def __init__(self, speech_processor=None):
+        konsultabot_settings = getattr(settings, 'KONSULTABOT_SETTINGS', {})
+        self.cache_dir = Path(settings.MEDIA_ROOT) / 'tts_cache'
+        self.url_ttl = konsultabot_settings.get('TTS_AUDIO_URL_TTL', 300)
+        self.max_age = konsultabot_settings.get('TTS_CACHE_MAX_AGE', 7 * 24 * 3600)
+        self.prune_interval = konsultabot_settings.get('TTS_CACHE_PRUNE_INTERVAL', 3600)
+        self.codec_preference = konsultabot_settings.get('TTS_AUDIO_CODEC', 'opus')
+
+        self._speech_processor = speech_processor
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def speech_processor(self):
+        if self._speech_processor is None:
+            from .speech_processor import speech_processor
+            self._speech_processor = speech_processor
+        return self._speech_processor
+
+    @staticmethod
+    def make_key(text: str, language: str, voice_type: str = 'neutral') -> str:
+        """Stable content key for a synthesis request"""
+        digest = hashlib.sha256()
+        for part in (language, voice_type, text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def register(self, text: str, language: str = 'english',
+                 voice_type: str = 'neutral') -> str:
+        """
+        Register text for deferred synthesis and return a signed token
+
+        Nothing is synthesized here; the pending text is parked next to the
+        cached audio so whichever worker serves the audio request can pick it up.
+        """
+        key = self.make_key(text, language, voice_type)
+        if not self._touch(key):
+            pending = json.dumps({
+                'text': text,
+                'language': language,
+                'voice_type': voice_type,
+            }).encode('utf-8')
+            self._write_atomic(key, 'pending.json', pending)
+        self.prune_if_due()
+        return signing.TimestampSigner(salt=self.signer_salt).sign(key)
+
+    def store(self, text: str, audio_data: bytes, source_format: str,
+              language: str = 'english', voice_type: str = 'neutral') -> str:
+        """
+        Cache audio that was already synthesized and return a signed token
+
+        Used by the streaming pipeline, which synthesizes each sentence ahead
+        of the request for it; the audio is compressed like deferred audio.
+        """
+        key = self.make_key(text, language, voice_type)
+        if not self._touch(key):
+            with self._lock_for(key):
+                if self._find_file(key) is None:
+                    audio_data, extension = self._compress(audio_data, source_format)
+                    self._write_atomic(key, extension, audio_data)
+            with self._locks_guard:
+                self._locks.pop(key, None)
+        return signing.TimestampSigner(salt=self.signer_salt).sign(key)
+
+    def resolve_token(self, token: str) -> Optional[str]:
+        """Return the cache key for a valid, unexpired token"""
+        try:
+            return signing.TimestampSigner(salt=self.signer_salt).unsign(token, max_age=self.url_ttl)
+        except signing.BadSignature:
+            return None
+
+    def get_audio(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return ``{'path', 'content_type', 'size'}`` for a key, synthesizing on a miss
+
+        Concurrent requests for the same key wait on one synthesis.
+        """
+        found = self._find_file(key)
+        if found:
+            return found
+
+        with self._lock_for(key):
+            found = self._find_file(key)
+            if found:
+                return found
+
+            pending_path = self.cache_dir / f'{key}.pending.json'
+            try:
+                pending = json.loads(pending_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                return None
+
+            tts_result = self.speech_processor.text_to_speech(
+                pending['text'], pending['language'], pending['voice_type']
+            )
+            if not tts_result.get('audio_data'):
+                logger.error(f"TTS synthesis failed for cached audio: {tts_result.get('error')}")
+                return None
+
+            audio_data, extension = self._compress(tts_result['audio_data'], tts_result['format'])
+            self._write_atomic(key, extension, audio_data)
+            try:
+                pending_path.unlink()
+            except OSError:
+                pass
+
+        with self._locks_guard:
+            self._locks.pop(key, None)
+        return self._find_file(key)
+
+    def _compress(self, audio_data: bytes, source_format: str):
+        """Transcode to a compressed speech codec; keep the original if ffmpeg is unavailable"""
+        codec_order = [self.codec_preference] + [c for c in COMPRESSED_CODECS if c != self.codec_preference]
+        try:
+            from pydub import AudioSegment
+            audio = AudioSegment.from_file(io.BytesIO(audio_data), format=source_format)
+            audio = audio.set_channels(1)
+        except Exception as e:
+            logger.debug(f"TTS audio could not be decoded for compression: {e}")
+            return audio_data, source_format
+
+        for codec in codec_order:
+            if codec not in COMPRESSED_CODECS:
+                continue
+            extension, _, export_kwargs = COMPRESSED_CODECS[codec]
+            try:
+                output_buffer = io.BytesIO()
+                audio.export(output_buffer, **export_kwargs)
+                return output_buffer.getvalue(), extension
+            except Exception as e:
+                logger.debug(f"TTS {codec} encoding failed: {e}")
+
+        return audio_data, source_format
+
+    def _find_file(self, key: str) -> Optional[Dict[str, Any]]:
+        for extension, content_type in CONTENT_TYPES.items():
+            path = self.cache_dir / f'{key}.{extension}'
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            return {'path': path, 'content_type': content_type, 'size': stat.st_size}
+        return None
+
+    def _touch(self, key: str) -> bool:
+        """Mark cached audio as just used so prune keeps it; False if there is none"""
+        found = self._find_file(key)
+        if found is None:
+            return False
+        try:
+            os.utime(found['path'])
+        except OSError:
+            # Pruned in the meantime
+            return False
+        return True
+
+    def _write_atomic(self, key: str, extension: str, audio_data: bytes):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio_data)
+            os.replace(temp_path, self.cache_dir / f'{key}.{extension}')
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def prune(self) -> int:
+        """
+        Delete cached audio not used for ``max_age`` seconds
+
+        Issuing a token for cached audio refreshes its mtime, so audio stays
+        at least as long as any URL that points at it. Pending text and stray
+        ``.part`` files are dropped once they are older than ``url_ttl``: no
+        unexpired token can reach them any more.
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        now = time.time()
+        removed = 0
+        for path in self.cache_dir.iterdir():
+            if path.name.endswith(('.pending.json', '.part')):
+                cutoff = now - self.url_ttl
+            else:
+                cutoff = now - self.max_age
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+
+        if removed:
+            logger.info(f"Pruned {removed} files from the TTS cache")
+        return removed
+
+    def prune_if_due(self):
+        """Prune at most once per ``prune_interval`` seconds; cheap to call on every request"""
+        if cache.add(self.PRUNE_KEY, True, self.prune_interval):
+            try:
+                self.prune()
+            except Exception as e:
+                logger.error(f"TTS cache prune failed: {e}")
+
+
+# Global instance
+tts_cache = TTSCache()
@@ -0,0 +1,195 @@
+"""
+Sentence-Level Incremental Text-to-Speech
+
+Text is fed in as it becomes available (streamed Gemini chunks or a known
+knowledge-base answer), split on sentence boundaries, cleaned of markdown and
+emoji, and synthesized one sentence at a time on a worker thread. Audio for
+sentence N is produced while sentence N+1 is still being generated, so the
+first audio is ready after roughly one sentence instead of the whole answer.
+"""
+import logging
+import queue
+import re
+import threading
+from typing import Dict, Any, Iterator, List, Optional
+
+logger = logging.getLogger('konsultabot.speech')
+
+
+# Sentence end: terminal punctuation followed by whitespace, or a line break
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+
+_MARKDOWN_PATTERNS = [
+    (re.compile(r'```.*?```', re.DOTALL), ' '),           # code blocks
+    (re.compile(r'`([^`]*)`'), r'\1'),                     # inline code
+    (re.compile(r'!\[([^\]]*)\]\([^)]*\)'), r'\1'),        # images
+    (re.compile(r'\[([^\]]*)\]\([^)]*\)'), r'\1'),         # links
+    (re.compile(r'(\*\*|__)(.*?)\1'), r'\2'),              # bold
+    (re.compile(r'(?<!\w)[*_]([^*_]+)[*_](?!\w)'), r'\1'), # italics
+    (re.compile(r'^\s{0,3}#{1,6}\s*', re.MULTILINE), ''),  # headings
+    (re.compile(r'^\s*(?:[-*+•]|\d+[.)])\s+', re.MULTILINE), ''),  # list markers
+    (re.compile(r'^\s*>\s?', re.MULTILINE), ''),           # block quotes
+]
+
+_EMOJI_RE = re.compile(
+    '['
+    '\U0001F1E6-\U0001F1FF'  # flags
+    '\U0001F300-\U0001FAFF'  # symbols, pictographs, emoticons, transport
+    '\u2600-\u27BF'          # misc symbols and dingbats
+    '\u2B00-\u2BFF'          # arrows and stars
+    '\uFE0F\u200D'           # variation selector, zero-width joiner
+    ']+'
+)
+
+
+def clean_for_speech(text: str) -> str:
+    """Strip markdown formatting and emoji so only speakable text remains"""
+    for pattern, replacement in _MARKDOWN_PATTERNS:
+        text = pattern.sub(replacement, text)
+    text = _EMOJI_RE.sub('', text)
+    return re.sub(r'[ \t]+', ' ', text).strip()
+
+
+class SentenceSplitter:
+    """Incrementally split streamed text into complete sentences"""
+
+    def __init__(self, min_length: int = 20):
+        self.min_length = min_length
+        self._buffer = ''
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return any sentences that are now complete"""
+        self._buffer += text
+        parts = _SENTENCE_END_RE.split(self._buffer)
+
+        # The last part may still be growing
+        self._buffer = parts.pop()
+
+        sentences = []
+        pending = ''
+        for part in parts:
+            pending = f'{pending} {part}'.strip() if pending else part.strip()
+            # Merge very short fragments ("1.", "Hi!") into the next sentence
+            if len(pending) >= self.min_length:
+                sentences.append(pending)
+                pending = ''
+        if pending:
+            self._buffer = f'{pending} {self._buffer}' if self._buffer else pending
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text remains at the end of the stream"""
+        remainder, self._buffer = self._buffer.strip(), ''
+        return [remainder] if remainder else []
+
+
+class IncrementalSpeechPipeline:
+    """
+    Synthesize sentences in order on a background worker
+
+    Each synthesized sentence is put on ``output`` as a dict with ``type``
+    ``'audio'``; a final ``{'type': 'audio_done'}`` marks the end.
+    """
+
+    _STOP = object()
+
+    def __init__(self, speech_processor, language: str = 'english',
+                 voice_type: str = 'neutral', output: Optional[queue.Queue] = None):
+        self.speech_processor = speech_processor
+        self.language = language
+        self.voice_type = voice_type
+        self.output = output if output is not None else queue.Queue()
+
+        self._splitter = SentenceSplitter()
+        self._sentences: queue.Queue = queue.Queue()
+        self._spoken_text = ''
+        self._index = 0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='konsultabot-tts', daemon=True)
+        self._worker.start()
+
+    def feed(self, text: str):
+        """Feed newly available answer text"""
+        if self._closed or not text:
+            return
+        self._spoken_text += text
+        for sentence in self._splitter.feed(text):
+            self._enqueue(sentence)
+
+    def reset(self):
+        """Drop fed text that was not synthesized yet (the answer is being replaced)"""
+        if self._closed:
+            return
+        self._splitter = SentenceSplitter()
+        self._spoken_text = ''
+        try:
+            while True:
+                sentence = self._sentences.get_nowait()
+                if sentence is self._STOP:
+                    self._sentences.put(sentence)
+                    break
+        except queue.Empty:
+            pass
+
+    def close(self, final_text: Optional[str] = None):
+        """
+        Finish the stream
+
+        If ``final_text`` extends what was fed (e.g. a closing line appended
+        after generation), only the new suffix is spoken; if nothing was fed,
+        the whole final text is spoken.
+        """
+        if self._closed:
+            return
+        if final_text:
+            if not self._spoken_text:
+                self.feed(final_text)
+            else:
+                position = final_text.find(self._spoken_text)
+                if position >= 0:
+                    self.feed(final_text[position + len(self._spoken_text):])
+        for sentence in self._splitter.flush():
+            self._enqueue(sentence)
+        self._closed = True
+        self._sentences.put(self._STOP)
+
+    def _enqueue(self, sentence: str):
+        speakable = clean_for_speech(sentence)
+        if speakable:
+            self._sentences.put(speakable)
+
+    def _run(self):
+        while True:
+            sentence = self._sentences.get()
+            if sentence is self._STOP:
+                break
+            try:
+                tts_result = self.speech_processor.text_to_speech(
+                    sentence, self.language, self.voice_type
+                )
+            except Exception as e:
+                logger.error(f"Incremental TTS failed: {e}")
+                tts_result = {'audio_data': None, 'error': str(e)}
+
+            if tts_result.get('audio_data'):
+                self.output.put({
+                    'type': 'audio',
+                    'index': self._index,
+                    'text': sentence,
+                    'audio_data': tts_result['audio_data'],
+                    'format': tts_result.get('format'),
+                    'method': tts_result.get('method'),
+                })
+                self._index += 1
+            else:
+                logger.warning(f"Skipping sentence without audio: {tts_result.get('error')}")
+
+        self.output.put({'type': 'audio_done', 'count': self._index})
+
+    def iter_audio(self, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield audio events in order until the pipeline is closed"""
+        while True:
+            event = self.output.get(timeout=timeout)
+            if event['type'] == 'audio_done':
+                return
+            yield event
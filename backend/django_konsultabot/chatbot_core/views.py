@@ -3,7 +3,14 @@ KonsultaBot Advanced API Views - Voice, Translation, and AI Chat
 """
 import json
 import logging
-from django.http import JsonResponse, HttpResponse
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection as db_connection
+from django.db.models import F
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -12,78 +19,96 @@ from django.utils.decorators import method_decorator
 from django.utils import timezone
 from django.conf import settings
 from django.views import View
+from django.urls import reverse
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 import tempfile
 import os
 
 from .ai_handler import multilingual_ai_handler
 from .utils.speech_processor import speech_processor
 from .utils.translation_service import translation_service
+from .utils.tts_cache import tts_cache
+from .utils.tts_pipeline import IncrementalSpeechPipeline
+from . import history as history_sync
+from .utils.replay_worker import offline_replay
 from .models import ConversationSession, ChatMessage
 from analytics.models import QueryLog
+from work_queue import OFFLINE_QUERIES, get_queue
+from .throttling import ChatRateThrottle, VoiceRateThrottle
 
 logger = logging.getLogger('konsultabot.views')
 
 
-class ChatRateThrottle(UserRateThrottle):
-    scope = 'chat'
-    rate = '100/hour'
+HISTORY_FIELDS = ('id', 'message', 'response', 'timestamp', 'message_type',
+                  'response_source', 'intent_detected', 'confidence_score')
 
 
-class VoiceRateThrottle(UserRateThrottle):
-    scope = 'voice'
-    rate = '50/hour'
-
-
-from rest_framework import serializers
-
-class ChatMessageSerializer(serializers.ModelSerializer):
-    session_id = serializers.CharField(source='session.session_id')
-    
-    class Meta:
-        model = ChatMessage
-        fields = ['id', 'message', 'response', 'timestamp', 'session_id', 
-                 'message_type', 'response_source', 'intent_detected', 'confidence_score']
-
 @api_view(['GET'])
 @permission_classes([])
 def chat_history(request):
     """
-    Get chat history for the current session or all sessions
+    Get chat history for one session, or the latest messages across sessions
+    
+    GET /api/v1/chat/history/?session_id=...&since=<cursor>&before=<cursor>&limit=50
+    
+    Pass back ``cursors.since`` to receive only newer messages and
+    ``cursors.before`` to page back; send the ETag as If-None-Match to get a
+    304 when nothing changed.
     """
     try:
         session_id = request.GET.get('session_id')
+        query = request.GET.urlencode()
         
-        # Query with error handling
         if session_id:
-            # Get history for specific session
-            session = ConversationSession.objects.filter(session_id=session_id).first()
-            if not session:
+            etag, last_modified = history_sync.session_validators(session_id, query=query)
+            if etag is None:
                 return Response({
                     'status': 'error',
                     'message': 'Session not found',
                     'code': 'SESSION_NOT_FOUND'
                 }, status=status.HTTP_404_NOT_FOUND)
-                
-            messages = ChatMessage.objects.filter(session=session).order_by('timestamp')
         else:
-            messages = ChatMessage.objects.all().order_by('-timestamp')[:50]
-
-        # Get messages with select_related for efficiency
-        messages = messages.select_related('session')
+            etag, last_modified = history_sync.latest_validators(query=query)
         
-        # Serialize messages
-        serializer = ChatMessageSerializer(messages, many=True)
+        cached = history_sync.not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
         
-        return Response({
+        if session_id:
+            messages = ChatMessage.objects.filter(session__session_id=session_id)
+            fields = HISTORY_FIELDS
+        else:
+            messages = ChatMessage.objects.all()
+            fields = HISTORY_FIELDS + ('session__session_id',)
+        
+        try:
+            page = history_sync.sync_page(
+                messages, fields,
+                since=request.GET.get('since'),
+                before=request.GET.get('before'),
+                size=history_sync.page_size(request)
+            )
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'code': 'INVALID_CURSOR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        for row in page['messages']:
+            row['session_id'] = row.pop('session__session_id', session_id)
+        
+        response = Response({
             'status': 'success',
-            'history': serializer.data,
-            'count': len(serializer.data)
+            'history': page['messages'],
+            'count': len(page['messages']),
+            'has_more': page['has_more'],
+            'cursors': page['cursors']
         })
+        return history_sync.apply_validators(response, etag, last_modified)
 
     except Exception as e:
         logger.error(f"Error retrieving chat history: {str(e)}")
@@ -92,6 +117,181 @@ def chat_history(request):
             'message': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _get_or_create_session(user, session_id, language):
+    """Look up the caller's conversation session, creating one if needed"""
+    owner = user if user.is_authenticated else None
+    session = None
+    if session_id:
+        try:
+            session = ConversationSession.objects.get(
+                session_id=session_id,
+                user=owner
+            )
+        except ConversationSession.DoesNotExist:
+            pass
+    
+    if not session:
+        session = ConversationSession.objects.create(
+            user=owner,
+            language=language if language != 'auto' else 'english'
+        )
+    return session
+
+
+def _record_chat_turn(session, query, ai_response):
+    """Persist the user/bot message pair and build the chat response payload"""
+    # Save user message, already paired with the bot's reply
+    ChatMessage.objects.create(
+        session=session,
+        sender='user',
+        message=query,
+        response=ai_response['message'],
+        intent_detected=ai_response.get('intent', ''),
+        entities_extracted=ai_response.get('entities', {})
+    )
+    
+    # Save bot's response
+    ChatMessage.objects.create(
+        session=session,
+        sender='bot',
+        message=ai_response['message'],
+        response=ai_response['message'],  # Store the response separately
+        response_source=ai_response.get('source', 'unknown'),
+        response_time=ai_response.get('processing_time', 0),
+        confidence_score=ai_response.get('confidence', 0)
+    )
+    
+    return {
+        'message': ai_response['message'],
+        'session_id': str(session.session_id),
+        'language': ai_response.get('response_language', 'english'),
+        'intent': ai_response.get('intent', 'unknown'),
+        'confidence': ai_response.get('confidence', 0),
+        'source': ai_response.get('source', 'unknown'),
+        'processing_time': ai_response.get('processing_time', 0),
+        'translation_used': ai_response.get('translation_used', False),
+        'connection_status': ai_response.get('connection_status', 'unknown')
+    }
+
+
+def _ndjson(event):
+    return json.dumps(event, default=str) + '\n'
+
+
+def _stream_chat_turn(user, session, query, language, context):
+    """
+    Generate NDJSON events for a pipelined voice answer
+    
+    Events, in arrival order:
+      {"type": "text_delta", "text": ...}      streamed Gemini text
+      {"type": "text_reset"}                   discard the deltas so far; the stream failed
+      {"type": "message", ...}                 final chat payload (as chat/)
+      {"type": "audio", "index": n, ...}       audio URL for sentence n (as audio/<token>/)
+      {"type": "error", ...}
+      {"type": "done"}
+    
+    The AI query runs on a worker thread and feeds sentences to the TTS
+    pipeline as they are generated, so audio for the first sentence is
+    synthesized while the rest of the answer is still being written. The
+    stream ends with a TIMEOUT error if the answer and its audio are not
+    finished within CHAT_STREAM_TIMEOUT seconds.
+    """
+    user = user if user.is_authenticated else None
+    timeout = getattr(settings, 'KONSULTABOT_SETTINGS', {}).get('CHAT_STREAM_TIMEOUT', 120)
+    deadline = time.monotonic() + timeout
+    events = queue.Queue()
+    pipeline = IncrementalSpeechPipeline(speech_processor, language, output=events)
+    
+    def on_partial(text):
+        events.put({'type': 'text_delta', 'text': text})
+        pipeline.feed(text)
+    
+    def on_reset():
+        events.put({'type': 'text_reset'})
+        pipeline.reset()
+    
+    def run_query():
+        try:
+            ai_response = multilingual_ai_handler.handle_ai_query(
+                query=query,
+                user=user,
+                language=language,
+                session=session,
+                context=context,
+                on_partial=on_partial,
+                on_reset=on_reset
+            )
+            events.put({'type': '_ai_done', 'ai_response': ai_response})
+        except Exception as e:
+            logger.error(f"AI query processing error: {e}")
+            events.put({'type': '_ai_error', 'error': str(e)})
+        finally:
+            db_connection.close()
+    
+    threading.Thread(target=run_query, name='konsultabot-chat', daemon=True).start()
+    
+    ai_finished = audio_finished = False
+    while not (ai_finished and audio_finished):
+        try:
+            event = events.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            logger.error(f"Streamed chat turn did not finish within {timeout}s")
+            pipeline.close()
+            yield _ndjson({
+                'type': 'error',
+                'message': 'The answer took too long to generate.',
+                'code': 'TIMEOUT'
+            })
+            break
+        event_type = event['type']
+        
+        if event_type == '_ai_done':
+            ai_response = event['ai_response']
+            pipeline.close(ai_response['message'])
+            ai_finished = True
+            try:
+                response_data = _record_chat_turn(session, query, ai_response)
+            except Exception as e:
+                logger.error(f"Failed to save chat turn: {e}")
+                response_data = {'message': ai_response['message'], 'session_id': str(session.session_id)}
+            yield _ndjson({'type': 'message', **response_data})
+        
+        elif event_type == '_ai_error':
+            pipeline.close()
+            ai_finished = True
+            yield _ndjson({
+                'type': 'error',
+                'message': 'An error occurred while processing your request.',
+                'code': 'PROCESSING_ERROR'
+            })
+        
+        elif event_type == 'audio':
+            try:
+                token = tts_cache.store(
+                    event['text'], event['audio_data'], event['format'],
+                    pipeline.language, pipeline.voice_type
+                )
+            except Exception as e:
+                logger.error(f"Failed to cache streamed audio: {e}")
+                continue
+            yield _ndjson({
+                'type': 'audio',
+                'index': event['index'],
+                'text': event['text'],
+                'method': event['method'],
+                'audio_url': reverse('chatbot_core:tts_audio', args=[token]),
+                'expires_in': tts_cache.url_ttl
+            })
+        
+        elif event_type == 'audio_done':
+            audio_finished = True
+        
+        else:
+            yield _ndjson(event)
+    
+    yield _ndjson({'type': 'done'})
+
+
 @api_view(['POST'])
 @permission_classes([])
 @csrf_exempt
@@ -104,7 +304,8 @@ def chat_endpoint(request):
         "query": "How do I connect to EVSU WiFi?",
         "language": "english",  // optional, auto-detect if not provided
         "session_id": "uuid",   // optional, creates new if not provided
-        "voice_response": false,  // optional, returns TTS audio if true
+        "voice_response": false,  // optional, true for an audio URL, "stream" for
+                                  // NDJSON text + per-sentence audio events
         "offline": false  // optional, store query for later if true
     }
     """
@@ -236,25 +437,18 @@ def chat_endpoint(request):
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         # Get or create session
-        session = None
-        if session_id:
-            try:
-                session = ConversationSession.objects.get(
-                    session_id=session_id,
-                    user=request.user if request.user.is_authenticated else None
-                )
-            except ConversationSession.DoesNotExist:
-                pass
-        
-        if not session:
-            session = ConversationSession.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                language=language if language != 'auto' else 'english'
-            )
+        session = _get_or_create_session(request.user, session_id, language)
         
         # Get conversation context
         context = session.get_recent_context(limit=5)
         
+        # Pipelined voice mode: stream text and per-sentence audio as they are ready
+        if voice_response == 'stream':
+            return StreamingHttpResponse(
+                _stream_chat_turn(request.user, session, query, language, context),
+                content_type='application/x-ndjson'
+            )
+        
         # Process AI query with improved error handling
         try:
             ai_response = multilingual_ai_handler.handle_ai_query(
@@ -283,63 +477,26 @@ def chat_endpoint(request):
                 'debug_info': str(e) if settings.DEBUG else None
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        # Save user message
-        user_message = ChatMessage.objects.create(
-            session=session,
-            sender='user',
-            message=query,
-            intent_detected=ai_response.get('intent', ''),
-            entities_extracted=ai_response.get('entities', {})
-        )
-        
-        # Save bot's response
-        bot_message = ChatMessage.objects.create(
-            session=session,
-            sender='bot',
-            message=ai_response['message'],
-            response=ai_response['message'],  # Store the response separately
-            response_source=ai_response.get('source', 'unknown'),
-            response_time=ai_response.get('processing_time', 0),
-            confidence_score=ai_response.get('confidence', 0)
-        )
-        
-        # Update user message with bot's response
-        user_message.response = ai_response['message']
-        user_message.save()
+        response_data = _record_chat_turn(session, query, ai_response)
         
-        # Prepare response
-        response_data = {
-            'message': ai_response['message'],
-            'session_id': str(session.session_id),
-            'language': ai_response.get('response_language', 'english'),
-            'intent': ai_response.get('intent', 'unknown'),
-            'confidence': ai_response.get('confidence', 0),
-            'source': ai_response.get('source', 'unknown'),
-            'processing_time': ai_response.get('processing_time', 0),
-            'translation_used': ai_response.get('translation_used', False),
-            'connection_status': ai_response.get('connection_status', 'unknown')
-        }
-        
-        # Add voice response if requested
+        # Add voice response if requested. The audio is referenced by a
+        # short-lived URL and synthesized when the client fetches it, so the
+        # text is returned without waiting for TTS.
         if voice_response and ai_response['message']:
             try:
-                tts_result = speech_processor.text_to_speech(
+                token = tts_cache.register(
                     ai_response['message'],
                     ai_response.get('response_language', 'english')
                 )
-                
-                if tts_result['audio_data']:
-                    # Convert audio to base64 for JSON response
-                    import base64
-                    audio_b64 = base64.b64encode(tts_result['audio_data']).decode('utf-8')
-                    response_data['voice_response'] = {
-                        'audio_data': audio_b64,
-                        'format': tts_result['format'],
-                        'method': tts_result['method']
-                    }
+                response_data['voice_response'] = {
+                    'audio_url': request.build_absolute_uri(
+                        reverse('chatbot_core:tts_audio', args=[token])
+                    ),
+                    'expires_in': tts_cache.url_ttl
+                }
                 
             except Exception as e:
-                logger.error(f"TTS generation failed: {e}")
+                logger.error(f"TTS registration failed: {e}")
                 response_data['voice_response'] = {'error': 'TTS generation failed'}
         
         return Response(response_data, status=status.HTTP_200_OK)
@@ -553,6 +710,88 @@ def speech_to_text_endpoint(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _stream_voice_turn(user, audio_data, audio_format, language, session_id):
+    """Run STT, then the pipelined chat turn, emitting NDJSON events"""
+    stt_result = speech_processor.speech_to_text(
+        audio_data=audio_data,
+        language=language,
+        audio_format=audio_format
+    )
+    
+    transcript = stt_result.get('text', '').strip()
+    yield _ndjson({
+        'type': 'transcript',
+        'text': transcript,
+        'confidence': stt_result['confidence'],
+        'method': stt_result['method'],
+        'alternatives': stt_result.get('alternatives', [])
+    })
+    
+    if not transcript:
+        yield _ndjson({
+            'type': 'error',
+            'message': stt_result.get('error') or 'No speech detected',
+            'code': 'STT_ERROR'
+        })
+        yield _ndjson({'type': 'done'})
+        return
+    
+    session = _get_or_create_session(user, session_id, language)
+    context = session.get_recent_context(limit=5)
+    yield from _stream_chat_turn(user, session, transcript[:1000], language, context)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+@throttle_classes([VoiceRateThrottle])
+def voice_turn_endpoint(request):
+    """
+    Complete voice conversation turn in a single request
+    
+    POST /api/v1/chat/voice-turn/
+    Content-Type: multipart/form-data
+    
+    Form data:
+    - audio: Audio file (wav, mp3, m4a, etc.)
+    - language: Conversation language (optional, default english)
+    - session_id: Conversation session (optional, creates new if not provided)
+    
+    Replaces speech-to-text/ + chat/ + text-to-speech/ with one round-trip.
+    Responds with NDJSON: a "transcript" event, then the same events as the
+    streaming voice mode of chat/ (text_delta, message, audio, done).
+    """
+    if 'audio' not in request.FILES:
+        return Response({
+            'error': 'Audio file is required',
+            'code': 'MISSING_AUDIO'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    audio_file = request.FILES['audio']
+    language = request.POST.get('language', 'english').lower()
+    session_id = request.POST.get('session_id') or None
+    
+    if audio_file.size > 10 * 1024 * 1024:
+        return Response({
+            'error': 'Audio file too large (max 10MB)',
+            'code': 'FILE_TOO_LARGE'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    supported_languages = ['english', 'tagalog', 'bisaya', 'waray']
+    if language not in supported_languages:
+        return Response({
+            'error': f'Unsupported language. Supported languages: {", ".join(supported_languages)}',
+            'code': 'INVALID_LANGUAGE',
+            'supported_languages': supported_languages
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    file_extension = audio_file.name.split('.')[-1].lower() if '.' in audio_file.name else 'wav'
+    
+    return StreamingHttpResponse(
+        _stream_voice_turn(request.user, audio_file.read(), file_extension, language, session_id),
+        content_type='application/x-ndjson'
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
 def text_to_speech_endpoint(request):
@@ -613,6 +852,71 @@ def text_to_speech_endpoint(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _ranged_file_response(request, path, content_type, size):
+    """Serve a file honouring a single ``Range: bytes=start-end`` request header"""
+    range_header = request.META.get('HTTP_RANGE', '').strip()
+    match = _RANGE_RE.match(range_header) if range_header else None
+    
+    if not match or not (match.group(1) or match.group(2)):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+    
+    start_text, end_text = match.groups()
+    if start_text:
+        start = int(start_text)
+        end = min(int(end_text), size - 1) if end_text else size - 1
+    else:
+        # Suffix range: last N bytes
+        start = max(0, size - int(end_text))
+        end = size - 1
+    
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    with open(path, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start + 1)
+    
+    response = HttpResponse(chunk, status=206, content_type=content_type)
+    response['Content-Length'] = str(len(chunk))
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_http_methods(['GET', 'HEAD'])
+def tts_audio_endpoint(request, token):
+    """
+    Stream synthesized voice audio referenced by a chat response
+    
+    GET /api/v1/chat/audio/{token}/
+    
+    The signed token is the credential, so audio players that cannot attach
+    an Authorization header can fetch it directly. Supports Range requests.
+    """
+    key = tts_cache.resolve_token(token)
+    if not key:
+        return JsonResponse({
+            'error': 'Audio link is invalid or has expired',
+            'code': 'AUDIO_EXPIRED'
+        }, status=410)
+    
+    audio = tts_cache.get_audio(key)
+    if not audio:
+        raise Http404('Audio not available')
+    
+    response = _ranged_file_response(request, audio['path'], audio['content_type'], audio['size'])
+    response['Cache-Control'] = f'private, max-age={tts_cache.url_ttl}'
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
 def translate_endpoint(request):
@@ -757,46 +1061,65 @@ def health_check(request):
         }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
+SESSION_HISTORY_FIELDS = dict(
+    intent=F('intent_detected'),
+    confidence=F('confidence_score'),
+    source=F('response_source'),
+    rating=F('user_rating'),
+)
+
+
 @api_view(['GET'])
 @login_required
 def session_history(request, session_id):
     """
-    Get conversation history for a session
+    Get conversation history for a session, incrementally
     
-    GET /api/v1/chat/sessions/{session_id}/history/
+    GET /api/v1/chat/sessions/{session_id}/history/?since=<cursor>&before=<cursor>&limit=50
     """
     try:
-        session = ConversationSession.objects.get(
-            session_id=session_id,
-            user=request.user
+        etag, last_modified = history_sync.session_validators(
+            session_id, user=request.user, query=request.GET.urlencode()
         )
+        if etag is None:
+            return Response({
+                'error': 'Session not found',
+                'code': 'SESSION_NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
         
-        messages = ChatMessage.objects.filter(
-            session=session
-        ).order_by('timestamp')
-        
-        history = []
-        for message in messages:
-            history.append({
-                'id': message.id,
-                'sender': message.sender,
-                'message': message.message,
-                'timestamp': message.timestamp.isoformat(),
-                'intent': message.intent_detected,
-                'confidence': message.confidence_score,
-                'source': message.response_source,
-                'rating': message.user_rating,
-                'is_helpful': message.is_helpful
-            })
+        cached = history_sync.not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
         
-        return Response({
+        session = ConversationSession.objects.only(
+            'id', 'session_id', 'created_at', 'language', 'message_count'
+        ).get(session_id=session_id, user=request.user)
+        
+        try:
+            page = history_sync.sync_page(
+                ChatMessage.objects.filter(session=session).annotate(**SESSION_HISTORY_FIELDS),
+                ('id', 'sender', 'message', 'timestamp', 'is_helpful', *SESSION_HISTORY_FIELDS),
+                since=request.GET.get('since'),
+                before=request.GET.get('before'),
+                size=history_sync.page_size(request)
+            )
+        except ValueError as e:
+            return Response({
+                'error': str(e),
+                'code': 'INVALID_CURSOR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = Response({
             'session_id': str(session.session_id),
             'created_at': session.created_at.isoformat(),
             'language': session.language,
-            'message_count': len(history),
-            'messages': history
+            'message_count': session.message_count,
+            'messages': page['messages'],
+            'has_more': page['has_more'],
+            'cursors': page['cursors']
         }, status=status.HTTP_200_OK)
-        
+        return history_sync.apply_validators(response, etag, last_modified)
+    
     except ConversationSession.DoesNotExist:
         return Response({
             'error': 'Session not found',
@@ -832,3 +1155,56 @@ def supported_languages(request):
             'error': 'Failed to retrieve supported languages',
             'code': 'LANGUAGES_ERROR'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def offline_status(request):
+    """
+    Replay progress and the caller's queued offline queries
+    
+    GET /api/v1/chat/offline/
+    GET /api/v1/chat/offline/?after=<cursor>
+    
+    Without ``after`` the latest answers are returned, newest first. Poll
+    with the returned ``cursor`` as ``after`` to get only answers that
+    landed since, oldest first; answers are read from the shared work queue,
+    so whichever process replayed them does not matter.
+    """
+    queue = get_queue()
+    owner = request.user.pk
+    after = request.GET.get('after')
+    if after:
+        try:
+            completed_at, _, job_id = after.partition(':')
+            cursor = (float(completed_at), int(job_id))
+        except ValueError:
+            return Response({
+                'error': 'Invalid cursor',
+                'code': 'INVALID_CURSOR'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        jobs = queue.completed_since(OFFLINE_QUERIES, cursor, owner=owner, limit=50)
+    else:
+        cursor = (time.time(), 0)
+        jobs = queue.completed(OFFLINE_QUERIES, owner=owner, limit=20)
+    
+    cursor = max(((job['completed_at'], job['id']) for job in jobs), default=cursor)
+    counts = queue.counts(OFFLINE_QUERIES, owner=owner)
+    answered = [
+        {
+            'id': job['id'],
+            'query': job['payload']['query'],
+            'response': (job['result'] or {}).get('response', ''),
+            'session_id': (job['result'] or {}).get('session_id'),
+            'processed_at': datetime.fromtimestamp(job['completed_at'], tz=dt_timezone.utc),
+        }
+        for job in jobs
+    ]
+    
+    return Response({
+        'pending': counts['ready'] + counts['leased'],
+        'failed': counts['dead'],
+        'recently_answered': answered,
+        'cursor': f'{cursor[0]!r}:{cursor[1]}',
+        'replay': offline_replay.progress()
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,362 @@
+"""
+Cache Layer for KonsultaBot
+
+Every cache user works through a named namespace (``cache_namespace('kb_search')``).
+Each namespace is its own entry in ``settings.CACHES`` with its own TTL
+(``TIMEOUT``) and size budget (``MAX_ENTRIES``), all on the backend selected
+by ``KONSULTABOT_CACHE_BACKEND``:
+
+- ``locmem``: in-process LRU, one per namespace; fastest, but per worker
+- ``sqlite``: one shared SQLite file (WAL) for every worker on the host
+- ``redis``: Django's RedisCache; any Redis-protocol server will do, so a
+  local ``redis-server`` stands in for the production instance in tests
+
+Namespace keys are SHA-1 digests of the key parts, so they are identical in
+every process (unlike ``hash()``, which is randomized per interpreter).
+``clear()`` bumps a generation counter stored in the cache itself, which
+invalidates a namespace on every backend without enumerating keys; each
+process re-reads that counter at most every few seconds rather than on
+every lookup.
+Hit, miss and eviction counts are kept per namespace for the admin panel.
+``gcra()`` keeps atomic per-key rate limits (one timestamp per key) on any
+of the backends.
+"""
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from sqlite_store import get_store
+
+logger = logging.getLogger('konsultabot.cache')
+
+_metrics = defaultdict(Counter)
+_metrics_lock = threading.Lock()
+
+_MISSING = object()
+
+
+def _record(namespace, event, count=1):
+    with _metrics_lock:
+        _metrics[namespace or 'default'][event] += count
+
+
+def cache_metrics():
+    """Per-namespace hits, misses, evictions and hit rate for this process"""
+    with _metrics_lock:
+        snapshot = {name: dict(counts) for name, counts in _metrics.items()}
+    for counts in snapshot.values():
+        lookups = counts.get('hits', 0) + counts.get('misses', 0)
+        counts['hit_rate'] = round(counts.get('hits', 0) / lookups * 100, 1) if lookups else None
+    return snapshot
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+
+class LRUCache(LocMemCache):
+    """Django's LocMemCache (already LRU-ordered) with eviction counting"""
+
+    def _cull(self):
+        before = len(self._cache)
+        super()._cull()
+        _record(self.key_prefix, 'evictions', before - len(self._cache))
+
+
+class SQLiteCache(BaseCache):
+    """Cache shared by every worker on one host through a SQLite file.
+
+    Rows carry their namespace (the alias ``KEY_PREFIX``) so each namespace
+    is culled against its own ``MAX_ENTRIES`` budget. All entries of a
+    namespace share one TTL, so culling the soonest-expiring rows drops the
+    oldest ones.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    never_expires = 1e18
+
+    # Value of rows that only carry a timestamp in ``expires`` (rate limits)
+    _empty = pickle.dumps(None, pickle.HIGHEST_PROTOCOL)
+
+    # Check the namespace budget every N writes rather than on each one
+    cull_check_every = 32
+
+    _schema_ready = set()
+    _schema_lock = threading.Lock()
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._store = get_store(location)
+        self._writes = 0
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        with self._schema_lock:
+            if self._store.path in self._schema_ready:
+                return
+            with self._store.transaction() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS cache_entries (
+                        cache_key TEXT PRIMARY KEY,
+                        namespace TEXT NOT NULL,
+                        value BLOB NOT NULL,
+                        expires REAL NOT NULL
+                    )
+                ''')
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS cache_entries_namespace_expires '
+                    'ON cache_entries (namespace, expires)'
+                )
+            self._schema_ready.add(self._store.path)
+
+    def _expires(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        return self.never_expires if timeout is None else timeout
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.connection() as conn:
+            row = conn.execute(
+                'SELECT value FROM cache_entries WHERE cache_key = ? AND expires > ?',
+                (key, time.time())
+            ).fetchone()
+        return pickle.loads(row[0]) if row else default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (cache_key, namespace, value, expires) VALUES (?, ?, ?, ?)',
+                (key, self.key_prefix, pickle.dumps(value, self.pickle_protocol), self._expires(timeout))
+            )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.transaction() as conn:
+            # One statement, so two workers racing for the same key cannot both win
+            cursor = conn.execute(
+                '''INSERT INTO cache_entries (cache_key, namespace, value, expires) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (cache_key) DO UPDATE SET value = excluded.value, expires = excluded.expires
+                   WHERE cache_entries.expires <= ?''',
+                (key, self.key_prefix, pickle.dumps(value, self.pickle_protocol), self._expires(timeout), time.time())
+            )
+            added = cursor.rowcount == 1
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE cache_entries SET expires = ? WHERE cache_key = ? AND expires > ?',
+                (self._expires(timeout), key, time.time())
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.transaction() as conn:
+            return conn.execute('DELETE FROM cache_entries WHERE cache_key = ?', (key,)).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.connection() as conn:
+            return conn.execute(
+                'SELECT 1 FROM cache_entries WHERE cache_key = ? AND expires > ?', (key, time.time())
+            ).fetchone() is not None
+
+    def clear(self):
+        with self._store.transaction() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE namespace = ?', (self.key_prefix,))
+
+    def gcra(self, key, interval, tolerance):
+        """Atomic GCRA step; see ``gcra()``. The row's expiry is the TAT."""
+        key = self.make_and_validate_key(key)
+        now = time.time()
+        with self._store.transaction() as conn:
+            # One upsert decides and records the request, so concurrent workers cannot overspend
+            cursor = conn.execute(
+                '''INSERT INTO cache_entries (cache_key, namespace, value, expires) VALUES (:key, :ns, :value, :now + :t)
+                   ON CONFLICT (cache_key) DO UPDATE SET expires = max(cache_entries.expires, :now) + :t
+                   WHERE max(cache_entries.expires, :now) - :now <= :tau''',
+                {'key': key, 'ns': self.key_prefix, 'value': self._empty, 'now': now, 't': interval, 'tau': tolerance}
+            )
+            if cursor.rowcount == 1:
+                return 0.0
+            tat = conn.execute('SELECT expires FROM cache_entries WHERE cache_key = ?', (key,)).fetchone()
+        return max(0.0, tat[0] - now - tolerance) if tat else interval
+
+    def _maybe_cull(self):
+        self._writes += 1
+        if self._writes % self.cull_check_every == 0:
+            self._cull()
+
+    def _cull(self):
+        with self._store.transaction() as conn:
+            conn.execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND expires <= ?', (self.key_prefix, time.time())
+            )
+            count = conn.execute(
+                'SELECT COUNT(*) FROM cache_entries WHERE namespace = ?', (self.key_prefix,)
+            ).fetchone()[0]
+            if count <= self._max_entries:
+                return
+            # Like Django's backends: drop 1/CULL_FREQUENCY of the namespace (all of it for 0)
+            excess = count if self._cull_frequency == 0 else max(count // self._cull_frequency, count - self._max_entries)
+            evicted = conn.execute(
+                '''DELETE FROM cache_entries WHERE cache_key IN (
+                       SELECT cache_key FROM cache_entries WHERE namespace = ? ORDER BY expires LIMIT ?
+                   )''',
+                (self.key_prefix, excess)
+            ).rowcount
+        _record(self.key_prefix, 'evictions', evicted)
+
+
+# ----------------------------------------------------------------------
+# Namespaces
+# ----------------------------------------------------------------------
+
+class CacheNamespace:
+    """Stable-keyed, generation-invalidated view of one configured cache"""
+
+    GENERATION_KEY = '__generation__'
+    # Seconds a process reuses the generation it last read before asking the cache again
+    GENERATION_TTL = 5
+
+    # name -> (generation, monotonic expiry), shared by every holder in this process
+    _generations = {}
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def cache(self):
+        return caches[self.name if self.name in settings.CACHES else 'default']
+
+    def _generation(self):
+        memo = self._generations.get(self.name)
+        if memo is not None and memo[1] > time.monotonic():
+            return memo[0]
+        generation = self.cache.get(self.GENERATION_KEY)
+        if generation is None:
+            generation = 1
+            self.cache.add(self.GENERATION_KEY, generation, timeout=None)
+        self._remember(generation)
+        return generation
+
+    def _remember(self, generation):
+        self._generations[self.name] = (generation, time.monotonic() + self.GENERATION_TTL)
+
+    def make_key(self, key):
+        """``key`` may be any JSON-serializable value, e.g. a tuple of parts"""
+        raw = json.dumps(key, sort_keys=True, default=str, ensure_ascii=False)
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return f'{self.name}:g{self._generation()}:{digest}'
+
+    def get(self, key, default=None):
+        value = self.cache.get(self.make_key(key), _MISSING)
+        if value is _MISSING:
+            _record(self.name, 'misses')
+            return default
+        _record(self.name, 'hits')
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        """Store a value; without ``timeout`` the namespace TTL applies"""
+        self.cache.set(self.make_key(key), value, timeout)
+        _record(self.name, 'sets')
+
+    def get_or_set(self, key, compute, timeout=DEFAULT_TIMEOUT):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if value is not None:
+                self.set(key, value, timeout)
+        return value
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+    def clear(self):
+        """Invalidate every entry in the namespace, in all workers
+
+        This process switches at once; other processes pick up the new
+        generation within ``GENERATION_TTL`` seconds.
+        """
+        try:
+            generation = self.cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            generation = 2
+            self.cache.set(self.GENERATION_KEY, generation, timeout=None)
+        self._remember(generation)
+        _record(self.name, 'clears')
+
+
+_namespaces = {}
+
+
+def cache_namespace(name):
+    namespace = _namespaces.get(name)
+    if namespace is None:
+        namespace = _namespaces.setdefault(name, CacheNamespace(name))
+    return namespace
+
+
+# ----------------------------------------------------------------------
+# Rate limiting
+# ----------------------------------------------------------------------
+
+# KEYS[1] holds the theoretical arrival time (TAT); ARGV: now, interval, tolerance
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+if tat - now > tolerance then
+    return tostring(tat - now - tolerance)
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return '0'
+"""
+
+_gcra_lock = threading.Lock()
+
+
+def gcra(cache, key, interval, tolerance):
+    """Spend one request of a GCRA budget held in ``cache``; returns the wait in seconds.
+
+    A key stores only its theoretical arrival time (TAT). A request is allowed
+    while the TAT is at most ``tolerance`` seconds ahead of now, and pushes the
+    TAT on by ``interval``; a budget of N per period is ``interval = period / N``
+    and ``tolerance = interval * (N - 1)``. 0 means allowed. The update is
+    atomic on the SQLite and Redis backends; other backends are atomic per
+    process only.
+    """
+    if isinstance(cache, SQLiteCache):
+        return cache.gcra(key, interval, tolerance)
+
+    now = time.time()
+    if cache.__class__.__name__ == 'RedisCache':
+        key = cache.make_and_validate_key(key)
+        client = cache._cache.get_client(key, write=True)
+        return float(client.eval(_GCRA_SCRIPT, 1, key, now, interval, tolerance))
+
+    with _gcra_lock:
+        tat = max(cache.get(key) or now, now)
+        if tat - now > tolerance:
+            return tat - now - tolerance
+        cache.set(key, tat + interval, tat + interval - now)
+    return 0.0
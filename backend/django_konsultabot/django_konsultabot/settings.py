@@ -3,6 +3,7 @@ Django settings for KonsultaBot Advanced AI Platform
 """
 
 import os
+import sys
 import json
 from pathlib import Path
 from datetime import timedelta
@@ -14,6 +15,11 @@ load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Modules shared with the Flask APIs (e.g. sqlite_store) live in the backend directory;
+# appended so this project's own apps always take precedence
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 # Load environment variables from parent directory's .env
 env_path = BASE_DIR.parent / '.env'
 if env_path.exists():
@@ -119,7 +125,7 @@ SECURE_PROXY_SSL_HEADER = None
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user_account.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -191,9 +197,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'konsultabot_advanced.db',
+        'OPTIONS': {
+            'timeout': 5,  # seconds to wait on a locked database; pragmas are set in chatbot_core.apps
+        },
     }
 }
 
+# Caches: one alias per namespace, each with its own TTL and entry budget
+# (see django_konsultabot/caching.py). Backend: locmem | sqlite | redis.
+KONSULTABOT_CACHE_BACKEND = os.getenv('KONSULTABOT_CACHE_BACKEND', 'sqlite')
+KONSULTABOT_REDIS_URL = os.getenv('KONSULTABOT_REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+CACHE_NAMESPACES = {
+    # name: (TTL seconds, max entries)
+    'default': (300, 5000),     # DRF throttles, analytics locks and snapshots
+    'network': (60, 100),       # connectivity probes
+    'kb_search': (300, 2000),   # knowledge base search results
+    'translation': (3600, 5000),
+}
+
+
+def _cache_config(namespace, timeout, max_entries):
+    config = {'TIMEOUT': timeout, 'KEY_PREFIX': namespace}
+    if KONSULTABOT_CACHE_BACKEND == 'redis':
+        # Budgets are left to the server's maxmemory policy
+        config.update(BACKEND='django.core.cache.backends.redis.RedisCache', LOCATION=KONSULTABOT_REDIS_URL)
+    elif KONSULTABOT_CACHE_BACKEND == 'sqlite':
+        config.update(BACKEND='django_konsultabot.caching.SQLiteCache', LOCATION=str(BASE_DIR / 'cache.db'),
+                      OPTIONS={'MAX_ENTRIES': max_entries})
+    else:
+        config.update(BACKEND='django_konsultabot.caching.LRUCache', LOCATION=namespace,
+                      OPTIONS={'MAX_ENTRIES': max_entries})
+    return config
+
+
+CACHES = {
+    namespace: _cache_config(namespace, timeout, max_entries)
+    for namespace, (timeout, max_entries) in CACHE_NAMESPACES.items()
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -236,7 +278,7 @@ AUTH_USER_MODEL = 'user_account.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user_account.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -245,13 +287,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'chatbot_core.throttling.ApiRateThrottle',  # budgets in KONSULTABOT_SETTINGS['THROTTLE_RATES']
     ],
-    'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour'
-    }
 }
 
 # JWT Configuration
@@ -307,9 +344,38 @@ CORS_ALLOWED_ORIGINS = [
 KONSULTABOT_SETTINGS = {
     'GEMINI_API_KEY': os.getenv('GEMINI_API_KEY'),
     'SESSION_TIMEOUT_MINUTES': int(os.getenv('KONSULTABOT_SESSION_TIMEOUT', '30')),
+    'SESSION_SWEEP_INTERVAL': 300,  # seconds between expiry sweeps
+    'AUTH_CLAIMS_CACHE_SECONDS': 60,  # how stale a JWT role/revocation check may be
+    'THROTTLE_RATES': {  # per scope and role; see chatbot_core/throttling.py
+        'chat': {'anon': '100/hour', 'student': '100/hour', 'it_staff': '500/hour', 'admin': '1000/hour'},
+        'voice': {'anon': '50/hour', 'student': '50/hour', 'it_staff': '250/hour', 'admin': '500/hour'},
+        'api': {'anon': '100/hour', 'student': '1000/hour', 'it_staff': '5000/hour', 'admin': '5000/hour'},
+    },
+    'OFFLINE_REPLAY_CONCURRENCY': 4,  # queued queries answered in parallel
+    'OFFLINE_REPLAY_RPM': int(os.getenv('KONSULTABOT_REPLAY_RPM', '15')),  # Gemini calls per minute
     'MAX_CONVERSATION_HISTORY': int(os.getenv('KONSULTABOT_MAX_HISTORY', '10')),
+    'CONTEXT_TOKEN_BUDGET': int(os.getenv('KONSULTABOT_CONTEXT_TOKENS', '2000')),  # rolling context window
     'ENABLE_VOICE_FEATURES': os.getenv('KONSULTABOT_ENABLE_VOICE', 'true').lower() == 'true',
+    'AUDIO_TRIM_SILENCE': True,  # drop leading/trailing audio below -40 dBFS before recognition
+    'TTS_AUDIO_URL_TTL': int(os.getenv('KONSULTABOT_TTS_URL_TTL', '300')),  # seconds
+    'TTS_AUDIO_CODEC': os.getenv('KONSULTABOT_TTS_CODEC', 'opus'),  # opus or mp3
+    'TTS_CACHE_MAX_AGE': 7 * 24 * 3600,  # seconds cached audio is kept
+    'TTS_CACHE_PRUNE_INTERVAL': 3600,  # seconds between cache prunes
+    'CHAT_STREAM_TIMEOUT': 120,  # seconds a streamed voice answer may take before it is abandoned
     'ENABLE_ANALYTICS': os.getenv('KONSULTABOT_ENABLE_ANALYTICS', 'true').lower() == 'true',
+    'ANALYTICS_ROLLUP_INTERVAL': int(os.getenv('KONSULTABOT_ROLLUP_INTERVAL', '60')),  # seconds
+    'ANALYTICS_SNAPSHOT_INTERVAL': int(os.getenv('KONSULTABOT_SNAPSHOT_INTERVAL', '30')),  # seconds
+    'LIVE_STREAM_MAX_SECONDS': 300,  # dashboard SSE streams close after this; browsers reconnect
+    'API_HEALTH_MINUTE_RETENTION_HOURS': 24,  # then folded into hour buckets
+    'API_HEALTH_HOUR_RETENTION_DAYS': 30,  # then folded into day buckets
+    'RETENTION_DAYS': {  # rows older than this are archived to ARCHIVE_DIR and deleted
+        'query_log': int(os.getenv('KONSULTABOT_QUERY_LOG_RETENTION_DAYS', '90')),
+        'api_usage_log': 30,
+        'system_metrics': 14,
+        'chat_message': int(os.getenv('KONSULTABOT_CHAT_RETENTION_DAYS', '180')),
+        'conversation_session': int(os.getenv('KONSULTABOT_CHAT_RETENTION_DAYS', '180')),  # once emptied
+    },
+    'ARCHIVE_DIR': BASE_DIR / 'archive',
     'DEFAULT_LANGUAGE': 'english',
     'SUPPORTED_LANGUAGES': ['english', 'bisaya', 'waray', 'tagalog'],
     'OFFLINE_MODE': False,  # Set to True to disable online features
@@ -6,7 +6,7 @@ import re
 import logging
 from typing import Dict, List, Optional, Any
 from django.db.models import Q
-from django.core.cache import cache
+from django_konsultabot.caching import cache_namespace
 from textblob import TextBlob
 import json
 
@@ -19,7 +19,7 @@ class KnowledgeBaseProcessor:
     """
     
     def __init__(self):
-        self.cache_timeout = 300  # 5 minutes
+        self.cache = cache_namespace('kb_search')  # TTL and size budget in settings.CACHE_NAMESPACES
         
         # IT support categories and their keywords
         self.categories = {
@@ -298,8 +298,8 @@ Contact IT Support for Office training sessions and resources.
         """
         try:
             # Create cache key
-            cache_key = f"kb_search:{hash(query)}:{language}:{intent}"
-            cached_result = cache.get(cache_key)
+            cache_key = (query, language, intent)
+            cached_result = self.cache.get(cache_key)
             
             if cached_result:
                 return cached_result
@@ -324,7 +324,7 @@ Contact IT Support for Office training sessions and resources.
                     }
                     
                     # Cache the result
-                    cache.set(cache_key, result, self.cache_timeout)
+                    self.cache.set(cache_key, result)
                     return result
             
             return None
@@ -442,11 +442,8 @@ Contact IT Support for Office training sessions and resources.
             
             self.intelligent_responses[category][language] = content
             
-            # Clear related cache entries
-            cache.delete_many([
-                key for key in cache._cache.keys() 
-                if key.startswith(f"kb_search:") and category in key
-            ])
+            # Cached searches may now resolve differently; invalidate them in every worker
+            self.cache.clear()
             
             logger.info(f"Added knowledge entry for {category} in {language}")
             return True
@@ -470,10 +467,7 @@ Contact IT Support for Office training sessions and resources.
                 self.categories[category]['keywords'] = keywords
                 
                 # Clear cache
-                cache.delete_many([
-                    key for key in cache._cache.keys() 
-                    if key.startswith(f"kb_search:") and category in key
-                ])
+                self.cache.clear()
                 
                 return True
             return False
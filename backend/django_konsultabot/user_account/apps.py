@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class UserAccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_account'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from .authentication import drop_user_stamp
+        from .models import User
+
+        # Drop the cached auth stamp whenever a user is saved
+        post_save.connect(drop_user_stamp, sender=User, dispatch_uid='konsultabot_auth_stamp')
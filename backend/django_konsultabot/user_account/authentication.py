@@ -0,0 +1,105 @@
+"""
+Claims-based JWT Authentication for KonsultaBot
+
+Access tokens carry the user's ``username``, ``role``, ``perms``, staff and
+superuser flags and token version (``ver``), so authorizing an API call
+needs no user row: the request user is built from the claims, with every
+other field deferred and loaded only if a view actually reads it, and its
+permissions are the ``perms`` claim. The request user is read-only; views
+that save a user load the row first. What claims cannot tell is whether
+they are still true; that is answered by a small per-user stamp (active
+flag, role, staff and superuser flags, token version) kept in the cache for
+``AUTH_CLAIMS_CACHE_SECONDS``. A token whose claims no longer match the
+stamp, or whose user has been deactivated, is rejected. Saving a user drops its stamp, and changing the
+password bumps the version, so revocation takes effect on the next request.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+logger = logging.getLogger('konsultabot.auth')
+
+
+def stamp_key(user_id):
+    return f'auth:stamp:{user_id}'
+
+
+def tokens_for_user(user):
+    """Refresh token whose access tokens carry the user's authorization claims"""
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['role'] = user.role
+    refresh['perms'] = sorted(user.get_permissions())
+    refresh['staff'] = user.is_staff
+    refresh['superuser'] = user.is_superuser
+    refresh['ver'] = user.token_version
+    return refresh
+
+
+def user_stamp(user_id):
+    """``(is_active, role, is_staff, is_superuser, token_version)`` for a user, from the cache when fresh"""
+    key = stamp_key(user_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        row = User.objects.filter(pk=user_id).values_list(
+            'is_active', 'role', 'is_staff', 'is_superuser', 'token_version'
+        ).first()
+        stamp = tuple(row) if row else (False, None, None, None, None)
+        timeout = getattr(settings, 'KONSULTABOT_SETTINGS', {}).get('AUTH_CLAIMS_CACHE_SECONDS', 60)
+        cache.set(key, stamp, timeout)
+    return stamp
+
+
+def drop_user_stamp(sender, instance, **kwargs):
+    """post_save receiver for User (connected in UserAccountConfig.ready)"""
+    cache.delete(stamp_key(instance.pk))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that authorizes from token claims instead of the user row"""
+
+    def get_user(self, validated_token):
+        if 'role' not in validated_token or 'ver' not in validated_token:
+            # Issued before claims were added
+            return super().get_user(validated_token)
+
+        try:
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except Exception:
+            raise AuthenticationFailed('Token contained no recognizable user identification', code='token_not_valid')
+
+        is_active, *current = user_stamp(user_id)
+        if not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        claimed = [validated_token['role'], validated_token.get('staff', False),
+                   validated_token.get('superuser', False), validated_token['ver']]
+        if current != claimed:
+            # Role, staff/superuser demotion or password change since the token was issued
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+        return self.claims_user(user_id, validated_token)
+
+    def claims_user(self, user_id, token):
+        """User instance holding only what the token says; other fields load on access"""
+        values = {
+            User._meta.pk.attname: user_id,
+            'username': token.get('username', ''),
+            'role': token['role'],
+            'is_staff': token.get('staff', False),
+            'is_superuser': token.get('superuser', False),
+            'is_active': True,
+            'token_version': token['ver'],
+        }
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+        user = User.from_db(router.db_for_read(User), fields, [values[name] for name in fields])
+        if 'perms' in token:
+            user.claimed_permissions = frozenset(token['perms'])
+        return user
@@ -22,6 +22,8 @@ def role_required(*allowed_roles):
             # Only admin and it_staff can access this view
             pass
     """
+    roles = frozenset(allowed_roles)
+    
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
@@ -34,7 +36,7 @@ def role_required(*allowed_roles):
                 }, status=401)
             
             # Check if user has required role
-            if request.user.role not in allowed_roles:
+            if request.user.role not in roles:
                 logger.warning(
                     f"Access denied for user {request.user.username} "
                     f"with role {request.user.role} to {view_func.__name__}. "
@@ -47,10 +49,6 @@ def role_required(*allowed_roles):
                     'user_role': request.user.role
                 }, status=403)
             
-            logger.info(
-                f"Access granted to user {request.user.username} "
-                f"with role {request.user.role} for {view_func.__name__}"
-            )
             return view_func(request, *args, **kwargs)
         return wrapper
     return decorator
@@ -66,6 +64,8 @@ def permission_required(*permissions):
             # Only users with these permissions can access
             pass
     """
+    required = frozenset(permissions)
+    
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
@@ -78,12 +78,8 @@ def permission_required(*permissions):
             user_permissions = request.user.get_permissions()
             
             # Check if user has all required permissions
-            missing_permissions = []
-            for permission in permissions:
-                if permission not in user_permissions:
-                    missing_permissions.append(permission)
-            
-            if missing_permissions:
+            if not required.issubset(user_permissions):
+                missing_permissions = [p for p in permissions if p not in user_permissions]
                 logger.warning(
                     f"Permission denied for user {request.user.username}. "
                     f"Missing permissions: {missing_permissions}"
@@ -93,7 +89,7 @@ def permission_required(*permissions):
                     'code': 'INSUFFICIENT_PERMISSIONS',
                     'required_permissions': list(permissions),
                     'missing_permissions': missing_permissions,
-                    'user_permissions': user_permissions
+                    'user_permissions': sorted(user_permissions)
                 }, status=403)
             
             return view_func(request, *args, **kwargs)
@@ -158,6 +154,8 @@ def api_role_required(*allowed_roles):
     """
     Decorator for DRF API views to restrict access based on user roles
     """
+    roles = frozenset(allowed_roles)
+    
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
@@ -167,7 +165,7 @@ def api_role_required(*allowed_roles):
                     'code': 'AUTH_REQUIRED'
                 }, status=status.HTTP_401_UNAUTHORIZED)
             
-            if request.user.role not in allowed_roles:
+            if request.user.role not in roles:
                 return Response({
                     'error': 'Permission denied',
                     'code': 'PERMISSION_DENIED',
@@ -184,6 +182,8 @@ def api_permission_required(*permissions):
     """
     Decorator for DRF API views to restrict access based on permissions
     """
+    required = frozenset(permissions)
+    
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
@@ -194,9 +194,9 @@ def api_permission_required(*permissions):
                 }, status=status.HTTP_401_UNAUTHORIZED)
             
             user_permissions = request.user.get_permissions()
-            missing_permissions = [p for p in permissions if p not in user_permissions]
             
-            if missing_permissions:
+            if not required.issubset(user_permissions):
+                missing_permissions = [p for p in permissions if p not in user_permissions]
                 return Response({
                     'error': 'Insufficient permissions',
                     'code': 'INSUFFICIENT_PERMISSIONS',
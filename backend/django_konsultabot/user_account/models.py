@@ -1,6 +1,30 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+# Permission sets per role, built once at import
+ROLE_PERMISSIONS = {
+    'admin': frozenset({
+        'view_dashboard',
+        'edit_knowledge_base',
+        'view_analytics',
+        'manage_users',
+        'system_settings',
+        'export_data',
+        'view_all_conversations'
+    }),
+    'it_staff': frozenset({
+        'view_dashboard',
+        'edit_knowledge_base',
+        'view_analytics',
+        'view_conversations'
+    }),
+    'student': frozenset({
+        'use_chatbot',
+        'view_own_conversations'
+    }),
+}
+
+
 class User(AbstractUser):
     """
     Custom User model with role-based access control for KonsultaBot
@@ -45,6 +69,9 @@ class User(AbstractUser):
     updated_at = models.DateTimeField(auto_now=True)
     last_login_ip = models.GenericIPAddressField(blank=True, null=True)
 
+    # Carried in JWTs as the ``ver`` claim; bumping it revokes outstanding tokens
+    token_version = models.PositiveIntegerField(default=0)
+
     class Meta:
         db_table = 'auth_user'
         verbose_name = 'User'
@@ -83,27 +110,16 @@ class User(AbstractUser):
         """Check if user can view analytics"""
         return self.role in ['admin', 'it_staff']
     
+    # Permissions from a verified token's ``perms`` claim (see authentication.py)
+    claimed_permissions = None
+
     def get_permissions(self):
         """Get user permissions based on role"""
-        permissions = {
-            'admin': [
-                'view_dashboard',
-                'edit_knowledge_base',
-                'view_analytics',
-                'manage_users',
-                'system_settings',
-                'export_data',
-                'view_all_conversations'
-            ],
-            'it_staff': [
-                'view_dashboard',
-                'edit_knowledge_base',
-                'view_analytics',
-                'view_conversations'
-            ],
-            'student': [
-                'use_chatbot',
-                'view_own_conversations'
-            ]
-        }
-        return permissions.get(self.role, [])
+        if self.claimed_permissions is not None:
+            return self.claimed_permissions
+        return ROLE_PERMISSIONS.get(self.role, frozenset())
+
+    def set_password(self, raw_password):
+        # A new password retires every token issued before it
+        super().set_password(raw_password)
+        self.token_version = (self.token_version or 0) + 1
@@ -29,7 +29,7 @@ class UserSerializer(serializers.ModelSerializer):
     
     def get_permissions(self, obj):
         """Get user permissions based on role"""
-        return obj.get_permissions()
+        return sorted(obj.get_permissions())
 
 
 class LoginSerializer(serializers.Serializer):
@@ -154,7 +154,7 @@ class ChangePasswordSerializer(serializers.Serializer):
     )
     
     def validate_old_password(self, value):
-        user = self.context['request'].user
+        user = self.context.get('user') or self.context['request'].user
         if not user.check_password(value):
             raise serializers.ValidationError(
                 'Current password is incorrect.',
@@ -171,7 +171,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         return data
     
     def save(self):
-        user = self.context['request'].user
+        user = self.context.get('user') or self.context['request'].user
         user.set_password(self.validated_data['new_password'])
         user.save()
         return user
@@ -1,3 +1,102 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from .authentication import ClaimsJWTAuthentication, stamp_key, tokens_for_user
+from .models import ROLE_PERMISSIONS, User
+
+
+class ClaimsJWTAuthenticationTests(TestCase):
+    """Authorization from token claims, revoked by the cached user stamp"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            'student1', 'student1@example.com', 'initial-pass-123', role='student'
+        )
+        self.addCleanup(cache.delete, stamp_key(self.user.pk))
+        cache.delete(stamp_key(self.user.pk))
+        self.auth = ClaimsJWTAuthentication()
+        self.factory = APIRequestFactory()
+
+    def access_token(self, user=None):
+        return str(tokens_for_user(user or self.user).access_token)
+
+    def authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.auth.authenticate(request)
+
+    def assertRejected(self, token, code):
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self.authenticate(token)
+        self.assertEqual(raised.exception.detail['code'], code)
+
+    def test_request_user_is_built_from_claims(self):
+        user, _ = self.authenticate(self.access_token())
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, 'student1')
+        self.assertEqual(user.role, 'student')
+        self.assertEqual(user.get_permissions(), ROLE_PERMISSIONS['student'])
+
+    def test_authentication_issues_no_queries_once_the_stamp_is_cached(self):
+        token = self.access_token()
+        with self.assertNumQueries(1):
+            self.authenticate(token)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+        self.assertTrue(user.is_authenticated)
+
+    def test_role_change_revokes_the_token(self):
+        token = self.access_token()
+        self.authenticate(token)
+
+        self.user.role = 'admin'
+        self.user.save()
+
+        self.assertRejected(token, 'token_revoked')
+        user, _ = self.authenticate(self.access_token())
+        self.assertEqual(user.role, 'admin')
+
+    def test_staff_demotion_revokes_the_token(self):
+        self.user.is_staff = True
+        self.user.save()
+        token = self.access_token()
+        self.authenticate(token)
+
+        self.user.is_staff = False
+        self.user.save()
+
+        self.assertRejected(token, 'token_revoked')
+
+    def test_password_change_bumps_the_version_and_rejects_old_tokens(self):
+        token = self.access_token()
+        self.authenticate(token)
+
+        self.user.set_password('changed-pass-456')
+        self.user.save()
+
+        self.assertEqual(self.user.token_version, 1)
+        self.assertRejected(token, 'token_revoked')
+        fresh = self.access_token()
+        self.assertEqual(AccessToken(fresh)['ver'], 1)
+        self.authenticate(fresh)
+
+    def test_inactive_user_is_rejected(self):
+        token = self.access_token()
+        self.authenticate(token)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertRejected(token, 'user_inactive')
+
+    def test_token_without_claims_falls_back_to_the_user_row(self):
+        token = str(AccessToken.for_user(self.user))
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(token)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.email, 'student1@example.com')
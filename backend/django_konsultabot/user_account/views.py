@@ -21,6 +21,7 @@ from .serializers import (
     ChangePasswordSerializer, UserManagementSerializer, UserStatsSerializer
 )
 from .decorators import role_required, admin_required
+from .authentication import tokens_for_user
 import logging
 
 logger = logging.getLogger('konsultabot.auth')
@@ -41,7 +42,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         user.save(update_fields=['last_login_ip'])
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         
         # Log successful login
         logger.info(f"User {user.username} logged in successfully")
@@ -118,7 +119,7 @@ class LoginView(APIView):
             logger.warning(f"Failed to update last login IP: {str(e)}")
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         
         # Log successful login
         logger.info(f"User {user.username} logged in successfully")
@@ -153,7 +154,7 @@ class RegisterView(APIView):
         user = serializer.save()
         
         # Generate tokens for immediate login
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         
         # Log successful registration
         logger.info(f"New user registered: {user.username}")
@@ -174,12 +175,13 @@ class ProfileView(APIView):
     
     def get(self, request):
         """Get user profile"""
-        serializer = UserSerializer(request.user)
+        # The request user only holds token claims; read the full row once
+        serializer = UserSerializer(User.objects.get(pk=request.user.pk))
         return Response(serializer.data)
     
     def put(self, request):
         """Update user profile"""
-        serializer = UserSerializer(request.user, data=request.data, partial=True)
+        serializer = UserSerializer(User.objects.get(pk=request.user.pk), data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
         
@@ -198,16 +200,24 @@ class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
+        # Save through the full row: the request user only holds token claims,
+        # and saving it would write those (possibly stale) claims back
+        user = User.objects.get(pk=request.user.pk)
         serializer = ChangePasswordSerializer(
             data=request.data,
-            context={'request': request}
+            context={'request': request, 'user': user}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        user = serializer.save()
         
-        logger.info(f"User {request.user.username} changed password")
+        logger.info(f"User {user.username} changed password")
+        
+        # The new password revoked existing tokens; hand back a fresh pair
+        refresh = tokens_for_user(user)
         
         return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
             'message': 'Password changed successfully'
         })
 
@@ -335,8 +345,8 @@ def check_permissions(request):
     Check user permissions
     """
     return Response({
-        'user': UserSerializer(request.user).data,
-        'permissions': request.user.get_permissions(),
+        'user': UserSerializer(User.objects.get(pk=request.user.pk)).data,
+        'permissions': sorted(request.user.get_permissions()),
         'can_access_dashboard': request.user.can_access_dashboard,
         'can_edit_knowledge_base': request.user.can_edit_knowledge_base,
         'can_view_analytics': request.user.can_view_analytics
@@ -5,7 +5,7 @@ Comprehensive AI that handles ALL types of questions with authentication
 """
 from flask import Flask, request, jsonify
 import jwt
-import sqlite3
+from flask_storage import ConversationStore
 from datetime import datetime
 import requests
 from comprehensive_ai_handler import ComprehensiveAIHandler
@@ -15,6 +15,9 @@ import random
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'konsultabot-secret-key-change-in-production'
 
+# Pooled connections, batched writes and cached stats for conversations.db
+conversations = ConversationStore('conversations.db')
+
 # Initialize the comprehensive AI handler
 ai_handler = ComprehensiveAIHandler()
 
@@ -29,32 +32,9 @@ def verify_token(token):
         return None
 
 def save_conversation(user_id, username, role, query, response):
-    """Save conversation to database"""
+    """Queue conversation for the next batch write to the database"""
     try:
-        conn = sqlite3.connect('conversations.db')
-        cursor = conn.cursor()
-        
-        # Create conversations table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                username TEXT,
-                role TEXT,
-                query TEXT,
-                response TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                session_id TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            INSERT INTO conversations (user_id, username, role, query, response)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, username, role, query, response))
-        
-        conn.commit()
-        conn.close()
+        conversations.save(user_id, username, role, query, response)
         return True
     except Exception as e:
         print(f"Error saving conversation: {e}")
@@ -206,41 +186,15 @@ def get_chat_history():
     role = user_data.get('role')
     
     try:
-        conn = sqlite3.connect('conversations.db')
-        cursor = conn.cursor()
-        
         # Admin can see all conversations, others see only their own
         if role == 'admin':
-            cursor.execute('''
-                SELECT username, role, query, response, timestamp 
-                FROM conversations 
-                ORDER BY timestamp DESC 
-                LIMIT 50
-            ''')
+            history = conversations.history(limit=50)
         else:
-            cursor.execute('''
-                SELECT username, role, query, response, timestamp 
-                FROM conversations 
-                WHERE user_id = ? 
-                ORDER BY timestamp DESC 
-                LIMIT 20
-            ''', (user_id,))
-        
-        conversations = []
-        for row in cursor.fetchall():
-            conversations.append({
-                'username': row[0],
-                'role': row[1],
-                'query': row[2],
-                'response': row[3],
-                'timestamp': row[4]
-            })
-        
-        conn.close()
+            history = conversations.history(user_id, limit=20)
         
         return jsonify({
-            'conversations': conversations,
-            'total': len(conversations),
+            'conversations': history,
+            'total': len(history),
             'user_role': role
         })
         
@@ -266,39 +220,11 @@ def get_chat_stats():
         return jsonify({'error': 'Access denied'}), 403
     
     try:
-        conn = sqlite3.connect('conversations.db')
-        cursor = conn.cursor()
-        
-        # Get various statistics
-        cursor.execute('SELECT COUNT(*) FROM conversations')
-        total_conversations = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(DISTINCT user_id) FROM conversations')
-        unique_users = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT role, COUNT(*) 
-            FROM conversations 
-            GROUP BY role
-        ''')
-        conversations_by_role = dict(cursor.fetchall())
-        
-        cursor.execute('''
-            SELECT DATE(timestamp), COUNT(*) 
-            FROM conversations 
-            WHERE timestamp >= datetime('now', '-7 days')
-            GROUP BY DATE(timestamp)
-            ORDER BY DATE(timestamp)
-        ''')
-        daily_conversations = dict(cursor.fetchall())
-        
-        conn.close()
+        # One grouped query, cached for a few seconds
+        stats = conversations.stats()
         
         return jsonify({
-            'total_conversations': total_conversations,
-            'unique_users': unique_users,
-            'conversations_by_role': conversations_by_role,
-            'daily_conversations_last_7_days': daily_conversations,
+            **stats,
             'ai_capabilities': {
                 'handles_all_question_types': True,
                 'silly_questions': True,
@@ -0,0 +1,241 @@
+"""
+Storage for the Flask Chat and Auth Services
+Conversation and user persistence for enhanced_chat_api.py and simple_auth_api.py
+
+Both services borrow their connections from the shared sqlite_store pool, so
+a connection stays open (with its statement cache) across requests rather
+than being reopened per call; SQL is kept in module constants so every call
+reuses the same prepared statement. Conversations are indexed on
+``(user_id, timestamp)`` for per-user history and on ``timestamp`` for the
+admin feed and the daily stats. Saved conversations are buffered and written
+in batches (flushed by size, by a short timer, before any read, and at
+exit). Chat stats come from one grouped query and are cached for a few
+seconds.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlite_store import get_store
+
+logger = logging.getLogger(__name__)
+
+CONVERSATIONS_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        username TEXT,
+        role TEXT,
+        query TEXT,
+        response TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        session_id TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS conversations_user_time ON conversations (user_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS conversations_time ON conversations (timestamp)',
+)
+
+INSERT_CONVERSATION = '''
+    INSERT INTO conversations (user_id, username, role, query, response, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+SELECT_ALL_HISTORY = '''
+    SELECT username, role, query, response, timestamp
+    FROM conversations
+    ORDER BY timestamp DESC
+    LIMIT ?
+'''
+
+SELECT_USER_HISTORY = '''
+    SELECT username, role, query, response, timestamp
+    FROM conversations
+    WHERE user_id = ?
+    ORDER BY timestamp DESC
+    LIMIT ?
+'''
+
+# Per (role, day) counts, with days older than a week folded into NULL, plus
+# the distinct user count read from the (user_id, timestamp) index
+SELECT_STATS = '''
+    SELECT role,
+           CASE WHEN timestamp >= datetime('now', '-7 days') THEN DATE(timestamp) END AS day,
+           COUNT(*),
+           (SELECT COUNT(DISTINCT user_id) FROM conversations)
+    FROM conversations
+    GROUP BY role, day
+'''
+
+
+def _timestamp():
+    # Same format and zone as CURRENT_TIMESTAMP
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ConversationStore:
+    """Batched conversation log with indexed history and cached stats"""
+
+    def __init__(self, path='conversations.db', batch_size=50, flush_interval=0.5, stats_ttl=10):
+        self.store = get_store(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats_ttl = stats_ttl
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self._stats = None
+        self._stats_at = 0.0
+
+        with self.store.transaction() as conn:
+            for statement in CONVERSATIONS_SCHEMA:
+                conn.execute(statement)
+        atexit.register(self.flush)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def save(self, user_id, username, role, query, response):
+        """Queue a conversation for the next batch write"""
+        with self._lock:
+            self._pending.append((user_id, username, role, query, response, _timestamp()))
+            full = len(self._pending) >= self.batch_size
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name='conversation-flush', daemon=True)
+                self._flusher.start()
+        if full:
+            self.flush()
+        else:
+            self._wake.set()
+
+    def flush(self):
+        """Write every buffered conversation in one transaction; returns rows written"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        try:
+            with self.store.transaction() as conn:
+                conn.executemany(INSERT_CONVERSATION, rows)
+        except Exception as e:
+            logger.error(f"Failed to save {len(rows)} conversations: {e}")
+            with self._lock:
+                self._pending[:0] = rows
+            return 0
+        return len(rows)
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def history(self, user_id=None, limit=20):
+        """Latest conversations, newest first; every user's when ``user_id`` is None"""
+        self.flush()
+        with self.store.connection() as conn:
+            if user_id is None:
+                rows = conn.execute(SELECT_ALL_HISTORY, (limit,)).fetchall()
+            else:
+                rows = conn.execute(SELECT_USER_HISTORY, (user_id, limit)).fetchall()
+        return [
+            {'username': row[0], 'role': row[1], 'query': row[2], 'response': row[3], 'timestamp': row[4]}
+            for row in rows
+        ]
+
+    def stats(self):
+        """Totals, per-role counts and the last 7 days, at most ``stats_ttl`` seconds old"""
+        now = time.monotonic()
+        if self._stats is not None and now - self._stats_at < self.stats_ttl:
+            return self._stats
+
+        self.flush()
+        with self.store.connection() as conn:
+            rows = conn.execute(SELECT_STATS).fetchall()
+
+        by_role, daily = {}, {}
+        total = unique_users = 0
+        for role, day, count, users in rows:
+            total += count
+            unique_users = users
+            by_role[role] = by_role.get(role, 0) + count
+            if day is not None:
+                daily[day] = daily.get(day, 0) + count
+
+        self._stats = {
+            'total_conversations': total,
+            'unique_users': unique_users,
+            'conversations_by_role': by_role,
+            'daily_conversations_last_7_days': dict(sorted(daily.items())),
+        }
+        self._stats_at = now
+        return self._stats
+
+
+USERS_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT DEFAULT 'student',
+        first_name TEXT,
+        last_name TEXT,
+        department TEXT,
+        student_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1
+    )''',
+)
+
+USER_COLUMNS = 'id, username, email, password_hash, role, first_name, last_name, department, student_id'
+
+SELECT_ACTIVE_USER_BY_USERNAME = f'SELECT {USER_COLUMNS} FROM users WHERE username = ? AND is_active = 1'
+SELECT_USER_BY_ID = f'SELECT {USER_COLUMNS} FROM users WHERE id = ?'
+SELECT_USER_CONFLICT = 'SELECT 1 FROM users WHERE username = ? OR email = ? LIMIT 1'
+
+INSERT_USER = '''
+    INSERT OR IGNORE INTO users (username, email, password_hash, role, first_name, last_name, department, student_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+class UserStore:
+    """User accounts for the standalone auth service"""
+
+    def __init__(self, path='auth.db'):
+        self.store = get_store(path)
+        with self.store.transaction() as conn:
+            for statement in USERS_SCHEMA:
+                conn.execute(statement)
+
+    def get_active_by_username(self, username):
+        with self.store.connection() as conn:
+            return conn.execute(SELECT_ACTIVE_USER_BY_USERNAME, (username,)).fetchone()
+
+    def get(self, user_id):
+        with self.store.connection() as conn:
+            return conn.execute(SELECT_USER_BY_ID, (user_id,)).fetchone()
+
+    def exists(self, username, email):
+        with self.store.connection() as conn:
+            return conn.execute(SELECT_USER_CONFLICT, (username, email)).fetchone() is not None
+
+    def create(self, username, email, password_hash, role='student',
+               first_name='', last_name='', department='', student_id=''):
+        """Insert a user; returns the new id, or None if the username or email is taken"""
+        with self.store.transaction() as conn:
+            cursor = conn.execute(INSERT_USER, (
+                username, email, password_hash, role, first_name, last_name, department, student_id
+            ))
+            return cursor.lastrowid if cursor.rowcount == 1 else None
@@ -6,34 +6,18 @@ Standalone Flask server for user authentication
 from flask import Flask, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
-import sqlite3
+from flask_storage import UserStore
 from datetime import datetime, timedelta
 import os
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'konsultabot-secret-key-change-in-production'
 
+# Pooled connections and prepared statements for auth.db
+users_db = UserStore('auth.db')
+
 # Database setup
 def init_db():
-    conn = sqlite3.connect('auth.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT DEFAULT 'student',
-            first_name TEXT,
-            last_name TEXT,
-            department TEXT,
-            student_id TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
-        )
-    ''')
-    
     # Create default users if they don't exist
     users = [
         ('admin', 'admin@evsu.edu.ph', 'admin123', 'admin', 'System', 'Administrator', 'IT Department', ''),
@@ -42,16 +26,9 @@ def init_db():
     ]
     
     for username, email, password, role, first_name, last_name, department, student_id in users:
-        cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
-        if not cursor.fetchone():
-            password_hash = generate_password_hash(password)
-            cursor.execute('''
-                INSERT INTO users (username, email, password_hash, role, first_name, last_name, department, student_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (username, email, password_hash, role, first_name, last_name, department, student_id))
-    
-    conn.commit()
-    conn.close()
+        if not users_db.exists(username, email):
+            users_db.create(username, email, generate_password_hash(password), role,
+                            first_name, last_name, department, student_id)
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
@@ -62,11 +39,7 @@ def login():
     if not username or not password:
         return jsonify({'error': 'Username and password required'}), 400
     
-    conn = sqlite3.connect('auth.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ? AND is_active = 1', (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = users_db.get_active_by_username(username)
     
     if not user or not check_password_hash(user[3], password):
         return jsonify({'error': 'Invalid credentials'}), 401
@@ -114,25 +87,16 @@ def register():
     if not username or not email or not password:
         return jsonify({'error': 'Username, email, and password required'}), 400
     
-    conn = sqlite3.connect('auth.db')
-    cursor = conn.cursor()
-    
     # Check if user exists
-    cursor.execute('SELECT id FROM users WHERE username = ? OR email = ?', (username, email))
-    if cursor.fetchone():
-        conn.close()
+    if users_db.exists(username, email):
         return jsonify({'error': 'Username or email already exists'}), 400
     
     # Create new user
     password_hash = generate_password_hash(password)
-    cursor.execute('''
-        INSERT INTO users (username, email, password_hash, role, first_name, last_name, department, student_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (username, email, password_hash, 'student', first_name, last_name, department, student_id))
-    
-    user_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    user_id = users_db.create(username, email, password_hash, 'student',
+                              first_name, last_name, department, student_id)
+    if user_id is None:
+        return jsonify({'error': 'Username or email already exists'}), 400
     
     # Generate token for immediate login
     token_payload = {
@@ -173,11 +137,7 @@ def profile():
     try:
         payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         
-        conn = sqlite3.connect('auth.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE id = ?', (payload['user_id'],))
-        user = cursor.fetchone()
-        conn.close()
+        user = users_db.get(payload['user_id'])
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
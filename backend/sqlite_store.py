@@ -0,0 +1,283 @@
+"""
+Shared SQLite Connection Layer for KonsultaBot
+Tuned pragmas and pooled connections for every SQLite store
+
+All KonsultaBot databases (the Django ORM database, offline_queries.db,
+conversations.db and auth.db) open their connections with the same profile:
+WAL journaling so readers never block the writer, synchronous=NORMAL (safe
+under WAL and far fewer fsyncs), a memory-mapped read path, and a busy
+timeout so concurrent writers wait instead of failing with "database is
+locked".
+
+Raw stores borrow connections from a small per-database pool instead of
+calling sqlite3.connect on every operation; a thread that is already
+holding a connection gets the same one back, so nested calls share one
+transaction. Each store periodically runs PRAGMA optimize and reclaims free
+pages with incremental vacuum.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_MS = 5000
+
+# Applied to every new connection, in order
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', BUSY_TIMEOUT_MS),
+    ('cache_size', -16000),        # 16 MB page cache (negative = KiB)
+    ('mmap_size', 268435456),      # 256 MB memory-mapped reads
+    ('temp_store', 'MEMORY'),
+    ('foreign_keys', 'ON'),
+)
+
+# Databases smaller than this are rebuilt once to enable incremental vacuum
+AUTO_VACUUM_CONVERT_MAX_PAGES = 25600  # 100 MB at the default 4 KiB page size
+
+
+def apply_pragmas(conn, pragmas=DEFAULT_PRAGMAS):
+    """Apply the tuning profile to an open connection (sqlite3 or Django cursor wrapper)"""
+    cursor = conn.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name} = {value}')
+            if name == 'journal_mode':
+                # journal_mode answers with the mode actually in effect
+                cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def enable_incremental_vacuum(conn):
+    """Switch a database to auto_vacuum=INCREMENTAL; returns True when active.
+
+    The mode only takes effect on an empty database or after a VACUUM, so
+    existing databases are rebuilt once if they are small enough.
+    """
+    mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    if mode == 2:
+        return True
+
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    if page_count == 0:
+        return True
+    if page_count > AUTO_VACUUM_CONVERT_MAX_PAGES:
+        logger.info(f"Skipping auto_vacuum conversion of {page_count}-page database; run VACUUM manually")
+        return False
+
+    previous = conn.isolation_level
+    conn.isolation_level = None  # VACUUM cannot run inside a transaction
+    try:
+        conn.execute('VACUUM')
+    finally:
+        conn.isolation_level = previous
+    return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+
+def optimize(conn, vacuum_pages=512):
+    """PRAGMA optimize, plus incremental vacuum once enough pages are free.
+
+    Returns the number of pages reclaimed.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute('PRAGMA optimize')
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != 2:
+            return 0
+        cursor.execute('PRAGMA freelist_count')
+        free_pages = cursor.fetchone()[0]
+        if free_pages <= vacuum_pages:
+            return 0
+        cursor.execute(f'PRAGMA incremental_vacuum({free_pages})')
+        cursor.fetchall()
+        return free_pages
+    finally:
+        cursor.close()
+
+
+class SQLiteStore:
+    """Pooled, tuned connections to one SQLite database file"""
+
+    def __init__(self, path, pragmas=DEFAULT_PRAGMAS, pool_size=8,
+                 optimize_interval=3600, vacuum_pages=512):
+        self.path = str(path)
+        self.pragmas = pragmas
+        self.optimize_interval = optimize_interval
+        self.vacuum_pages = vacuum_pages
+
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_maintenance = time.monotonic()
+        self._initialized = False
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        if not self._initialized:
+            # Before the pragmas: switching to WAL writes the header of a new file
+            with self._lock:
+                if not self._initialized:
+                    try:
+                        enable_incremental_vacuum(conn)
+                    except sqlite3.Error as e:
+                        logger.warning(f"Could not enable incremental vacuum on {self.path}: {e}")
+                    self._initialized = True
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def _checkin(self, conn):
+        if conn.in_transaction:
+            # A caller forgot to commit; never hand out an open transaction
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        self.maintain_if_due()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; nested use in one thread returns the same one"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    def acquire(self):
+        """Borrow a connection for code written against sqlite3.connect; close() returns it"""
+        return PooledConnection(self, self._checkout())
+
+    @contextmanager
+    def transaction(self):
+        """Connection inside a transaction that commits on success and rolls back on error"""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                # Nested in a transaction already open on this connection; it commits
+                yield conn
+                return
+            with conn:
+                yield conn
+
+    def execute(self, sql, params=()):
+        """Run one statement in its own transaction and return all rows"""
+        with self.transaction() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def maintain_if_due(self):
+        now = time.monotonic()
+        if now - self._last_maintenance < self.optimize_interval:
+            return
+        with self._lock:
+            if now - self._last_maintenance < self.optimize_interval:
+                return
+            self._last_maintenance = now
+        try:
+            self.maintain()
+        except sqlite3.Error as e:
+            logger.warning(f"SQLite maintenance failed for {self.path}: {e}")
+
+    def maintain(self):
+        """Refresh planner statistics and return free pages to the filesystem"""
+        with self.connection() as conn:
+            optimize(conn, self.vacuum_pages)
+            conn.commit()
+
+    def close(self):
+        """Close idle connections (connections currently borrowed are closed on return)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.execute('PRAGMA optimize')
+            except sqlite3.Error:
+                pass
+            conn.close()
+
+
+class PooledConnection:
+    """sqlite3 connection proxy whose close() hands the connection back to its pool"""
+
+    def __init__(self, store, conn):
+        self._store = store
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._store._checkin(conn)
+
+    def __del__(self):
+        # A connection dropped on an error path without close() still goes back
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path, **options):
+    """Shared SQLiteStore for a database path (one pool per file per process)"""
+    key = os.path.abspath(str(path))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SQLiteStore(key, **options)
+        return store
+
+
+@atexit.register
+def _close_all():
+    for store in list(_stores.values()):
+        store.close()
+
+
+def configure_django_connection(sender, connection, **kwargs):
+    """``connection_created`` receiver applying the same profile to Django's SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    apply_pragmas(connection.connection)
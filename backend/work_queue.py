@@ -0,0 +1,377 @@
+"""
+Durable Work Queue for KonsultaBot
+One SQLite-backed queue shared by the Django replay worker, the Flask API
+and the desktop client
+
+Jobs live in a single ``jobs`` table (in ``work_queue.db`` next to this
+module unless ``KONSULTABOT_QUEUE_DB`` points elsewhere), opened through
+sqlite_store so every process gets the same WAL-tuned, pooled connections.
+
+A job is ``ready`` until a consumer leases it. A lease hides the job for a
+visibility timeout and hands back a token; the consumer then acks it (done,
+with a result) or nacks it (ready again after a backoff). A lease that is
+neither acked nor nacked simply expires and the job becomes visible again,
+so a crashed consumer loses nothing. Jobs that fail ``max_attempts`` times
+move to ``dead`` for inspection and manual requeue.
+
+Leases are taken in batches and round-robin across job owners (the user who
+queued them): each owner's oldest job comes first, then each owner's second,
+so one user's backlog cannot starve everyone else's.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import uuid4
+
+from sqlite_store import get_store
+
+DEFAULT_PATH = Path(__file__).resolve().parent / 'work_queue.db'
+
+# Questions asked while offline, answered once back online: by the Django
+# replay worker for server users, by the desktop client for its own
+OFFLINE_QUERIES = 'offline_query'
+DESKTOP_QUERIES = 'desktop_query'
+
+READY = 'ready'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        queue TEXT NOT NULL,
+        owner TEXT NOT NULL DEFAULT '',
+        payload TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'ready',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        available_at REAL NOT NULL,
+        lease_token TEXT,
+        result TEXT,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''',
+    # Visible work: ready jobs and leased jobs whose lease may have expired
+    '''
+    CREATE INDEX IF NOT EXISTS jobs_visible
+    ON jobs (queue, available_at) WHERE state IN ('ready', 'leased')
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS jobs_owner_open
+    ON jobs (queue, owner, id) WHERE state IN ('ready', 'leased')
+    ''',
+    'CREATE INDEX IF NOT EXISTS jobs_state ON jobs (queue, state, updated_at)',
+)
+
+
+@dataclass
+class Job:
+    """A leased job; pass it back to ack or nack"""
+
+    id: int
+    queue: str
+    owner: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    lease_token: str
+    created_at: float
+    result: Any = field(default=None)
+    error: Optional[str] = field(default=None)
+
+
+def _owner(owner):
+    return '' if owner is None else str(owner)
+
+
+class WorkQueue:
+    """Enqueue, lease, ack and nack jobs in one SQLite file"""
+
+    def __init__(self, path=None, default_max_attempts=5, backoff_seconds=30, max_backoff_seconds=3600):
+        self.store = get_store(path or os.environ.get('KONSULTABOT_QUEUE_DB', DEFAULT_PATH))
+        self.default_max_attempts = default_max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        with self.store.transaction() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    # ------------------------------------------------------------------
+    # Producing
+    # ------------------------------------------------------------------
+
+    def enqueue(self, queue, payload, owner=None, delay=0, max_attempts=None):
+        """Add one job; returns its id"""
+        return self.enqueue_many(queue, [payload], owner, delay, max_attempts)[0]
+
+    def enqueue_many(self, queue, payloads, owner=None, delay=0, max_attempts=None):
+        now = time.time()
+        rows = [
+            (queue, _owner(owner), json.dumps(payload), max_attempts or self.default_max_attempts,
+             now + delay, now, now)
+            for payload in payloads
+        ]
+        ids = []
+        with self.store.transaction() as conn:
+            for row in rows:
+                cursor = conn.execute(
+                    '''INSERT INTO jobs (queue, owner, payload, max_attempts, available_at, created_at, updated_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                    row
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def trim(self, queue, owner, keep):
+        """Drop an owner's oldest open jobs beyond the newest ``keep``; returns jobs dropped"""
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                '''SELECT id FROM jobs WHERE queue = ? AND owner = ? AND state IN ('ready', 'leased')
+                   ORDER BY id DESC LIMIT 1 OFFSET ?''',
+                (queue, _owner(owner), keep)
+            ).fetchone()
+            if row is None:
+                return 0
+            return conn.execute(
+                '''DELETE FROM jobs WHERE queue = ? AND owner = ? AND state IN ('ready', 'leased') AND id <= ?''',
+                (queue, _owner(owner), row[0])
+            ).rowcount
+
+    # ------------------------------------------------------------------
+    # Consuming
+    # ------------------------------------------------------------------
+
+    def lease(self, queue, limit=10, visibility_timeout=300):
+        """Lease up to ``limit`` visible jobs, round-robin across owners"""
+        now = time.time()
+        token = uuid4().hex
+        with self.store.transaction() as conn:
+            # Expired leases that used their last attempt are dead, not visible
+            conn.execute(
+                '''UPDATE jobs SET state = 'dead', lease_token = NULL, updated_at = ?,
+                          last_error = COALESCE(last_error, 'lease expired')
+                   WHERE queue = ? AND state = 'leased' AND available_at <= ? AND attempts >= max_attempts''',
+                (now, queue, now)
+            )
+            ids = [row[0] for row in conn.execute(
+                '''SELECT id FROM (
+                       SELECT id, ROW_NUMBER() OVER (PARTITION BY owner ORDER BY id) AS turn
+                       FROM jobs
+                       WHERE queue = ? AND state IN ('ready', 'leased') AND available_at <= ?
+                   ) ORDER BY turn, id LIMIT ?''',
+                (queue, now, limit)
+            )]
+            if not ids:
+                return []
+            marks = ','.join('?' * len(ids))
+            conn.execute(
+                f'''UPDATE jobs SET state = 'leased', lease_token = ?, available_at = ?,
+                           attempts = attempts + 1, updated_at = ?
+                    WHERE id IN ({marks}) AND state IN ('ready', 'leased') AND available_at <= ?''',
+                (token, now + visibility_timeout, now, *ids, now)
+            )
+            rows = conn.execute(
+                f'''SELECT id, queue, owner, payload, attempts, max_attempts, lease_token, created_at
+                   FROM jobs WHERE id IN ({marks}) AND lease_token = ?''',
+                (*ids, token)
+            ).fetchall()
+
+        order = {job_id: position for position, job_id in enumerate(ids)}
+        jobs = [
+            Job(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5], row[6], row[7])
+            for row in rows
+        ]
+        return sorted(jobs, key=lambda job: order[job.id])
+
+    def ack(self, jobs: Iterable[Job]):
+        """Mark leased jobs done with their ``result``; returns jobs acked.
+
+        A job whose lease expired and was taken by another consumer is not
+        touched.
+        """
+        now = time.time()
+        rows = [(json.dumps(job.result), now, job.id, job.lease_token) for job in jobs]
+        if not rows:
+            return 0
+        with self.store.transaction() as conn:
+            cursor = conn.executemany(
+                '''UPDATE jobs SET state = 'done', result = ?, lease_token = NULL, last_error = NULL, updated_at = ?
+                   WHERE id = ? AND lease_token = ?''',
+                rows
+            )
+            return cursor.rowcount
+
+    def nack(self, jobs: Iterable[Job], error=None, delay=None):
+        """Return leased jobs for a retry after a backoff, or dead-letter them once
+        they are out of attempts; returns jobs released.
+
+        ``error`` applies to every job; otherwise each job's own ``error`` is kept.
+        """
+        now = time.time()
+        rows = []
+        for job in jobs:
+            backoff = self.backoff_seconds * 2 ** max(job.attempts - 1, 0) if delay is None else delay
+            message = error or job.error
+            rows.append((now + min(backoff, self.max_backoff_seconds), str(message)[:1000] if message else None,
+                         now, job.id, job.lease_token))
+        if not rows:
+            return 0
+        with self.store.transaction() as conn:
+            cursor = conn.executemany(
+                '''UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'ready' END,
+                          available_at = ?, last_error = ?, lease_token = NULL, updated_at = ?
+                   WHERE id = ? AND lease_token = ?''',
+                rows
+            )
+            return cursor.rowcount
+
+    def release(self, jobs: Iterable[Job]):
+        """Give leased jobs back untried: visible again at once, attempt not counted;
+        returns jobs released"""
+        now = time.time()
+        rows = [(now, now, job.id, job.lease_token) for job in jobs]
+        if not rows:
+            return 0
+        with self.store.transaction() as conn:
+            cursor = conn.executemany(
+                '''UPDATE jobs SET state = 'ready', attempts = MAX(attempts - 1, 0), available_at = ?,
+                          lease_token = NULL, updated_at = ?
+                   WHERE id = ? AND lease_token = ?''',
+                rows
+            )
+            return cursor.rowcount
+
+    def complete(self, job_id, result=None):
+        """Mark a job done without a lease (for single-consumer clients)"""
+        with self.store.transaction() as conn:
+            return conn.execute(
+                '''UPDATE jobs SET state = 'done', result = ?, lease_token = NULL, updated_at = ?
+                   WHERE id = ? AND state IN ('ready', 'leased')''',
+                (json.dumps(result), time.time(), job_id)
+            ).rowcount == 1
+
+    # ------------------------------------------------------------------
+    # Inspection and maintenance
+    # ------------------------------------------------------------------
+
+    def pending(self, queue, owner=None, limit=None) -> List[Dict[str, Any]]:
+        """Open (ready or leased) jobs, oldest first"""
+        sql = '''SELECT id, owner, payload, state, attempts, created_at FROM jobs
+                 WHERE queue = ? AND state IN ('ready', 'leased')'''
+        params = [queue]
+        if owner is not None:
+            sql += ' AND owner = ?'
+            params.append(_owner(owner))
+        sql += ' ORDER BY id'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self.store.connection() as conn:
+            return [
+                {'id': row[0], 'owner': row[1], 'payload': json.loads(row[2]), 'state': row[3],
+                 'attempts': row[4], 'created_at': row[5]}
+                for row in conn.execute(sql, params)
+            ]
+
+    def completed(self, queue, owner=None, after_id=0, limit=50) -> List[Dict[str, Any]]:
+        """Done jobs with their results, newest first (``after_id`` for incremental reads)"""
+        sql = '''SELECT id, owner, payload, result, updated_at FROM jobs
+                 WHERE queue = ? AND state = 'done' AND id > ?'''
+        params = [queue, after_id]
+        if owner is not None:
+            sql += ' AND owner = ?'
+            params.append(_owner(owner))
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        with self.store.connection() as conn:
+            return [self._completed_row(row) for row in conn.execute(sql, params)]
+
+    def completed_since(self, queue, cursor=(0.0, 0), owner=None, limit=50) -> List[Dict[str, Any]]:
+        """Done jobs in completion order after ``cursor``, a ``(completed_at, id)`` pair
+
+        Pass the last job's ``(completed_at, id)`` back as the next cursor.
+        Ordering by completion rather than by id means a job that was retried
+        and finished after newer ones is still returned.
+        """
+        sql = '''SELECT id, owner, payload, result, updated_at FROM jobs
+                 WHERE queue = ? AND state = 'done' AND (updated_at, id) > (?, ?)'''
+        params = [queue, cursor[0], cursor[1]]
+        if owner is not None:
+            sql += ' AND owner = ?'
+            params.append(_owner(owner))
+        sql += ' ORDER BY updated_at, id LIMIT ?'
+        params.append(limit)
+        with self.store.connection() as conn:
+            return [self._completed_row(row) for row in conn.execute(sql, params)]
+
+    @staticmethod
+    def _completed_row(row):
+        return {'id': row[0], 'owner': row[1], 'payload': json.loads(row[2]),
+                'result': json.loads(row[3]) if row[3] else None, 'completed_at': row[4]}
+
+    def dead_letters(self, queue, limit=100) -> List[Dict[str, Any]]:
+        with self.store.connection() as conn:
+            return [
+                {'id': row[0], 'owner': row[1], 'payload': json.loads(row[2]), 'attempts': row[3],
+                 'last_error': row[4], 'failed_at': row[5]}
+                for row in conn.execute(
+                    '''SELECT id, owner, payload, attempts, last_error, updated_at FROM jobs
+                       WHERE queue = ? AND state = 'dead' ORDER BY id LIMIT ?''',
+                    (queue, limit)
+                )
+            ]
+
+    def requeue_dead(self, queue, ids: Optional[Iterable[int]] = None):
+        """Give dead-lettered jobs a fresh set of attempts; returns jobs requeued"""
+        now = time.time()
+        sql = '''UPDATE jobs SET state = 'ready', attempts = 0, available_at = ?, updated_at = ?
+                 WHERE queue = ? AND state = 'dead' '''
+        params = [now, now, queue]
+        if ids is not None:
+            ids = list(ids)
+            if not ids:
+                return 0
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        with self.store.transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def counts(self, queue, owner=None) -> Dict[str, int]:
+        """Jobs per state"""
+        sql = 'SELECT state, COUNT(*) FROM jobs WHERE queue = ?'
+        params = [queue]
+        if owner is not None:
+            sql += ' AND owner = ?'
+            params.append(_owner(owner))
+        with self.store.connection() as conn:
+            counts = dict(conn.execute(sql + ' GROUP BY state', params).fetchall())
+        return {state: counts.get(state, 0) for state in (READY, LEASED, DONE, DEAD)}
+
+    def purge(self, queue, older_than_days=30):
+        """Delete done jobs finished more than ``older_than_days`` ago; returns jobs deleted"""
+        cutoff = time.time() - older_than_days * 86400
+        with self.store.transaction() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE queue = ? AND state = 'done' AND updated_at < ?",
+                (queue, cutoff)
+            ).rowcount
+
+
+_queues = {}
+
+
+def get_queue(path=None, **options):
+    """Shared WorkQueue for a database path (the default file unless given)"""
+    key = os.path.abspath(str(path or os.environ.get('KONSULTABOT_QUEUE_DB', DEFAULT_PATH)))
+    queue = _queues.get(key)
+    if queue is None:
+        queue = _queues.setdefault(key, WorkQueue(key, **options))
+    return queue
@@ -131,11 +131,15 @@ class ApiService {
     }
   }
 
-  async getConversationHistory(sessionId = null) {
+  async getConversationHistory(sessionId = null, since = null) {
     try {
-      const url = sessionId ? `/api/v1/chat/history/${sessionId}/` : '/api/v1/chat/history/';
-      const response = await this.api.get(url);
-      return response.data;
+      // With a `since` cursor only messages newer than it are returned;
+      // 304 means the session has not changed since the last sync
+      const response = await this.api.get('/api/v1/chat/history/', {
+        params: { session_id: sessionId || undefined, since: since || undefined },
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+      });
+      return response.status === 304 ? null : response.data;
     } catch (error) {
       console.error('Get history error:', error.response?.data || error.message);
       throw error;
@@ -4,6 +4,7 @@ class ChatService {
   constructor() {
     this.sessionId = null;
     this.history = [];
+    this.historyCursor = null;
   }
 
   async sendMessage(message, language = 'english') {
@@ -83,15 +84,21 @@ class ChatService {
 
   async getHistory() {
     try {
-      const history = await apiService.getConversationHistory(this.sessionId);
-      if (history && Array.isArray(history)) {
-        this.history = history.map(item => ({
+      const since = this.historyCursor;
+      const page = await apiService.getConversationHistory(this.sessionId, since);
+      if (page && Array.isArray(page.history)) {
+        const messages = page.history.map(item => ({
           ...item,
           timestamp: new Date(item.timestamp)
         }));
-        return this.history;
+        // Incremental sync: only messages after the stored cursor come back.
+        // Locally echoed turns (no server id) are replaced by their stored copies.
+        this.history = since
+          ? this.history.filter(item => item.id !== undefined).concat(messages)
+          : messages;
+        this.historyCursor = page.cursors?.since || since;
       }
-      return [];
+      return this.history;
     } catch (error) {
       console.error('Error fetching history:', error);
       return [];
@@ -104,6 +111,7 @@ class ChatService {
         await apiService.endChatSession(this.sessionId);
         this.sessionId = null;
         this.history = [];
+        this.historyCursor = null;
       } catch (error) {
         console.error('Error ending session:', error);
       }
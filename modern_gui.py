@@ -13,6 +13,7 @@ import os
 import math
 from database import DatabaseManager
 from config import Config
+from voice_activity import detector_for_source, listen_for_utterance
 
 # Optional imports with graceful fallbacks
 try:
@@ -1075,11 +1076,23 @@ class ModernKonsultabotGUI:
         """Listen for voice input and convert to text"""
         try:
             with self.microphone as source:
-                # Show calibrating status
-                self.root.after(0, lambda: self.display_message("System", "🎤 Calibrating audio... Speak now!", "system"))
+                self.root.after(0, lambda: self.display_message("System", "🎤 Listening... Speak now!", "system"))
                 
-                # Listen for audio with timeout
-                audio = self.recognizer.listen(source, timeout=10, phrase_time_limit=30)
+                # The detector keeps its noise floor between listens, so only
+                # the first listen spends time calibrating
+                if getattr(self, 'voice_detector', None) is None:
+                    self.voice_detector = detector_for_source(source, max_utterance_s=30)
+                
+                # Wait for one utterance; silence is never sent to the recognizer
+                frame_data = listen_for_utterance(
+                    source, self.voice_detector, timeout=10,
+                    should_continue=lambda: self.is_listening
+                )
+                if frame_data is None:
+                    if not self.is_listening:
+                        return
+                    raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+                audio = sr.AudioData(frame_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
                 
                 # Show processing status
                 self.root.after(0, lambda: self.display_message("System", "🔄 Processing speech...", "system"))
@@ -6,11 +6,15 @@ import socket
 import threading
 import time
 import logging
+import os
 import sqlite3
-import json
+import sys
 from datetime import datetime
 from typing import List, Dict, Optional, Callable
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from work_queue import DESKTOP_QUERIES, get_queue
+
 class NetworkDetector:
     def __init__(self, callback=None, db_path="konsultabot.db"):
         self.is_online = False
@@ -19,7 +23,8 @@ class NetworkDetector:
         self.thread = None
         self.db_path = db_path
         self.sync_callback: Optional[Callable] = None
-        self._init_queue_db()
+        self.queue = get_queue()
+        self._import_legacy_queue()
         
     def check_internet_connection(self):
         """Check if internet connection is available using multiple reliable endpoints"""
@@ -92,38 +97,43 @@ class NetworkDetector:
         """Get current network status"""
         return self.is_online
     
-    def _init_queue_db(self):
-        """Initialize offline queue database"""
+    def _import_legacy_queue(self):
+        """Move pending rows of the old offline_queue table onto the work queue"""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS offline_queue (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        query TEXT NOT NULL,
-                        timestamp TEXT NOT NULL,
-                        user_id TEXT,
-                        language TEXT DEFAULT 'english',
-                        status TEXT DEFAULT 'pending',
-                        response TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'offline_queue'"
+                ).fetchone()
+                if not exists:
+                    return
+                rows = conn.execute('''
+                    SELECT id, query, timestamp, user_id, language
+                    FROM offline_queue
+                    WHERE status = 'pending'
+                    ORDER BY created_at ASC
+                ''').fetchall()
+                for _, query, timestamp, user_id, language in rows:
+                    self.queue.enqueue(DESKTOP_QUERIES, {
+                        'query': query, 'timestamp': timestamp, 'language': language or 'english'
+                    }, owner=user_id)
+                conn.executemany(
+                    "UPDATE offline_queue SET status = 'migrated' WHERE id = ?",
+                    [(row[0],) for row in rows]
+                )
                 conn.commit()
+                if rows:
+                    logging.info(f"Moved {len(rows)} queued queries to the work queue")
         except Exception as e:
-            logging.error(f"Failed to initialize queue database: {e}")
+            logging.error(f"Failed to import offline queue: {e}")
     
     def add_to_queue(self, query: str, user_id: str = None, language: str = "english") -> int:
         """Add query to offline queue"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('''
-                    INSERT INTO offline_queue (query, timestamp, user_id, language)
-                    VALUES (?, ?, ?, ?)
-                ''', (query, datetime.now().isoformat(), user_id, language))
-                conn.commit()
-                queue_id = cursor.lastrowid
-                logging.info(f"Added query to offline queue: ID {queue_id}")
-                return queue_id
+            queue_id = self.queue.enqueue(DESKTOP_QUERIES, {
+                'query': query, 'timestamp': datetime.now().isoformat(), 'language': language
+            }, owner=user_id)
+            logging.info(f"Added query to offline queue: ID {queue_id}")
+            return queue_id
         except Exception as e:
             logging.error(f"Failed to add query to queue: {e}")
             return -1
@@ -131,38 +141,34 @@ class NetworkDetector:
     def get_pending_queries(self) -> List[Dict]:
         """Get all pending queries from queue"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT id, query, timestamp, user_id, language 
-                    FROM offline_queue 
-                    WHERE status = 'pending' 
-                    ORDER BY created_at ASC
-                ''')
-                return [
-                    {
-                        'id': row[0],
-                        'query': row[1], 
-                        'timestamp': row[2],
-                        'user_id': row[3],
-                        'language': row[4]
-                    }
-                    for row in cursor.fetchall()
-                ]
+            return [
+                {
+                    'id': job['id'],
+                    'query': job['payload']['query'],
+                    'timestamp': job['payload'].get('timestamp'),
+                    'user_id': job['owner'] or None,
+                    'language': job['payload'].get('language', 'english')
+                }
+                for job in self.queue.pending(DESKTOP_QUERIES)
+            ]
         except Exception as e:
             logging.error(f"Failed to get pending queries: {e}")
             return []
     
+    def pending_count(self) -> int:
+        """Number of queries waiting to be synced"""
+        try:
+            counts = self.queue.counts(DESKTOP_QUERIES)
+            return counts['ready'] + counts['leased']
+        except Exception as e:
+            logging.error(f"Failed to count pending queries: {e}")
+            return 0
+    
     def mark_query_processed(self, queue_id: int, response: str = None):
         """Mark query as processed"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute('''
-                    UPDATE offline_queue 
-                    SET status = 'processed', response = ?
-                    WHERE id = ?
-                ''', (response, queue_id))
-                conn.commit()
-                logging.info(f"Marked query {queue_id} as processed")
+            self.queue.complete(queue_id, {'response': response})
+            logging.info(f"Marked query {queue_id} as processed")
         except Exception as e:
             logging.error(f"Failed to mark query as processed: {e}")
     
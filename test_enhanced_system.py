@@ -78,7 +78,7 @@ class KonsultaBotSystemTester:
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
             tables = cursor.fetchall()
             
-            expected_tables = ['query_analytics', 'system_performance', 'user_feedback', 'offline_queue']
+            expected_tables = ['query_analytics', 'system_performance', 'user_feedback']
             existing_tables = [table[0] for table in tables]
             
             missing_tables = [table for table in expected_tables if table not in existing_tables]
@@ -0,0 +1,61 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+project_root = str(Path(__file__).resolve().parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from analytics_dashboard import KonsultaBotAnalytics
+
+
+def make_analytics(tmp_path):
+    analytics = KonsultaBotAnalytics(str(tmp_path / "analytics.db"))
+    with sqlite3.connect(analytics.db_path) as conn:
+        conn.executemany(
+            "INSERT INTO query_analytics (query, response_mode, response_source, response_time, "
+            "query_category, satisfaction_rating, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                ("wifi down", "online", "gemini_ai", 1.0, "wifi", 5, "2099-01-01T08:00:00"),
+                ("wifi slow", "online", "knowledge_base", 3.0, "wifi", None, "2099-01-01T09:00:00"),
+                ("printer jam", "offline", "local_intelligence", None, "printer", 3, "2099-01-02T10:00:00"),
+            ],
+        )
+    return analytics
+
+
+def test_metrics_come_from_one_grouped_pass(tmp_path):
+    data = make_analytics(tmp_path).get_analytics_data(days=30)
+
+    assert data.total_queries == 3
+    assert data.online_queries == 2
+    assert data.offline_queries == 1
+    assert data.gemini_success_rate == 50
+    assert data.top_issues == [("wifi", 2), ("printer", 1)]
+    assert data.user_satisfaction == 4
+    assert data.avg_response_time == 2
+    assert data.responses_tracked == 2
+    assert data.daily_usage == {"2099-01-01": 2, "2099-01-02": 1}
+
+
+def test_data_version_changes_only_with_new_rows(tmp_path):
+    analytics = make_analytics(tmp_path)
+    first = analytics.get_analytics_data(days=30)
+    assert analytics.get_analytics_data(days=30) is first
+
+    analytics.log_user_feedback(1, 4)
+    second = analytics.get_analytics_data(days=30)
+    assert second.version != first.version
+    assert second.user_satisfaction == 3.5
+
+
+def test_report_does_not_import_plotting_libraries(tmp_path):
+    analytics = make_analytics(tmp_path)
+    analytics.render_charts_async = lambda data, chart_dir: None
+
+    report = analytics.generate_report(days=30, output_path=str(tmp_path / "report.html"))
+
+    html = Path(report).read_text(encoding="utf-8")
+    assert "Total Queries" in html
+    assert f"daily_usage-{analytics.get_analytics_data(30).version}.png" in html
+    assert "matplotlib.pyplot" not in sys.modules
@@ -0,0 +1,206 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+django = pytest.importorskip("django")
+
+backend_dir = Path(__file__).resolve().parent.parent / "backend"
+for path in (str(backend_dir), str(backend_dir / "django_konsultabot")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from django.conf import settings
+
+SHARED_DB = str(Path(tempfile.mkdtemp()) / "cache.db")
+REDIS_URL = os.environ.get("KONSULTABOT_TEST_REDIS_URL", "redis://127.0.0.1:6379/15")
+
+if not settings.configured:
+    settings.configure(CACHES={
+        "default": {"BACKEND": "django_konsultabot.caching.LRUCache", "KEY_PREFIX": "default"},
+        "shared": {"BACKEND": "django_konsultabot.caching.SQLiteCache", "LOCATION": SHARED_DB,
+                   "KEY_PREFIX": "shared", "TIMEOUT": 60},
+    })
+
+from django_konsultabot.caching import CacheNamespace, LRUCache, SQLiteCache, gcra
+
+
+def make_cache(path, namespace="ns", **options):
+    return SQLiteCache(str(path), {"KEY_PREFIX": namespace, "TIMEOUT": 60, "OPTIONS": options})
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    # Two instances on one file stand in for two worker processes
+    first = make_cache(tmp_path / "cache.db")
+    second = make_cache(tmp_path / "cache.db")
+
+    first.set("answer", {"text": "hi"})
+
+    assert second.get("answer") == {"text": "hi"}
+    assert second.delete("answer")
+    assert first.get("answer", "missing") == "missing"
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = make_cache(tmp_path / "cache.db")
+    cache.set("short", 1, timeout=0.1)
+    time.sleep(0.15)
+
+    assert cache.get("short") is None
+    assert not cache.has_key("short")
+
+
+def test_culling_respects_each_namespace_budget(tmp_path):
+    small = make_cache(tmp_path / "cache.db", namespace="small", MAX_ENTRIES=10, CULL_FREQUENCY=2)
+    other = make_cache(tmp_path / "cache.db", namespace="other", MAX_ENTRIES=10)
+    small.cull_check_every = 1
+
+    for i in range(5):
+        other.set(f"k{i}", i)
+    for i in range(40):
+        small.set(f"k{i}", i)
+
+    kept = [i for i in range(40) if small.has_key(f"k{i}")]
+    assert 0 < len(kept) <= 10
+    # Soonest-expiring (oldest) rows go first
+    assert 39 in kept
+    assert 0 not in kept
+    # Culling one namespace leaves the others alone
+    assert [other.get(f"k{i}") for i in range(5)] == list(range(5))
+
+
+def test_add_has_one_winner_across_instances(tmp_path):
+    caches = [make_cache(tmp_path / "cache.db") for _ in range(8)]
+    barrier = threading.Barrier(len(caches))
+    results = []
+
+    def race(cache, n):
+        barrier.wait()
+        results.append(cache.add("lock", n, timeout=5))
+
+    threads = [threading.Thread(target=race, args=(cache, n)) for n, cache in enumerate(caches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert caches[0].get("lock") in range(len(caches))
+
+
+def test_add_replaces_an_expired_entry(tmp_path):
+    cache = make_cache(tmp_path / "cache.db")
+    assert cache.add("lock", "first", timeout=0.1)
+    assert not cache.add("lock", "second")
+    time.sleep(0.15)
+
+    assert cache.add("lock", "third")
+    assert cache.get("lock") == "third"
+
+
+def test_namespace_keys_are_stable():
+    first = CacheNamespace("shared")
+    second = CacheNamespace("shared")
+
+    assert first.make_key(("kb", "wifi", 3)) == second.make_key(("kb", "wifi", 3))
+    assert first.make_key(("kb", "wifi", 3)) != first.make_key(("kb", "wifi", 4))
+
+
+@pytest.mark.parametrize("name", ["shared", "default"])
+def test_clear_bumps_the_generation_for_every_holder(name):
+    writer = CacheNamespace(name)
+    reader = CacheNamespace(name)
+    writer.set("question", "answer")
+    assert reader.get("question") == "answer"
+    old_key = reader.make_key("question")
+
+    writer.clear()
+
+    assert reader.make_key("question") != old_key
+    assert reader.get("question", "missing") == "missing"
+    reader.set("question", "fresh")
+    assert writer.get("question") == "fresh"
+
+
+def test_generation_from_another_process_is_seen_after_the_ttl(monkeypatch):
+    monkeypatch.setattr(CacheNamespace, "GENERATION_TTL", 0.1)
+    monkeypatch.setattr(CacheNamespace, "_generations", {})
+    namespace = CacheNamespace("shared")
+    old_key = namespace.make_key("question")
+
+    # Another worker clears the namespace through the shared cache
+    namespace.cache.incr(CacheNamespace.GENERATION_KEY)
+
+    assert namespace.make_key("question") == old_key
+    time.sleep(0.15)
+    assert namespace.make_key("question") != old_key
+
+
+def test_sqlite_gcra_allows_a_burst_then_spaces_requests(tmp_path):
+    first = make_cache(tmp_path / "cache.db")
+    second = make_cache(tmp_path / "cache.db")
+    interval = 0.2
+
+    # Budget of 3, spent from two instances
+    waits = [gcra(cache, "rate", interval, interval * 2) for cache in (first, second, first)]
+    assert waits == [0.0, 0.0, 0.0]
+
+    wait = gcra(second, "rate", interval, interval * 2)
+    assert 0 < wait <= interval
+    time.sleep(wait + 0.01)
+    assert gcra(first, "rate", interval, interval * 2) == 0.0
+
+
+def test_sqlite_gcra_never_overspends_under_contention(tmp_path):
+    caches = [make_cache(tmp_path / "cache.db") for _ in range(6)]
+    barrier = threading.Barrier(len(caches))
+    allowed = []
+
+    def spend(cache):
+        barrier.wait()
+        for _ in range(5):
+            allowed.append(gcra(cache, "rate", 60, 60 * 9) == 0)
+
+    threads = [threading.Thread(target=spend, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert allowed.count(True) == 10
+
+
+def test_gcra_on_local_memory_cache():
+    cache = LRUCache("gcra-test", {"KEY_PREFIX": "gcra"})
+
+    assert [gcra(cache, "rate", 1.0, 1.0) for _ in range(2)] == [0.0, 0.0]
+    assert gcra(cache, "rate", 1.0, 1.0) > 0
+
+
+@pytest.fixture
+def redis_cache():
+    pytest.importorskip("redis")
+    from django.core.cache.backends.redis import RedisCache
+
+    cache = RedisCache(REDIS_URL, {"KEY_PREFIX": "konsultabot-test"})
+    try:
+        cache._cache.get_client(write=True).ping()
+    except Exception:
+        pytest.skip(f"no Redis server at {REDIS_URL}")
+    cache.delete("rate")
+    yield cache
+    cache.delete("rate")
+
+
+def test_redis_gcra_allows_a_burst_then_spaces_requests(redis_cache):
+    interval = 0.2
+
+    assert [gcra(redis_cache, "rate", interval, interval * 2) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = gcra(redis_cache, "rate", interval, interval * 2)
+    assert 0 < wait <= interval
+    time.sleep(wait + 0.01)
+    assert gcra(redis_cache, "rate", interval, interval * 2) == 0.0
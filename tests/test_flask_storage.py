@@ -0,0 +1,77 @@
+import sys
+import time
+from pathlib import Path
+
+backend_dir = str(Path(__file__).resolve().parent.parent / "backend")
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from flask_storage import ConversationStore, UserStore
+
+
+def count_rows(store):
+    with store.store.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def test_conversations_are_written_in_batches(tmp_path):
+    store = ConversationStore(tmp_path / "conversations.db", batch_size=3, flush_interval=60)
+
+    store.save(1, "alice", "student", "q1", "r1")
+    store.save(1, "alice", "student", "q2", "r2")
+    assert count_rows(store) == 0
+
+    store.save(2, "bob", "it_staff", "q3", "r3")
+    assert count_rows(store) == 3
+
+
+def test_timer_flushes_a_partial_batch(tmp_path):
+    store = ConversationStore(tmp_path / "conversations.db", batch_size=100, flush_interval=0.05)
+
+    store.save(1, "alice", "student", "q1", "r1")
+    deadline = time.time() + 2
+    while count_rows(store) == 0 and time.time() < deadline:
+        time.sleep(0.02)
+
+    assert count_rows(store) == 1
+
+
+def test_history_sees_buffered_conversations(tmp_path):
+    store = ConversationStore(tmp_path / "conversations.db", batch_size=100, flush_interval=60)
+    store.save(1, "alice", "student", "mine", "r")
+    store.save(2, "bob", "student", "theirs", "r")
+
+    assert [row["query"] for row in store.history(1)] == ["mine"]
+    assert len(store.history()) == 2
+
+
+def test_stats_come_from_one_query_and_are_cached(tmp_path):
+    store = ConversationStore(tmp_path / "conversations.db", flush_interval=60, stats_ttl=60)
+    store.save(1, "alice", "student", "q1", "r")
+    store.save(1, "alice", "student", "q2", "r")
+    store.save(2, "root", "admin", "q3", "r")
+    with store.store.transaction() as conn:
+        conn.execute(
+            "INSERT INTO conversations (user_id, role, query, timestamp) VALUES (3, 'student', 'old', '2000-01-01 00:00:00')"
+        )
+
+    stats = store.stats()
+
+    assert stats["total_conversations"] == 4
+    assert stats["unique_users"] == 3
+    assert stats["conversations_by_role"] == {"student": 3, "admin": 1}
+    assert sum(stats["daily_conversations_last_7_days"].values()) == 3
+
+    store.save(4, "carol", "student", "q4", "r")
+    assert store.stats()["total_conversations"] == 4
+
+
+def test_user_store_rejects_duplicates(tmp_path):
+    users = UserStore(tmp_path / "auth.db")
+
+    user_id = users.create("alice", "alice@example.com", "hash")
+
+    assert users.get(user_id)[1] == "alice"
+    assert users.get_active_by_username("alice")[3] == "hash"
+    assert users.exists("other", "alice@example.com")
+    assert users.create("alice", "new@example.com", "hash") is None
@@ -0,0 +1,83 @@
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+backend_dir = str(Path(__file__).resolve().parent.parent / "backend")
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from sqlite_store import SQLiteStore
+
+
+def make_store(tmp_path):
+    store = SQLiteStore(tmp_path / "store.db")
+    store.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)")
+    return store
+
+
+def test_connections_are_tuned_and_reused(tmp_path):
+    store = make_store(tmp_path)
+
+    with store.connection() as first:
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert first.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+        with store.connection() as nested:
+            assert nested is first
+    with store.connection() as again:
+        assert again is first
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    store = make_store(tmp_path)
+
+    try:
+        with store.transaction() as conn:
+            conn.execute("INSERT INTO items (value) VALUES ('lost')")
+            raise RuntimeError
+    except RuntimeError:
+        pass
+
+    assert store.execute("SELECT COUNT(*) FROM items") == [(0,)]
+
+
+def test_acquired_connection_returns_to_pool_on_close(tmp_path):
+    store = make_store(tmp_path)
+
+    conn = store.acquire()
+    raw = conn._conn
+    conn.execute("INSERT INTO items (value) VALUES ('kept')")
+    conn.commit()
+    conn.close()
+
+    with store.connection() as again:
+        assert again is raw
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        pass
+    else:
+        raise AssertionError("closed proxy should not be usable")
+
+
+def test_concurrent_writers_do_not_lock(tmp_path):
+    store = make_store(tmp_path)
+    errors = []
+
+    def write():
+        try:
+            for i in range(50):
+                with store.transaction() as conn:
+                    conn.execute("INSERT INTO items (value) VALUES (?)", (str(i),))
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.execute("SELECT COUNT(*) FROM items") == [(300,)]
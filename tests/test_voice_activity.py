@@ -0,0 +1,93 @@
+import math
+import sys
+from array import array
+from pathlib import Path
+
+project_root = str(Path(__file__).resolve().parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import voice_activity
+from voice_activity import VoiceActivityDetector, listen_for_utterance
+
+
+RATE = 16000
+
+
+def tone(detector, amplitude, frames=1, freq=220):
+    samples = array('h', (int(amplitude * math.sin(2 * math.pi * freq * i / RATE))
+                          for i in range(detector.frame_samples * frames)))
+    return samples.tobytes()
+
+
+def silence(detector, frames=1):
+    return bytes(detector.frame_bytes * frames)
+
+
+def split_frames(detector, data):
+    size = detector.frame_bytes
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class FakeStream:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def read(self, size):
+        return self.frames.pop(0) if self.frames else b''
+
+
+def test_utterance_includes_pre_roll_and_ends_after_hangover():
+    detector = VoiceActivityDetector(sample_rate=RATE)
+    frames = (
+        [silence(detector)] * 20
+        + split_frames(detector, tone(detector, 8000, frames=20))
+        + [silence(detector)] * (detector.hangover_frames + 5)
+    )
+
+    results = [detector.process(frame) for frame in frames]
+    utterances = [r for r in results if r]
+
+    assert detector.is_calibrated
+    assert len(utterances) == 1
+    # Pre-roll frames before the gate opened are kept in the utterance
+    expected_frames = detector.pre_roll_frames - detector.start_frames + 20 + detector.hangover_frames
+    assert len(utterances[0]) == expected_frames * detector.frame_bytes
+    assert not detector.in_utterance
+
+
+def test_short_click_is_discarded():
+    detector = VoiceActivityDetector(sample_rate=RATE)
+    frames = (
+        [silence(detector)] * 20
+        + split_frames(detector, tone(detector, 8000, frames=detector.start_frames))
+        + [silence(detector)] * (detector.hangover_frames + 5)
+    )
+    assert not any(detector.process(frame) for frame in frames)
+
+
+def test_high_zero_crossing_noise_is_rejected():
+    detector = VoiceActivityDetector(sample_rate=RATE, min_energy=100)
+    detector.noise_floor = 100
+    # Alternating-sign samples just above the threshold: hiss, not voice
+    hiss = array('h', (300 if i % 2 else -300 for i in range(detector.frame_samples))).tobytes()
+    speech, _ = detector.is_speech(hiss)
+    assert speech is False
+
+
+def test_listen_for_utterance_times_out_on_silence():
+    detector = VoiceActivityDetector(sample_rate=RATE)
+    source = type('Source', (), {})()
+    source.stream = FakeStream([silence(detector)] * 200)
+    assert listen_for_utterance(source, detector, timeout=1) is None
+
+
+def test_pure_python_measurements_match(monkeypatch):
+    detector = VoiceActivityDetector(sample_rate=RATE)
+    frame = tone(detector, 5000)
+    expected = (voice_activity.frame_rms(frame), voice_activity.frame_zero_crossing_rate(frame))
+    monkeypatch.setattr(voice_activity, 'AUDIOOP_AVAILABLE', False)
+    rms = voice_activity.frame_rms(frame)
+    zcr = voice_activity.frame_zero_crossing_rate(frame)
+    assert abs(rms - expected[0]) <= 1
+    assert abs(zcr - expected[1]) < 0.01
@@ -0,0 +1,96 @@
+import sys
+import time
+from pathlib import Path
+
+backend_dir = str(Path(__file__).resolve().parent.parent / "backend")
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from work_queue import WorkQueue
+
+
+def make_queue(tmp_path, **options):
+    return WorkQueue(tmp_path / "queue.db", **options)
+
+
+def test_lease_is_round_robin_across_owners(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue_many("q", [{"n": i} for i in range(4)], owner="alice")
+    queue.enqueue("q", {"n": "b"}, owner="bob")
+
+    jobs = queue.lease("q", limit=3)
+
+    assert [(job.owner, job.payload["n"]) for job in jobs] == [("alice", 0), ("bob", "b"), ("alice", 1)]
+    assert queue.counts("q") == {"ready": 2, "leased": 3, "done": 0, "dead": 0}
+
+
+def test_leased_jobs_are_hidden_until_the_lease_expires(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("q", {"n": 1})
+
+    first = queue.lease("q", visibility_timeout=0.2)
+    assert queue.lease("q") == []
+    time.sleep(0.25)
+    second = queue.lease("q")
+
+    assert [job.id for job in second] == [first[0].id]
+    assert second[0].attempts == 2
+    # The expired holder can no longer ack
+    assert queue.ack(first) == 0
+    second[0].result = {"answer": 42}
+    assert queue.ack(second) == 1
+    assert queue.completed("q")[0]["result"] == {"answer": 42}
+
+
+def test_nack_retries_then_dead_letters(tmp_path):
+    queue = make_queue(tmp_path, default_max_attempts=2)
+    queue.enqueue("q", {"n": 1}, owner=7)
+
+    assert queue.nack(queue.lease("q"), error="offline", delay=0) == 1
+    assert queue.nack(queue.lease("q"), error="offline again", delay=0) == 1
+
+    assert queue.lease("q") == []
+    dead = queue.dead_letters("q")
+    assert [(job["owner"], job["last_error"]) for job in dead] == [("7", "offline again")]
+    assert queue.requeue_dead("q") == 1
+    assert len(queue.lease("q")) == 1
+
+
+def test_trim_keeps_the_newest_open_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    ids = queue.enqueue_many("q", [{"n": i} for i in range(5)], owner="alice")
+
+    assert queue.trim("q", "alice", keep=2) == 3
+    assert [job["id"] for job in queue.pending("q", owner="alice")] == ids[-2:]
+
+
+def test_completed_since_follows_completion_order(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue_many("q", [{"n": i} for i in range(3)], owner="alice")
+    first, second, third = queue.lease("q", limit=3)
+
+    # The oldest job finishes last, as a retried job would
+    queue.ack([second, third])
+    page = queue.completed_since("q", owner="alice")
+    assert [job["payload"]["n"] for job in page] == [1, 2]
+
+    cursor = (page[-1]["completed_at"], page[-1]["id"])
+    assert queue.completed_since("q", cursor, owner="alice") == []
+    time.sleep(0.01)
+    queue.ack([first])
+    assert [job["payload"]["n"] for job in queue.completed_since("q", cursor, owner="alice")] == [0]
+    assert queue.completed_since("q", cursor, owner="bob") == []
+
+
+def test_release_returns_jobs_without_spending_an_attempt(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("q", {"n": 1})
+
+    first = queue.lease("q", visibility_timeout=60)
+    assert queue.release(first) == 1
+    again = queue.lease("q")
+
+    assert [job.id for job in again] == [first[0].id]
+    assert again[0].attempts == 1
+    # A stale lease cannot release the job from its new holder
+    assert queue.release(first) == 0
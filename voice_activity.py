@@ -0,0 +1,228 @@
+"""
+Voice Activity Detection for Konsultabot - EVSU DULAG AI Chatbot
+Frame-level energy / zero-crossing gate used to cut microphone audio into
+utterances before anything is sent to speech recognition
+"""
+
+import logging
+import warnings
+from array import array
+from collections import deque
+
+# audioop is implemented in C but was removed from the standard library in
+# Python 3.13; fall back to a pure-Python version of the two measurements.
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import audioop
+    AUDIOOP_AVAILABLE = True
+except ImportError:
+    AUDIOOP_AVAILABLE = False
+
+_ARRAY_TYPECODES = {1: 'b', 2: 'h', 4: 'i'}
+
+
+def frame_rms(frame, sample_width=2):
+    """Root-mean-square amplitude of a PCM frame"""
+    if AUDIOOP_AVAILABLE:
+        return audioop.rms(frame, sample_width)
+    samples = array(_ARRAY_TYPECODES[sample_width], frame)
+    if not samples:
+        return 0
+    return int((sum(s * s for s in samples) / len(samples)) ** 0.5)
+
+
+def frame_zero_crossing_rate(frame, sample_width=2):
+    """Fraction of adjacent samples that change sign"""
+    count = len(frame) // sample_width
+    if count < 2:
+        return 0.0
+    if AUDIOOP_AVAILABLE:
+        crossings = audioop.cross(frame, sample_width)
+    else:
+        samples = array(_ARRAY_TYPECODES[sample_width], frame)
+        crossings = sum(1 for a, b in zip(samples, samples[1:]) if (a < 0) != (b < 0))
+    return crossings / (count - 1)
+
+
+class VoiceActivityDetector:
+    """Split a stream of PCM frames into speech segments
+
+    Frames are fed one at a time. While the user is quiet each frame costs a
+    single RMS measurement and is kept only in a short ring buffer; once
+    enough consecutive frames pass the gate the ring buffer becomes the
+    pre-roll of a new utterance, which is returned as raw PCM bytes after
+    ``hangover_ms`` of silence.
+    """
+
+    def __init__(self, sample_rate=16000, sample_width=2, frame_ms=30,
+                 pre_roll_ms=300, hangover_ms=600, start_ms=90,
+                 min_speech_ms=200, max_utterance_s=30,
+                 energy_ratio=2.5, min_energy=150, max_zcr=0.35,
+                 calibration_ms=300, noise_adapt_rate=0.05):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_ms = frame_ms
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.frame_bytes = self.frame_samples * sample_width
+
+        self.pre_roll_frames = max(1, pre_roll_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_utterance_frames = max(1, int(max_utterance_s * 1000) // frame_ms)
+        self.calibration_frames = max(1, calibration_ms // frame_ms)
+
+        self.energy_ratio = energy_ratio
+        self.min_energy = min_energy
+        self.max_zcr = max_zcr
+        self.noise_adapt_rate = noise_adapt_rate
+
+        # The noise floor survives reset() so listening again does not recalibrate
+        self.noise_floor = None
+        self._calibration = []
+        self.reset()
+
+    def reset(self):
+        """Drop any partial utterance and return to the idle state"""
+        self._ring = deque(maxlen=self.pre_roll_frames)
+        self._utterance = None
+        self._speech_run = 0
+        self._silence_run = 0
+        self._voiced_frames = 0
+
+    @property
+    def is_calibrated(self):
+        return self.noise_floor is not None
+
+    @property
+    def in_utterance(self):
+        return self._utterance is not None
+
+    @property
+    def threshold(self):
+        """Current RMS level a frame must exceed to count as speech"""
+        if self.noise_floor is None:
+            return self.min_energy
+        return max(self.min_energy, self.noise_floor * self.energy_ratio)
+
+    def is_speech(self, frame):
+        """Classify a single frame using energy, then zero-crossing rate"""
+        rms = frame_rms(frame, self.sample_width)
+        threshold = self.threshold
+        if rms <= threshold:
+            return False, rms
+        # Broadband hiss crosses zero far more often than voiced speech; a
+        # frame well above the threshold is accepted regardless (fricatives)
+        if rms < threshold * 2 and frame_zero_crossing_rate(frame, self.sample_width) > self.max_zcr:
+            return False, rms
+        return True, rms
+
+    def _update_noise_floor(self, rms):
+        if self.noise_floor is None:
+            self._calibration.append(rms)
+            if len(self._calibration) >= self.calibration_frames:
+                self.noise_floor = sum(self._calibration) / len(self._calibration)
+                self._calibration = []
+                logging.debug(f"Voice activity noise floor calibrated at {self.noise_floor:.1f}")
+        else:
+            self.noise_floor += self.noise_adapt_rate * (rms - self.noise_floor)
+
+    def process(self, frame):
+        """Feed one frame; return a finished utterance as bytes, else None"""
+        if self.noise_floor is None:
+            # Calibrating: nothing can be classified yet
+            self._update_noise_floor(frame_rms(frame, self.sample_width))
+            self._ring.append(frame)
+            return None
+
+        speech, rms = self.is_speech(frame)
+
+        if self._utterance is None:
+            self._ring.append(frame)
+            if not speech:
+                self._speech_run = 0
+                self._update_noise_floor(rms)
+                return None
+
+            self._speech_run += 1
+            if self._speech_run >= self.start_frames:
+                self._utterance = list(self._ring)
+                self._voiced_frames = self._speech_run
+                self._silence_run = 0
+            return None
+
+        self._utterance.append(frame)
+        if speech:
+            self._voiced_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+
+        if (self._silence_run >= self.hangover_frames
+                or len(self._utterance) >= self.max_utterance_frames):
+            return self._finish()
+        return None
+
+    def flush(self):
+        """End the stream, returning any utterance still in progress"""
+        if self._utterance is None:
+            self.reset()
+            return None
+        return self._finish()
+
+    def _finish(self):
+        frames, voiced = self._utterance, self._voiced_frames
+        self.reset()
+        if voiced < self.min_speech_frames:
+            # A click or a cough, not speech
+            return None
+        return b''.join(frames)
+
+
+def iter_utterances(source, detector, should_continue):
+    """Read an open microphone source and yield utterance PCM bytes
+
+    ``source`` is an entered ``speech_recognition.Microphone``. The blocking
+    stream read keeps the thread asleep between frames, so idle listening
+    costs one RMS per frame and no recognition calls.
+    """
+    detector.reset()
+    while should_continue():
+        frame = source.stream.read(detector.frame_samples)
+        if not frame:
+            break
+        utterance = detector.process(frame)
+        if utterance:
+            yield utterance
+
+    utterance = detector.flush()
+    if utterance:
+        yield utterance
+
+
+def listen_for_utterance(source, detector, timeout=10, should_continue=None):
+    """Return the first utterance heard on ``source``, or None after ``timeout`` seconds of no speech"""
+    detector.reset()
+    frame_budget = int(timeout * 1000) // detector.frame_ms
+    frames_read = 0
+    while should_continue is None or should_continue():
+        frame = source.stream.read(detector.frame_samples)
+        if not frame:
+            return detector.flush()
+        utterance = detector.process(frame)
+        if utterance:
+            return utterance
+        frames_read += 1
+        if frames_read >= frame_budget and not detector.in_utterance:
+            return None
+    return detector.flush()
+
+
+def detector_for_source(source, **kwargs):
+    """Build a detector matching an entered microphone's sample format"""
+    return VoiceActivityDetector(
+        sample_rate=source.SAMPLE_RATE,
+        sample_width=source.SAMPLE_WIDTH,
+        **kwargs
+    )
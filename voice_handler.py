@@ -5,7 +5,7 @@ Handles speech recognition and text-to-speech functionality
 
 import threading
 import logging
-from queue import Queue
+from queue import Queue, Full
 import time
 
 # Optional imports with fallbacks
@@ -21,6 +21,7 @@ try:
 except ImportError:
     PYTTSX3_AVAILABLE = False
 import config
+from voice_activity import detector_for_source, iter_utterances
 
 class VoiceHandler:
     def __init__(self):
@@ -34,6 +35,8 @@ class VoiceHandler:
         self.tts_engine = None
         self.is_listening = False
         self.speech_queue = Queue()
+        self.voice_detector = None
+        self._listening_stopped = threading.Event()
         self.initialize_tts()
         if self.microphone:
             self.calibrate_microphone()
@@ -133,30 +136,48 @@ class VoiceHandler:
             return "SPEECH_ERROR"
     
     def start_continuous_listening(self, callback):
-        """Start continuous listening in background"""
-        if self.is_listening:
+        """Start continuous listening in background
+
+        A capture thread keeps one microphone stream open and runs voice
+        activity detection on it; only complete utterances are queued for the
+        recognition thread, so nothing is sent to the recognizer while the
+        user is quiet.
+        """
+        if self.is_listening or not SPEECH_RECOGNITION_AVAILABLE or not self.microphone:
             return False
         
         self.is_listening = True
+        stopped = self._listening_stopped = threading.Event()
+        utterances = Queue(maxsize=4)
+        
+        def capture_thread():
+            try:
+                with self.microphone as source:
+                    if self.voice_detector is None:
+                        self.voice_detector = detector_for_source(source)
+                    for utterance in iter_utterances(source, self.voice_detector, lambda: not stopped.is_set()):
+                        try:
+                            utterances.put_nowait((utterance, source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+                        except Full:
+                            logging.warning("Speech recognition is falling behind - dropping utterance")
+            except Exception as e:
+                logging.error(f"Continuous listening stopped: {e}")
+            finally:
+                if not stopped.is_set():
+                    self.is_listening = False
+                utterances.put(None)
         
-        def listen_thread():
-            while self.is_listening:
+        def recognition_thread():
+            while True:
+                item = utterances.get()
+                if item is None:
+                    break
+                frame_data, sample_rate, sample_width = item
                 try:
-                    with self.microphone as source:
-                        # Listen for audio
-                        audio = self.recognizer.listen(
-                            source, 
-                            timeout=1, 
-                            phrase_time_limit=config.SPEECH_PHRASE_TIMEOUT
-                        )
-                    
-                    # Recognize speech
+                    audio = sr.AudioData(frame_data, sample_rate, sample_width)
                     text = self.recognizer.recognize_google(audio)
                     if text.strip():
                         callback(text.strip())
-                        
-                except sr.WaitTimeoutError:
-                    continue
                 except sr.UnknownValueError:
                     continue
                 except sr.RequestError:
@@ -165,14 +186,16 @@ class VoiceHandler:
                 except Exception:
                     continue
         
-        thread = threading.Thread(target=listen_thread)
-        thread.daemon = True
-        thread.start()
+        for target in (recognition_thread, capture_thread):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
         return True
     
     def stop_continuous_listening(self):
         """Stop continuous listening"""
         self.is_listening = False
+        self._listening_stopped.set()
     
     def is_microphone_available(self):
         """Check if microphone is available"""